@@ -30,6 +30,50 @@ def create_app(config_class=Config):
     migrate.init_app(app, db)
     jwt.init_app(app)
 
+    from app.utils.events import event_hub
+    from app.utils.audit import audit_writer
+    event_hub.init_app(app)
+    audit_writer.init_app(app)
+
+    from app.utils import audit_archive, audit_chain, principal, revocation
+    audit_archive.init_app(app)
+    audit_chain.init_app(app)
+    principal.init_app(app)
+    revocation.init_app(app, jwt)
+
+    from app.utils.auth import password_hasher
+    password_hasher.init_app(app)
+
+    from app.utils.rate_limit import rate_limiter
+    rate_limiter.init_app(app)
+
+    from app.utils import user_directory
+    user_directory.init_app(app)
+
+    from app.utils.case_index import case_index
+    case_index.init_app(app)
+
+    from app.utils import search_index
+    search_index.init_app(app)
+
+    from app.utils.search_cache import search_cache
+    search_cache.init_app(app)
+
+    from app.utils.search_log import search_log
+    search_log.init_app(app)
+
+    from app.utils.fingerprint import duplicate_index
+    duplicate_index.init_app(app)
+
+    from app.utils.related import related_index
+    related_index.init_app(app)
+
+    from app.utils.citations import citation_index
+    citation_index.init_app(app)
+
+    from app.utils.entities import entity_index
+    entity_index.init_app(app)
+
     # ---------------------------------------------
     # Register Blueprints
     # ---------------------------------------------
@@ -40,6 +84,7 @@ def create_app(config_class=Config):
     from app.routes.backup import backup_bp
     from app.routes.users import users_bp
     from app.routes.reports import reports_bp
+    from app.routes.audit import audit_bp
 
     app.register_blueprint(auth_bp, url_prefix="/api/auth")
     app.register_blueprint(cases_bp, url_prefix="/api/cases")
@@ -48,6 +93,16 @@ def create_app(config_class=Config):
     app.register_blueprint(backup_bp, url_prefix="/api/backup")
     app.register_blueprint(users_bp, url_prefix="/api/users")
     app.register_blueprint(reports_bp, url_prefix="/api/reports")
+    app.register_blueprint(audit_bp, url_prefix="/api/audit")
+
+    # ---------------------------------------------
+    # Upgrade databases created by older releases
+    # ---------------------------------------------
+    from app.utils import schema
+    schema.init_app(app)
+
+    # Build the typeahead index now rather than on the first lookup
+    case_index.warm()
 
     # ---------------------------------------------
     # Ensure folders exist
@@ -4,7 +4,13 @@ from .user import User
 from .case import Case
 from .file import CaseFile
 from .backup import Backup, FileBackup
-from .audit import AuditLog
+from .audit import AuditLog, AuditCheckpoint
+from .search import (
+    SearchTerm, SearchPosting, SearchDocument, FileFingerprint, FingerprintBand, FileVector, RelatedFile
+)
+from .saved_search import SavedSearch, SavedSearchKey, SearchNotification
+from .citation import CaseCitation
+from .entity import Entity, EntityPosting
 
 __all__ = [
     "db",
@@ -13,5 +19,19 @@ __all__ = [
     "CaseFile",
     "Backup",
     "FileBackup",
-    "AuditLog"
+    "AuditLog",
+    "AuditCheckpoint",
+    "SearchTerm",
+    "SearchPosting",
+    "SearchDocument",
+    "FileFingerprint",
+    "FingerprintBand",
+    "FileVector",
+    "RelatedFile",
+    "SavedSearch",
+    "SavedSearchKey",
+    "SearchNotification",
+    "CaseCitation",
+    "Entity",
+    "EntityPosting"
 ]
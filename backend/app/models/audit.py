@@ -15,6 +15,24 @@ class AuditLog(db.Model):
     user_agent = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # Tamper evidence, filled in when the entry is sealed into the hash chain
+    chain_seq = db.Column(db.BigInteger, unique=True)
+    prev_hash = db.Column(db.String(64))
+    entry_hash = db.Column(db.String(64))
+    
+    __table_args__ = (
+        # Composite indexes match the /api/audit filters; every one ends in
+        # (created_at, id) so keyset pagination is an index range scan
+        db.Index('ix_audit_logs_created', 'created_at', 'id'),
+        db.Index('ix_audit_logs_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_audit_logs_action_created', 'action', 'created_at', 'id'),
+        db.Index('ix_audit_logs_resource_created', 'resource_type', 'resource_id', 'created_at', 'id'),
+        # Only the not-yet-sealed tail is indexed, so the sealer finds it cheaply
+        db.Index('ix_audit_logs_unsealed', 'id',
+                 sqlite_where=db.text('chain_seq IS NULL'),
+                 postgresql_where=db.text('chain_seq IS NULL')),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -25,5 +43,34 @@ class AuditLog(db.Model):
             'details': self.details,
             'ip_address': self.ip_address,
             'user_agent': self.user_agent,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'chain_seq': self.chain_seq,
+            'entry_hash': self.entry_hash
+        }
+
+
+class AuditCheckpoint(db.Model):
+    __tablename__ = 'audit_checkpoints'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    first_seq = db.Column(db.BigInteger, unique=True, nullable=False)
+    last_seq = db.Column(db.BigInteger, unique=True, nullable=False)
+    entry_count = db.Column(db.Integer, nullable=False)
+    merkle_root = db.Column(db.String(64), nullable=False)
+    last_entry_hash = db.Column(db.String(64), nullable=False)
+    prev_signature = db.Column(db.String(64))
+    signature = db.Column(db.String(64), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'first_seq': self.first_seq,
+            'last_seq': self.last_seq,
+            'entry_count': self.entry_count,
+            'merkle_root': self.merkle_root,
+            'last_entry_hash': self.last_entry_hash,
+            'prev_signature': self.prev_signature,
+            'signature': self.signature,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
@@ -9,10 +9,10 @@ class Case(db.Model):
     case_number = db.Column(db.String(50), unique=True, nullable=False)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
-    case_type = db.Column(db.Enum('criminal', 'civil', 'commercial', 'constitutional', name='case_types'))
-    status = db.Column(db.Enum('active', 'pending', 'closed', 'archived', name='case_status'), default='active')
-    judge_id = db.Column(db.Integer, db.ForeignKey('users.id'))
-    court_station = db.Column(db.String(100))
+    case_type = db.Column(db.Enum('criminal', 'civil', 'commercial', 'constitutional', name='case_types'), index=True)
+    status = db.Column(db.Enum('active', 'pending', 'closed', 'archived', name='case_status'), default='active', index=True)
+    judge_id = db.Column(db.Integer, db.ForeignKey('users.id'), index=True)
+    court_station = db.Column(db.String(100), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
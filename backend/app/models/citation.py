@@ -0,0 +1,24 @@
+# app/models/citation.py
+from app import db
+
+class CaseCitation(db.Model):
+    """
+    Citation edge: a file of one case mentions another case's number.
+
+    Edges are kept even when the cited number is not (yet) a known case;
+    `cited_case_id` is filled in once a case with that number exists.
+    """
+    __tablename__ = 'case_citations'
+
+    citing_file_id = db.Column(db.Integer, db.ForeignKey('case_files.id', ondelete='CASCADE'), primary_key=True)
+    cited_number = db.Column(db.String(50), primary_key=True)
+    citing_case_id = db.Column(db.Integer, db.ForeignKey('cases.id', ondelete='CASCADE'), nullable=False)
+    cited_case_id = db.Column(db.Integer, db.ForeignKey('cases.id', ondelete='SET NULL'))
+    mentions = db.Column(db.Integer, nullable=False, default=1)
+    first_page = db.Column(db.Integer)  # OCR page of the first mention, when known
+
+    __table_args__ = (
+        db.Index('ix_case_citations_citing', 'citing_case_id', 'cited_case_id'),
+        db.Index('ix_case_citations_cited', 'cited_case_id', 'citing_case_id'),
+        db.Index('ix_case_citations_number', 'cited_number'),
+    )
@@ -0,0 +1,44 @@
+# app/models/entity.py
+from app import db
+
+class Entity(db.Model):
+    """
+    A party, advocate, statute or date mentioned in case files. `key` is
+    the normalised form used for matching; `name` is for display.
+    """
+    __tablename__ = 'entities'
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.Enum('party', 'advocate', 'statute', 'date', name='entity_kinds'), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    name = db.Column(db.String(255), nullable=False)
+    file_count = db.Column(db.Integer, nullable=False, default=0)  # files mentioning the entity
+
+    __table_args__ = (
+        db.UniqueConstraint('kind', 'key', name='uq_entities_kind_key'),
+        db.Index('ix_entities_key', 'key'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'name': self.name,
+            'file_count': self.file_count
+        }
+
+
+class EntityPosting(db.Model):
+    """One entity's mentions in one file."""
+    __tablename__ = 'entity_postings'
+
+    entity_id = db.Column(db.Integer, db.ForeignKey('entities.id', ondelete='CASCADE'), primary_key=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('case_files.id', ondelete='CASCADE'), primary_key=True)
+    case_id = db.Column(db.Integer, db.ForeignKey('cases.id', ondelete='CASCADE'), nullable=False)
+    mentions = db.Column(db.Integer, nullable=False, default=1)
+    first_page = db.Column(db.Integer)
+
+    __table_args__ = (
+        db.Index('ix_entity_postings_entity_case', 'entity_id', 'case_id'),
+        db.Index('ix_entity_postings_file', 'file_id'),
+    )
@@ -11,12 +11,12 @@ class CaseFile(db.Model):
     file_path = db.Column(db.String(500), nullable=False)
     file_size = db.Column(db.Integer)  # in bytes
     file_type = db.Column(db.String(50))
-    document_type = db.Column(db.Enum('ruling', 'evidence', 'witness_statement', 'affidavit', 'pleading', 'exhibit', name='doc_types'))
-    case_id = db.Column(db.Integer, db.ForeignKey('cases.id'), nullable=False)
+    document_type = db.Column(db.Enum('ruling', 'evidence', 'witness_statement', 'affidavit', 'pleading', 'exhibit', name='doc_types'), index=True)
+    case_id = db.Column(db.Integer, db.ForeignKey('cases.id'), nullable=False, index=True)
     uploaded_by_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     ocr_text = db.Column(db.Text)  # Extracted text from OCR
     is_ocr_processed = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     
     # Backup relationship
     backups = db.relationship('FileBackup', backref='file', lazy=True)
@@ -0,0 +1,76 @@
+# app/models/saved_search.py
+from app import db
+from datetime import datetime
+
+class SavedSearch(db.Model):
+    """A standing query, matched against new files as they are ingested."""
+    __tablename__ = 'saved_searches'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    query_text = db.Column(db.Text, nullable=False)  # advanced search query language
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    match_count = db.Column(db.Integer, default=0, nullable=False)
+    last_matched_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    keys = db.relationship('SavedSearchKey', backref='saved_search', lazy=True, cascade='all, delete-orphan')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'query': self.query_text,
+            'is_active': self.is_active,
+            'match_count': self.match_count,
+            'last_matched_at': self.last_matched_at.isoformat() if self.last_matched_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class SavedSearchKey(db.Model):
+    """
+    Reverse index entry: a file can only match the saved search if it
+    contains `term`. Queries that no single term can anchor (e.g. only
+    structured filters) are stored under the '*' key and checked for
+    every file.
+    """
+    __tablename__ = 'saved_search_keys'
+
+    term = db.Column(db.String(64), primary_key=True)
+    saved_search_id = db.Column(db.Integer, db.ForeignKey('saved_searches.id', ondelete='CASCADE'),
+                                primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_saved_search_keys_search', 'saved_search_id'),
+    )
+
+
+class SearchNotification(db.Model):
+    """A new file that matched one of a user's saved searches."""
+    __tablename__ = 'search_notifications'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    saved_search_id = db.Column(db.Integer, db.ForeignKey('saved_searches.id', ondelete='CASCADE'),
+                                nullable=False)
+    file_id = db.Column(db.Integer, db.ForeignKey('case_files.id', ondelete='CASCADE'), nullable=False)
+    case_id = db.Column(db.Integer, db.ForeignKey('cases.id', ondelete='CASCADE'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    read_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.UniqueConstraint('saved_search_id', 'file_id', name='uq_search_notifications_search_file'),
+        db.Index('ix_search_notifications_user_created', 'user_id', 'created_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'saved_search_id': self.saved_search_id,
+            'file_id': self.file_id,
+            'case_id': self.case_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'read_at': self.read_at.isoformat() if self.read_at else None
+        }
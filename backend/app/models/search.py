@@ -0,0 +1,85 @@
+# app/models/search.py
+from app import db
+from datetime import datetime
+
+class SearchTerm(db.Model):
+    """Term dictionary of the full-text index."""
+    __tablename__ = 'search_terms'
+
+    id = db.Column(db.Integer, primary_key=True)
+    term = db.Column(db.String(64), unique=True, nullable=False)
+    doc_freq = db.Column(db.Integer, nullable=False, default=0)  # files containing the term
+
+
+class SearchPosting(db.Model):
+    """One term's occurrences in one field of one file."""
+    __tablename__ = 'search_postings'
+
+    term_id = db.Column(db.Integer, db.ForeignKey('search_terms.id'), primary_key=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('case_files.id', ondelete='CASCADE'), primary_key=True)
+    field = db.Column(db.String(16), primary_key=True)  # content, title, number, filename
+    term_freq = db.Column(db.Integer, nullable=False, default=1)
+    positions = db.Column(db.LargeBinary)  # (ordinal, offset, length) per occurrence, delta-varint encoded
+
+    __table_args__ = (
+        db.Index('ix_search_postings_file', 'file_id'),
+    )
+
+
+class SearchDocument(db.Model):
+    """Per-file index bookkeeping."""
+    __tablename__ = 'search_documents'
+
+    file_id = db.Column(db.Integer, db.ForeignKey('case_files.id', ondelete='CASCADE'), primary_key=True)
+    length = db.Column(db.Integer, nullable=False, default=0)  # content terms
+    pages = db.Column(db.Text)  # JSON [[page number, offset]] from OCR page markers
+    language = db.Column(db.String(8))  # analysis language detected from the text
+    indexed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class FileFingerprint(db.Model):
+    """MinHash signature of a file's text and its near-duplicate group."""
+    __tablename__ = 'file_fingerprints'
+
+    file_id = db.Column(db.Integer, db.ForeignKey('case_files.id', ondelete='CASCADE'), primary_key=True)
+    signature = db.Column(db.LargeBinary, nullable=False)
+    shingle_count = db.Column(db.Integer, nullable=False, default=0)
+    duplicate_of = db.Column(db.Integer, db.ForeignKey('case_files.id'), index=True)  # earliest copy
+    similarity = db.Column(db.Float)  # estimated Jaccard similarity to duplicate_of
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class FingerprintBand(db.Model):
+    """LSH bucket: files whose signatures agree on one band share a row key."""
+    __tablename__ = 'fingerprint_bands'
+
+    band = db.Column(db.SmallInteger, primary_key=True)
+    bucket = db.Column(db.BigInteger, primary_key=True)
+    file_id = db.Column(db.Integer, db.ForeignKey('case_files.id', ondelete='CASCADE'), primary_key=True)
+
+    __table_args__ = (
+        db.Index('ix_fingerprint_bands_file', 'file_id'),
+    )
+
+
+class FileVector(db.Model):
+    """Bookkeeping for a file's TF-IDF content vector (the weights come from postings)."""
+    __tablename__ = 'file_vectors'
+
+    file_id = db.Column(db.Integer, db.ForeignKey('case_files.id', ondelete='CASCADE'), primary_key=True)
+    norm = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class RelatedFile(db.Model):
+    """Precomputed nearest neighbours of a file by TF-IDF cosine similarity."""
+    __tablename__ = 'related_files'
+
+    file_id = db.Column(db.Integer, db.ForeignKey('case_files.id', ondelete='CASCADE'), primary_key=True)
+    related_id = db.Column(db.Integer, db.ForeignKey('case_files.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_related_files_file_score', 'file_id', 'score'),
+        db.Index('ix_related_files_related', 'related_id'),
+    )
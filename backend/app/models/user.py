@@ -1,6 +1,8 @@
 # app/models/user.py
 from app import db
 from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.orm import validates
 
 class User(db.Model):
     __tablename__ = "users"
@@ -19,12 +21,20 @@ class User(db.Model):
     is_approved = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     last_login = db.Column(db.DateTime)
+    # Normalised full name for directory search (see app/utils/user_directory.py)
+    search_name = db.Column(db.String(100), index=True)
 
     # Relationships
     cases = db.relationship("Case", backref="judge", lazy=True)
     uploaded_files = db.relationship("CaseFile", backref="uploaded_by", lazy=True)
     audit_logs = db.relationship("AuditLog", backref="user", lazy=True)
 
+    @validates("full_name")
+    def _set_search_name(self, key, value):
+        from app.utils.user_directory import normalize_name
+        self.search_name = normalize_name(value)
+        return value
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -38,3 +48,9 @@ class User(db.Model):
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "last_login": self.last_login.isoformat() if self.last_login else None,
         }
+
+
+@event.listens_for(User.__table__, "after_create")
+def _create_search_indexes(target, connection, **kw):
+    from app.utils.user_directory import install_search_indexes
+    install_search_indexes(connection)
@@ -6,6 +6,7 @@ from .search import search_bp
 from .backup import backup_bp
 from .users import users_bp
 from .reports import reports_bp
+from .audit import audit_bp
 
 __all__ = [
     'auth_bp',
@@ -14,5 +15,6 @@ __all__ = [
     'search_bp',
     'backup_bp',
     'users_bp',
-    'reports_bp'
+    'reports_bp',
+    'audit_bp'
 ]
\ No newline at end of file
@@ -0,0 +1,144 @@
+# app/routes/audit.py
+import base64
+import json
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from app.models import CaseFile, AuditCheckpoint, db
+from app.utils.audit_archive import query_audit
+from app.utils.audit_chain import verify_log, inclusion_proof
+from app.utils.principal import current_principal
+from sqlalchemy import select
+from datetime import datetime, timedelta
+
+audit_bp = Blueprint('audit', __name__)
+
+def encode_cursor(entry):
+    raw = json.dumps([entry['created_at'], entry['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def decode_cursor(cursor):
+    created_at, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return datetime.fromisoformat(created_at), int(entry_id)
+
+def parse_time(value, end_of_day=False):
+    """Accept YYYY-MM-DD or a full ISO timestamp; a bare end date covers the whole day."""
+    moment = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        moment += timedelta(days=1)
+    return moment
+
+@audit_bp.route('', methods=['GET'])
+@jwt_required()
+def query_audit_log():
+    """
+    Filtered audit history, newest first, with keyset pagination.
+
+    Pass `cursor` from the previous page's `next_cursor`; every page is an
+    index range scan regardless of depth.
+    """
+    current_user = current_principal()
+    
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    limit = max(1, min(request.args.get('limit', 50, type=int), 500))
+    
+    try:
+        start = parse_time(request.args['from']) if request.args.get('from') else None
+        end = parse_time(request.args['to'], end_of_day=True) if request.args.get('to') else None
+        before = decode_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid date or cursor'}), 400
+    
+    filters = {
+        'user_id': request.args.get('user_id', type=int),
+        'action': request.args.get('action') or None,
+        'resource_type': request.args.get('resource_type') or None,
+        'resource_id': request.args.get('resource_id', type=int)
+    }
+    
+    # case_id covers the case itself and every file in it
+    resources = None
+    case_id = request.args.get('case_id', type=int)
+    if case_id:
+        file_ids = [row.id for row in db.session.query(CaseFile.id).filter_by(case_id=case_id)]
+        resources = [('case', [case_id]), ('case_file', file_ids)]
+    
+    entries = query_audit(start=start, end=end, limit=limit + 1, before=before,
+                          resources=resources, **filters)
+    
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    
+    return jsonify({
+        'entries': entries,
+        'count': len(entries),
+        'next_cursor': encode_cursor(entries[-1]) if has_more else None
+    }), 200
+
+@audit_bp.route('/checkpoints', methods=['GET'])
+@jwt_required()
+def list_checkpoints():
+    """Most recent signed checkpoints of the audit hash chain"""
+    current_user = current_principal()
+    
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    limit = min(request.args.get('limit', 20, type=int), 500)
+    checkpoints = AuditCheckpoint.query\
+        .order_by(AuditCheckpoint.id.desc())\
+        .limit(limit)\
+        .all()
+    
+    return jsonify({
+        'checkpoints': [checkpoint.to_dict() for checkpoint in checkpoints]
+    }), 200
+
+@audit_bp.route('/verify', methods=['GET'])
+@jwt_required()
+def verify_audit_log():
+    """
+    Verify a range of checkpoints of the audit hash chain: `limit`
+    checkpoints after checkpoint `after`, by default the most recent ones.
+    `next` continues from where this range stopped. The whole log is
+    verified offline with `flask audit-verify`.
+    """
+    current_user = current_principal()
+    
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 200)
+    after = request.args.get('after', type=int)
+    if after is None:
+        after = db.session.scalar(
+            select(AuditCheckpoint.id).order_by(AuditCheckpoint.id.desc()).offset(limit).limit(1)
+        )
+    
+    # In-process: forking a pool from a threaded server worker is unsafe
+    try:
+        result = verify_log(workers=1, after=after, limit=limit)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    
+    more = result['last_checkpoint'] is not None and db.session.scalar(
+        select(AuditCheckpoint.id).where(AuditCheckpoint.id > result['last_checkpoint']).limit(1)
+    )
+    result['next'] = result['last_checkpoint'] if more else None
+    return jsonify(result), 200
+
+@audit_bp.route('/<int:entry_id>/proof', methods=['GET'])
+@jwt_required()
+def audit_entry_proof(entry_id):
+    """Merkle inclusion proof for a single audit entry"""
+    current_user = current_principal()
+    
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    proof = inclusion_proof(entry_id)
+    if not proof:
+        return jsonify({'error': 'Entry not found or not sealed yet'}), 404
+    
+    return jsonify(proof), 200
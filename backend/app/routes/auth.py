@@ -2,11 +2,15 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import (
     create_access_token, jwt_required,
-    get_jwt_identity
+    get_jwt
 )
-from app.models import User, db, AuditLog
-from app.utils.auth import hash_password, verify_password
+from app.models import User, db
+from app.utils.auth import hash_password, verify_password, needs_rehash, HashingBusy, hashing_busy_response
+from app.utils.audit import log_action, client_details
 from app.utils.validators import validate_email_domain
+from app.utils.principal import current_principal, invalidate_principal
+from app.utils.revocation import revocation_list
+from app.utils.rate_limit import rate_limit
 from datetime import datetime, timedelta
 
 auth_bp = Blueprint("auth", __name__)
@@ -16,6 +20,7 @@ auth_bp = Blueprint("auth", __name__)
 # LOGIN
 # -----------------------------
 @auth_bp.route("/login", methods=["POST"])
+@rate_limit("login", account_field="email")
 def login():
     try:
         data = request.get_json() or {}
@@ -30,14 +35,22 @@ def login():
             return jsonify({"error": "Invalid email or password"}), 401
 
         if not user.is_approved:
+            if not user.is_active:
+                return jsonify({"error": "Registration was rejected"}), 403
             return jsonify({"error": "Account pending administrator approval"}), 403
 
         if not user.is_active:
             return jsonify({"error": "Account deactivated"}), 403
 
-        # Update last login
+        # Update last login, upgrading the hash if the cost policy changed
         user.last_login = datetime.utcnow()
+        if needs_rehash(user.password_hash):
+            try:
+                user.password_hash = hash_password(password)
+            except HashingBusy:
+                pass  # keep the old hash; it is upgraded on a later login
         db.session.add(user)
+        db.session.commit()
 
         # Create JWT token with expiration
         access_token = create_access_token(
@@ -51,15 +64,12 @@ def login():
         )
 
         # Audit log
-        audit = AuditLog(
+        log_action(
+            "login",
             user_id=user.id,
-            action="login",
             details="User logged in successfully",
-            ip_address=request.remote_addr or 'unknown',
-            user_agent=(request.user_agent.string if request.user_agent else 'unknown')
+            **client_details(request)
         )
-        db.session.add(audit)
-        db.session.commit()
 
         return jsonify({
             "access_token": access_token,
@@ -67,6 +77,10 @@ def login():
             "user": user.to_dict()
         }), 200
 
+    except HashingBusy as e:
+        db.session.rollback()
+        return hashing_busy_response(e)
+
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Login failed", "details": str(e)}), 500
@@ -76,6 +90,7 @@ def login():
 # REGISTER
 # -----------------------------
 @auth_bp.route("/register", methods=["POST"])
+@rate_limit("register", account_field="email")
 def register():
     try:
         data = request.get_json() or {}
@@ -129,15 +144,14 @@ def register():
         db.session.add(user)
         db.session.flush()  # Get user ID before commit
 
-        # Audit log
-        audit = AuditLog(
+        # Audit log (same transaction as the new account)
+        log_action(
+            "registration",
             user_id=user.id,
-            action="registration",
             details=f"New registration for {email} as {role}",
-            ip_address=request.remote_addr or 'unknown',
-            user_agent=(request.user_agent.string if request.user_agent else 'unknown')
+            sync=True,
+            **client_details(request)
         )
-        db.session.add(audit)
         db.session.commit()
 
         # Auto-login for admins
@@ -162,6 +176,10 @@ def register():
                 "user_id": user.id
             }), 201
 
+    except HashingBusy as e:
+        db.session.rollback()
+        return hashing_busy_response(e)
+
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Registration failed", "details": str(e)}), 500
@@ -174,9 +192,13 @@ def register():
 @jwt_required()
 def get_current_user():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        current_user = current_principal()
         
+        if not current_user:
+            return jsonify({"error": "User not found"}), 404
+
+        # The profile also shows fields the principal does not carry
+        user = db.session.get(User, current_user.id)
         if not user:
             return jsonify({"error": "User not found"}), 404
 
@@ -193,9 +215,12 @@ def get_current_user():
 @jwt_required()
 def change_password():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        current_user = current_principal()
         
+        if not current_user:
+            return jsonify({"error": "User not found"}), 404
+
+        user = db.session.get(User, current_user.id)
         if not user:
             return jsonify({"error": "User not found"}), 404
 
@@ -224,17 +249,37 @@ def change_password():
         user.password_hash = hash_password(new_password)
         db.session.add(user)
 
-        # Audit log
-        audit = AuditLog(
+        # Audit log (same transaction as the new hash)
+        log_action(
+            "password_change",
             user_id=user.id,
-            action="password_change",
             details="Password changed successfully",
-            ip_address=request.remote_addr or 'unknown'
+            ip_address=request.remote_addr or 'unknown',
+            sync=True
         )
-        db.session.add(audit)
         db.session.commit()
+        invalidate_principal(user.id)
+
+        # Sign out every other session; this one continues with a fresh token
+        revocation_list.revoke_user(user.id)
+        access_token = create_access_token(
+            identity=str(user.id),
+            additional_claims={
+                "email": user.email,
+                "role": user.role,
+                "name": user.full_name,
+            },
+            expires_delta=timedelta(hours=24)
+        )
 
-        return jsonify({"message": "Password updated successfully"}), 200
+        return jsonify({
+            "message": "Password updated successfully",
+            "access_token": access_token
+        }), 200
+
+    except HashingBusy as e:
+        db.session.rollback()
+        return hashing_busy_response(e)
 
     except Exception as e:
         db.session.rollback()
@@ -248,21 +293,20 @@ def change_password():
 @jwt_required()
 def logout():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = current_principal()
         
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        audit = AuditLog(
+        claims = get_jwt()
+        revocation_list.revoke_token(claims["jti"], claims["exp"])
+
+        log_action(
+            "logout",
             user_id=user.id,
-            action="logout",
             details="User logged out successfully",
-            ip_address=request.remote_addr or 'unknown',
-            user_agent=(request.user_agent.string if request.user_agent else 'unknown')
+            **client_details(request)
         )
-        db.session.add(audit)
-        db.session.commit()
         
         return jsonify({"message": "Logout successful"}), 200
 
@@ -278,8 +322,7 @@ def logout():
 @jwt_required(refresh=True)
 def refresh_token():
     try:
-        user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = current_principal()
         
         if not user:
             return jsonify({"error": "User not found"}), 404
@@ -307,6 +350,7 @@ def refresh_token():
 # CHECK EMAIL AVAILABILITY
 # -----------------------------
 @auth_bp.route("/check-email", methods=["POST"])
+@rate_limit("check_email")
 def check_email():
     try:
         data = request.get_json() or {}
@@ -331,6 +375,7 @@ def check_email():
 # FORGOT PASSWORD (Simplified - would need email service)
 # -----------------------------
 @auth_bp.route("/forgot-password", methods=["POST"])
+@rate_limit("forgot_password", account_field="email")
 def forgot_password():
     try:
         data = request.get_json() or {}
@@ -351,14 +396,12 @@ def forgot_password():
         # 2. Send email with reset link
         # 3. Store token in database with expiration
         
-        audit = AuditLog(
+        log_action(
+            "password_reset_request",
             user_id=user.id,
-            action="password_reset_request",
             details="Password reset requested",
             ip_address=request.remote_addr or 'unknown'
         )
-        db.session.add(audit)
-        db.session.commit()
 
         return jsonify({
             "message": "If your email is registered, you will receive a password reset link"
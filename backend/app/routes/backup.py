@@ -1,11 +1,14 @@
 # app/routes/backup.py
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import Backup, AuditLog, db, CaseFile
+from app.models import Backup, db, CaseFile
 from datetime import datetime
 import os
 import shutil
 import zipfile
+from app.utils.events import event_hub
+from app.utils.audit import log_action
+from app.utils.principal import current_principal
 from config import Config
 
 backup_bp = Blueprint('backup', __name__)
@@ -50,6 +53,13 @@ def create_backup(backup_id, backup_type='full', storage_location='local'):
         backup.completed_at = datetime.utcnow()
         db.session.commit()
         
+        event_hub.publish('backup', 'completed', {
+            'id': backup.id,
+            'status': backup.status,
+            'size': backup.size,
+            'completed_at': backup.completed_at.isoformat()
+        })
+        
         # Log success
         print(f"Backup completed: {zip_path}")
         
@@ -58,6 +68,7 @@ def create_backup(backup_id, backup_type='full', storage_location='local'):
         if backup:
             backup.status = 'failed'
             db.session.commit()
+            event_hub.publish('backup', 'failed', {'id': backup.id, 'status': backup.status})
         print(f"Backup failed: {e}")
 
 # Start backup
@@ -87,15 +98,15 @@ def start_backup():
     thread.daemon = True
     thread.start()
 
-    audit = AuditLog(
+    log_action(
+        'backup_start',
         user_id=current_user_id,
-        action='backup_start',
         resource_type='backup',
         resource_id=backup.id,
         details=f'Started {backup_type} backup: {description}'
     )
-    db.session.add(audit)
-    db.session.commit()
+
+    event_hub.publish('backup', 'started', {'id': backup.id, 'status': backup.status})
 
     return jsonify({
         'message': 'Backup started', 
@@ -108,7 +119,7 @@ def start_backup():
 @jwt_required()
 def restore_backup_route(backup_id):
     current_user_id = get_jwt_identity()
-    current_user = db.session.get(User, current_user_id)
+    current_user = current_principal()
     
     if not current_user or current_user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
@@ -122,16 +133,14 @@ def restore_backup_route(backup_id):
     # In production, this would be a background task
     # For now, just mark as restoring
     backup.status = 'restoring'
-    db.session.commit()
-
-    audit = AuditLog(
+    log_action(
+        'backup_restore',
         user_id=current_user_id,
-        action='backup_restore',
         resource_type='backup',
         resource_id=backup_id,
-        details='Started backup restoration'
+        details='Started backup restoration',
+        sync=True
     )
-    db.session.add(audit)
     db.session.commit()
 
     return jsonify({
@@ -169,8 +178,7 @@ def list_backups():
 @backup_bp.route('/statistics', methods=['GET'])
 @jwt_required()
 def backup_statistics():
-    current_user_id = get_jwt_identity()
-    current_user = db.session.get(User, current_user_id)
+    current_user = current_principal()
     
     if not current_user or current_user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
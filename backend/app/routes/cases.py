@@ -1,8 +1,14 @@
 # app/routes/cases.py
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import or_
-from app.models import Case, User, AuditLog, db
+from sqlalchemy import func, or_
+from app.models import Case, CaseCitation, User, db
+from app.utils.audit import log_action
+from app.utils.events import event_hub, case_summary
+from app.utils.principal import current_principal
+from app.utils.case_index import case_index
+from app.utils.citations import citation_index
+from app.utils.ingest import reindex_case, forget_file
 from datetime import datetime
 
 cases_bp = Blueprint("cases", __name__)
@@ -13,8 +19,7 @@ cases_bp = Blueprint("cases", __name__)
 @cases_bp.route("/cases", methods=["GET"])
 @jwt_required()
 def get_cases():
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
 
     if not current_user:
         return jsonify({"error": "Invalid user"}), 401
@@ -24,7 +29,7 @@ def get_cases():
 
     # Judges ONLY see their assigned cases
     if current_user.role == "judge":
-        query = query.filter_by(judge_id=current_user_id)
+        query = query.filter_by(judge_id=current_user.id)
 
     # ----- Filters -----
     status = request.args.get("status")
@@ -83,7 +88,7 @@ def get_cases():
 @jwt_required()
 def create_case():
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
 
     if not current_user:
         return jsonify({"error": "Invalid user"}), 401
@@ -103,11 +108,11 @@ def create_case():
 
     # Judge cannot assign cases to other judges
     if current_user.role == "judge":
-        judge_id = current_user_id
+        judge_id = current_user.id
 
     # Admin or Clerk — allow assignment
     if not judge_id:
-        judge_id = current_user_id
+        judge_id = current_user.id
 
     new_case = Case(
         case_number=data["case_number"],
@@ -120,19 +125,20 @@ def create_case():
     )
 
     db.session.add(new_case)
+    db.session.flush()
+    citation_index.link_case(new_case)
     db.session.commit()
 
     # Audit Logging
-    audit_entry = AuditLog(
+    log_action(
+        "case_create",
         user_id=current_user_id,
-        action="case_create",
         resource_type="case",
         resource_id=new_case.id,
         details=f"Created case {new_case.case_number}"
     )
 
-    db.session.add(audit_entry)
-    db.session.commit()
+    event_hub.publish("case", "created", case_summary(new_case), judge_id=new_case.judge_id)
 
     return jsonify({
         "message": "Case created successfully",
@@ -146,8 +152,7 @@ def create_case():
 @cases_bp.route("/cases/<int:case_id>", methods=["GET"])
 @jwt_required()
 def get_case(case_id):
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
 
     if not current_user:
         return jsonify({"error": "Invalid user"}), 401
@@ -155,7 +160,7 @@ def get_case(case_id):
     case = Case.query.get_or_404(case_id)
 
     # Check permissions
-    if current_user.role == "judge" and case.judge_id != current_user_id:
+    if current_user.role == "judge" and case.judge_id != current_user.id:
         return jsonify({"error": "Access denied"}), 403
 
     # Include files in response
@@ -165,6 +170,102 @@ def get_case(case_id):
     return jsonify({"case": case_data}), 200
 
 
+# ---------------------------------------------------------
+# CITATION GRAPH
+# ---------------------------------------------------------
+def _visible_case(current_user, case_id):
+    case = Case.query.get_or_404(case_id)
+    if current_user.role == "judge" and case.judge_id != current_user.id:
+        return None
+    return case
+
+
+def _case_ref(current_user, case):
+    # Judges only see details of the cases assigned to them
+    if case is None or (current_user.role == "judge" and case.judge_id != current_user.id):
+        return None
+    return {"id": case.id, "case_number": case.case_number, "title": case.title, "status": case.status}
+
+
+@cases_bp.route("/cases/<int:case_id>/citations", methods=["GET"])
+@jwt_required()
+def get_case_citations(case_id):
+    current_user = current_principal()
+
+    if not current_user:
+        return jsonify({"error": "Invalid user"}), 401
+
+    if _visible_case(current_user, case_id) is None:
+        return jsonify({"error": "Access denied"}), 403
+
+    # Aggregate first and join the cases to the totals, so the GROUP BY
+    # does not have to list every Case column (PostgreSQL insists)
+    totals = db.session.query(
+        CaseCitation.cited_number.label("cited_number"),
+        CaseCitation.cited_case_id.label("cited_case_id"),
+        func.sum(CaseCitation.mentions).label("mentions"),
+        func.count(CaseCitation.citing_file_id).label("files")
+    ).filter(CaseCitation.citing_case_id == case_id) \
+        .group_by(CaseCitation.cited_number, CaseCitation.cited_case_id) \
+        .subquery()
+
+    rows = db.session.query(totals.c.cited_number, Case, totals.c.mentions, totals.c.files) \
+        .outerjoin(Case, Case.id == totals.c.cited_case_id) \
+        .order_by(totals.c.mentions.desc(), totals.c.cited_number) \
+        .all()
+
+    return jsonify({
+        "case_id": case_id,
+        "citations": [{
+            "case_number": number,
+            "case": _case_ref(current_user, cited),
+            "mentions": mentions,
+            "files": files
+        } for number, cited, mentions, files in rows]
+    }), 200
+
+
+@cases_bp.route("/cases/<int:case_id>/cited-by", methods=["GET"])
+@jwt_required()
+def get_case_cited_by(case_id):
+    current_user = current_principal()
+
+    if not current_user:
+        return jsonify({"error": "Invalid user"}), 401
+
+    if _visible_case(current_user, case_id) is None:
+        return jsonify({"error": "Access denied"}), 403
+
+    limit = min(request.args.get("limit", 50, type=int), 200)
+
+    totals = db.session.query(
+        CaseCitation.citing_case_id.label("case_id"),
+        func.sum(CaseCitation.mentions).label("mentions"),
+        func.count(CaseCitation.citing_file_id).label("files"),
+        func.min(CaseCitation.first_page).label("first_page")
+    ).filter(CaseCitation.cited_case_id == case_id) \
+        .group_by(CaseCitation.citing_case_id) \
+        .subquery()
+
+    query = db.session.query(Case, totals.c.mentions, totals.c.files, totals.c.first_page) \
+        .join(totals, totals.c.case_id == Case.id)
+
+    if current_user.role == "judge":
+        query = query.filter(Case.judge_id == current_user.id)
+
+    rows = query.order_by(totals.c.mentions.desc(), Case.id).limit(limit).all()
+
+    return jsonify({
+        "case_id": case_id,
+        "cited_by": [{
+            "case": _case_ref(current_user, citing),
+            "mentions": mentions,
+            "files": files,
+            "first_page": first_page
+        } for citing, mentions, files, first_page in rows]
+    }), 200
+
+
 # ---------------------------------------------------------
 # UPDATE CASE
 # ---------------------------------------------------------
@@ -172,7 +273,7 @@ def get_case(case_id):
 @jwt_required()
 def update_case(case_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
 
     if not current_user:
         return jsonify({"error": "Invalid user"}), 401
@@ -180,10 +281,12 @@ def update_case(case_id):
     case = Case.query.get_or_404(case_id)
 
     # Check permissions
-    if current_user.role == "judge" and case.judge_id != current_user_id:
+    if current_user.role == "judge" and case.judge_id != current_user.id:
         return jsonify({"error": "Access denied"}), 403
 
     data = request.get_json() or {}
+    previous = {"status": case.status, "case_type": case.case_type}
+    previous_judge_id = case.judge_id
 
     # Update fields
     if "title" in data:
@@ -206,17 +309,28 @@ def update_case(case_id):
     case.updated_at = datetime.utcnow()
     db.session.commit()
 
+    if "title" in data or "description" in data:
+        reindex_case(case)
+
     # Audit Logging
-    audit_entry = AuditLog(
+    log_action(
+        "case_update",
         user_id=current_user_id,
-        action="case_update",
         resource_type="case",
         resource_id=case_id,
         details=f"Updated case {case.case_number}"
     )
 
-    db.session.add(audit_entry)
-    db.session.commit()
+    if previous_judge_id != case.judge_id:
+        # The case moves between the two judges' dashboard counts at its previous
+        # status; the "updated" event below then applies any status change
+        event_hub.publish("case", "unassigned", {"id": case.id, "status": previous["status"]},
+                          judge_id=previous_judge_id)
+        event_hub.publish("case", "assigned", {"id": case.id, "status": previous["status"]},
+                          judge_id=case.judge_id)
+    delta = case_summary(case)
+    delta["previous"] = previous
+    event_hub.publish("case", "updated", delta, judge_id=case.judge_id)
 
     return jsonify({
         "message": "Case updated successfully",
@@ -231,37 +345,66 @@ def update_case(case_id):
 @jwt_required()
 def delete_case(case_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
 
     if not current_user or current_user.role != "admin":
         return jsonify({"error": "Admin access required"}), 403
 
     case = Case.query.get_or_404(case_id)
 
-    # Audit before deletion
-    audit_entry = AuditLog(
+    # Audit before deletion (same transaction)
+    log_action(
+        "case_delete",
         user_id=current_user_id,
-        action="case_delete",
         resource_type="case",
         resource_id=case_id,
-        details=f"Deleted case {case.case_number}"
+        details=f"Deleted case {case.case_number}",
+        sync=True
     )
 
-    db.session.add(audit_entry)
+    deleted = {"id": case.id, "status": case.status, "case_type": case.case_type}
+    judge_id = case.judge_id
+
+    for case_file in case.files:
+        forget_file(case_file.id)
+    citation_index.unlink_case(case.id)
     db.session.delete(case)
     db.session.commit()
 
+    event_hub.publish("case", "deleted", deleted, judge_id=judge_id)
+
     return jsonify({"message": "Case deleted successfully"}), 200
 
 
+# ---------------------------------------------------------
+# CASE NUMBER TYPEAHEAD
+# ---------------------------------------------------------
+@cases_bp.route("/suggest", methods=["GET"])
+@jwt_required()
+def suggest_cases():
+    current_user = current_principal()
+
+    if not current_user:
+        return jsonify({"error": "Invalid user"}), 401
+
+    prefix = request.args.get("q", "")
+    limit = min(request.args.get("limit", 10, type=int), 50)
+    include_titles = request.args.get("titles", "false").lower() == "true"
+    judge_id = current_user.id if current_user.role == "judge" else None
+
+    suggestions = case_index.suggest(prefix, limit=limit, judge_id=judge_id,
+                                     include_titles=include_titles)
+
+    return jsonify({"suggestions": suggestions}), 200
+
+
 # ---------------------------------------------------------
 # GET CASE STATISTICS
 # ---------------------------------------------------------
 @cases_bp.route("/cases/statistics", methods=["GET"])
 @jwt_required()
 def get_case_statistics():
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
 
     if not current_user:
         return jsonify({"error": "Invalid user"}), 401
@@ -270,7 +413,7 @@ def get_case_statistics():
     query = Case.query
 
     if current_user.role == "judge":
-        query = query.filter_by(judge_id=current_user_id)
+        query = query.filter_by(judge_id=current_user.id)
 
     total_cases = query.count()
     active_cases = query.filter_by(status="active").count()
@@ -1,9 +1,14 @@
 # app/routes/files.py
 from flask import Blueprint, request, jsonify, send_file
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import CaseFile, Case, User, db, AuditLog
+from app.models import CaseFile, Case, RelatedFile, db
 from app.utils.file_processing import save_uploaded_file, get_file_size_readable
 from app.utils.validators import validate_file_type
+from app.utils.audit import log_action
+from app.utils.events import event_hub, file_summary
+from app.utils.principal import current_principal
+from app.utils.ingest import ingest_file, forget_file
+from app.utils.fingerprint import duplicate_index
 import os
 from datetime import datetime
 from werkzeug.utils import secure_filename
@@ -14,7 +19,7 @@ files_bp = Blueprint('files', __name__)
 @jwt_required()
 def upload_file():
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user:
         return jsonify({'error': 'Invalid user'}), 401
@@ -40,7 +45,7 @@ def upload_file():
         return jsonify({'error': 'Case not found'}), 404
     
     # Check permissions
-    if current_user.role == 'judge' and case.judge_id != current_user_id:
+    if current_user.role == 'judge' and case.judge_id != current_user.id:
         return jsonify({'error': 'Access denied to this case'}), 403
     
     # Save file
@@ -59,24 +64,26 @@ def upload_file():
             uploaded_by_id=current_user_id
         )
         
-        db.session.add(case_file)
-        db.session.commit()
-        
         # Simple OCR processing (simulated)
         if enable_ocr and file.content_type in ['application/pdf', 'image/jpeg', 'image/png']:
             case_file.ocr_text = "Simulated OCR text from document. In production, this would contain actual extracted text."
             case_file.is_ocr_processed = True
         
+        db.session.add(case_file)
+        db.session.commit()
+        
+        ingest_file(case_file)
+        
         # Audit log
-        audit_log = AuditLog(
+        log_action(
+            'file_upload',
             user_id=current_user_id,
-            action='file_upload',
             resource_type='case_file',
             resource_id=case_file.id,
             details=f'Uploaded {file.filename} ({get_file_size_readable(file_size)}) to case {case.case_number}'
         )
-        db.session.add(audit_log)
-        db.session.commit()
+        
+        event_hub.publish('file', 'created', file_summary(case_file), judge_id=case.judge_id)
         
         return jsonify({
             'message': 'File uploaded successfully',
@@ -94,8 +101,7 @@ def upload_file():
 @files_bp.route('/<int:file_id>', methods=['GET'])
 @jwt_required()
 def get_file(file_id):
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user:
         return jsonify({'error': 'Invalid user'}), 401
@@ -104,7 +110,7 @@ def get_file(file_id):
     case = Case.query.get(case_file.case_id)
     
     # Check permissions
-    if current_user.role == 'judge' and case.judge_id != current_user_id:
+    if current_user.role == 'judge' and case.judge_id != current_user.id:
         return jsonify({'error': 'Access denied'}), 403
     
     return jsonify({
@@ -112,11 +118,75 @@ def get_file(file_id):
         'case': case.to_dict() if case else None
     }), 200
 
+@files_bp.route('/<int:file_id>/duplicates', methods=['GET'])
+@jwt_required()
+def get_file_duplicates(file_id):
+    """Near-duplicate copies of a file (e.g. rescans of the same affidavit)"""
+    current_user = current_principal()
+    
+    if not current_user:
+        return jsonify({'error': 'Invalid user'}), 401
+    
+    case_file = CaseFile.query.get_or_404(file_id)
+    case = Case.query.get(case_file.case_id)
+    
+    # Check permissions
+    if current_user.role == 'judge' and case.judge_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    similar = dict(duplicate_index.duplicates_of(file_id))
+    query = CaseFile.query.join(Case).filter(CaseFile.id.in_(list(similar)))
+    if current_user.role == 'judge':
+        query = query.filter(Case.judge_id == current_user.id)
+    
+    duplicates = []
+    for copy in query.all():
+        item = copy.to_dict()
+        item['similarity'] = similar[copy.id]
+        item['case_number'] = copy.case.case_number if copy.case else None
+        duplicates.append(item)
+    duplicates.sort(key=lambda item: -item['similarity'])
+    
+    return jsonify({'file_id': file_id, 'duplicates': duplicates}), 200
+
+@files_bp.route('/<int:file_id>/related', methods=['GET'])
+@jwt_required()
+def get_related_files(file_id):
+    """Similar files from other cases, precomputed from TF-IDF vectors"""
+    current_user = current_principal()
+    
+    if not current_user:
+        return jsonify({'error': 'Invalid user'}), 401
+    
+    case_file = CaseFile.query.get_or_404(file_id)
+    case = Case.query.get(case_file.case_id)
+    
+    # Check permissions
+    if current_user.role == 'judge' and case.judge_id != current_user.id:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    query = db.session.query(RelatedFile.score, CaseFile, Case)\
+        .join(CaseFile, CaseFile.id == RelatedFile.related_id)\
+        .join(Case, Case.id == CaseFile.case_id)\
+        .filter(RelatedFile.file_id == file_id)
+    if current_user.role == 'judge':
+        query = query.filter(Case.judge_id == current_user.id)
+    
+    related = []
+    for score, related_file, related_case in query.order_by(RelatedFile.score.desc()).limit(limit):
+        item = related_file.to_dict()
+        item['score'] = score
+        item['case'] = {'id': related_case.id, 'case_number': related_case.case_number, 'title': related_case.title}
+        related.append(item)
+    
+    return jsonify({'file_id': file_id, 'related': related}), 200
+
 @files_bp.route('/<int:file_id>/download', methods=['GET'])
 @jwt_required()
 def download_file(file_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user:
         return jsonify({'error': 'Invalid user'}), 401
@@ -125,19 +195,17 @@ def download_file(file_id):
     case = Case.query.get(case_file.case_id)
     
     # Check permissions
-    if current_user.role == 'judge' and case.judge_id != current_user_id:
+    if current_user.role == 'judge' and case.judge_id != current_user.id:
         return jsonify({'error': 'Access denied'}), 403
     
-    # Audit download
-    audit_log = AuditLog(
+    # Audit download (buffered, so the read never waits on a write)
+    log_action(
+        'file_download',
         user_id=current_user_id,
-        action='file_download',
         resource_type='case_file',
         resource_id=file_id,
         details=f'Downloaded {case_file.original_filename}'
     )
-    db.session.add(audit_log)
-    db.session.commit()
     
     return send_file(
         case_file.file_path,
@@ -149,7 +217,7 @@ def download_file(file_id):
 @jwt_required()
 def delete_file(file_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user or current_user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
@@ -163,26 +231,31 @@ def delete_file(file_id):
     except Exception as e:
         print(f"Warning: Could not delete file {case_file.file_path}: {e}")
     
-    # Audit before deletion
-    audit_log = AuditLog(
+    # Audit before deletion (same transaction)
+    log_action(
+        'file_delete',
         user_id=current_user_id,
-        action='file_delete',
         resource_type='case_file',
         resource_id=file_id,
-        details=f'Deleted {case_file.original_filename}'
+        details=f'Deleted {case_file.original_filename}',
+        sync=True
     )
-    db.session.add(audit_log)
     
+    deleted = file_summary(case_file)
+    judge_id = case_file.case.judge_id if case_file.case else None
+    
+    forget_file(file_id)
     db.session.delete(case_file)
     db.session.commit()
     
+    event_hub.publish('file', 'deleted', deleted, judge_id=judge_id)
+    
     return jsonify({'message': 'File deleted successfully'}), 200
 
 @files_bp.route('/case/<int:case_id>', methods=['GET'])
 @jwt_required()
 def get_case_files(case_id):
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user:
         return jsonify({'error': 'Invalid user'}), 401
@@ -190,7 +263,7 @@ def get_case_files(case_id):
     case = Case.query.get_or_404(case_id)
     
     # Check permissions
-    if current_user.role == 'judge' and case.judge_id != current_user_id:
+    if current_user.role == 'judge' and case.judge_id != current_user.id:
         return jsonify({'error': 'Access denied'}), 403
     
     files = CaseFile.query.filter_by(case_id=case_id)\
@@ -204,8 +277,7 @@ def get_case_files(case_id):
 @files_bp.route('/recent', methods=['GET'])
 @jwt_required()
 def get_recent_files():
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user:
         return jsonify({'error': 'Invalid user'}), 401
@@ -215,7 +287,7 @@ def get_recent_files():
     
     # Judges only see files from their cases
     if current_user.role == 'judge':
-        query = query.join(Case).filter(Case.judge_id == current_user_id)
+        query = query.join(Case).filter(Case.judge_id == current_user.id)
     
     recent_files = query.order_by(CaseFile.created_at.desc())\
         .limit(10)\
@@ -1,7 +1,11 @@
 # app/routes/reports.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import Case, User, CaseFile, AuditLog, db
+from app.models import Case, User, CaseFile, db
+from app.utils.events import event_hub
+from app.utils.audit import log_action
+from app.utils.audit_archive import query_audit, count_audit
+from app.utils.principal import current_principal
 from datetime import datetime, timedelta
 import json
 
@@ -11,8 +15,7 @@ reports_bp = Blueprint('reports', __name__)
 @jwt_required()
 def dashboard_report():
     """Get dashboard statistics"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user:
         return jsonify({'error': 'Invalid user'}), 401
@@ -23,8 +26,8 @@ def dashboard_report():
     
     # Filter by user role
     if current_user.role == 'judge':
-        cases_query = cases_query.filter_by(judge_id=current_user_id)
-        files_query = files_query.join(Case).filter(Case.judge_id == current_user_id)
+        cases_query = cases_query.filter_by(judge_id=current_user.id)
+        files_query = files_query.join(Case).filter(Case.judge_id == current_user.id)
     
     # Calculate statistics
     total_cases = cases_query.count()
@@ -74,12 +77,39 @@ def dashboard_report():
         }
     })
 
+@reports_bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def dashboard_stream():
+    """
+    Push dashboard deltas as Server-Sent Events.
+
+    EventSource cannot send headers, so the token may also be passed as
+    `?jwt=<token>`. Judges only receive events for their own cases.
+    """
+    current_user = current_principal()
+    
+    if not current_user:
+        return jsonify({'error': 'Invalid user'}), 401
+    
+    subscription = event_hub.subscribe(current_user.id, current_user.role)
+    
+    # Hand the connection back to the pool; the stream never queries the DB
+    db.session.close()
+    
+    return Response(
+        event_hub.stream(subscription),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @reports_bp.route('/activity', methods=['GET'])
 @jwt_required()
 def activity_report():
     """Get system activity report"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user or current_user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
@@ -87,12 +117,8 @@ def activity_report():
     days = int(request.args.get('days', 7))
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    # Get audit logs
-    logs = AuditLog.query\
-        .filter(AuditLog.created_at >= start_date)\
-        .order_by(AuditLog.created_at.desc())\
-        .limit(100)\
-        .all()
+    # Get audit logs (spans hot, partitioned and archived entries)
+    logs = query_audit(start=start_date, limit=100)
     
     # Get user activity
     active_users = User.query\
@@ -106,15 +132,12 @@ def activity_report():
     
     return jsonify({
         'period': f'Last {days} days',
-        'audit_logs': [log.to_dict() for log in logs],
+        'audit_logs': logs,
         'metrics': {
             'active_users': active_users,
             'file_uploads': uploads,
             'case_creations': Case.query.filter(Case.created_at >= start_date).count(),
-            'user_logins': AuditLog.query.filter(
-                AuditLog.action == 'login',
-                AuditLog.created_at >= start_date
-            ).count()
+            'user_logins': count_audit(start=start_date, action='login')
         }
     })
 
@@ -123,7 +146,7 @@ def activity_report():
 def export_report():
     """Export report data"""
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user:
         return jsonify({'error': 'Invalid user'}), 401
@@ -135,7 +158,7 @@ def export_report():
     if report_type == 'cases':
         query = Case.query
         if current_user.role == 'judge':
-            query = query.filter_by(judge_id=current_user_id)
+            query = query.filter_by(judge_id=current_user.id)
         
         cases = query.all()
         report_data = [case.to_dict() for case in cases]
@@ -143,7 +166,7 @@ def export_report():
     elif report_type == 'files':
         query = CaseFile.query
         if current_user.role == 'judge':
-            query = query.join(Case).filter(Case.judge_id == current_user_id)
+            query = query.join(Case).filter(Case.judge_id == current_user.id)
         
         files = query.all()
         report_data = [file.to_dict() for file in files]
@@ -164,14 +187,12 @@ def export_report():
         writer.writerows(report_data)
     
     # Audit the export
-    audit_log = AuditLog(
+    log_action(
+        'report_export',
         user_id=current_user_id,
-        action='report_export',
         resource_type='report',
         details=f'Exported {report_type} report'
     )
-    db.session.add(audit_log)
-    db.session.commit()
     
     return jsonify({
         'message': 'Report generated',
@@ -1,17 +1,32 @@
 # app/routes/search.py
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import CaseFile, Case, User
-from sqlalchemy import or_, and_
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from app.models import CaseFile, Case, Entity, EntityPosting, FileFingerprint, SavedSearch, SearchNotification, db
+from app.utils.entities import KINDS, entity_index, entity_key
+from app.utils import percolator
+from app.utils.analysis import query_words
+from app.utils.facets import compute_facets, parse_facets
+from app.utils.fingerprint import duplicate_index
+from app.utils.principal import current_principal
+from app.utils.query_language import QueryPlan, QuerySyntaxError, Term, parse_query
+from app.utils.rate_limit import rate_limit
+from app.utils.search_cache import search_cache
+from app.utils.search_log import search_log
+from app.utils.search_index import fuzzy_match
+from app.utils.snippets import build_snippets
+from app.utils.spelling import suggest_query
+from sqlalchemy import or_, and_, func, select
 from datetime import datetime, timedelta
+import time
 
 search_bp = Blueprint('search', __name__)
 
 @search_bp.route('', methods=['GET'])
 @jwt_required()
+@rate_limit('search')
 def search_files():
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    started = time.perf_counter()
+    current_user = current_principal()
     
     if not current_user:
         return jsonify({'error': 'Invalid user'}), 401
@@ -23,42 +38,54 @@ def search_files():
     date_from = request.args.get('date_from')
     date_to = request.args.get('date_to')
     search_in_content = request.args.get('search_in_content', 'true').lower() == 'true'
+    fuzzy = request.args.get('fuzzy', 'false').lower() == 'true'
+    max_edits = request.args.get('max_edits', type=int)
+    with_snippets = request.args.get('snippets', 'true').lower() == 'true'
+    collapse = request.args.get('collapse', 'false').lower() == 'true'
+    suggest = request.args.get('suggest', 'true').lower() == 'true'
     
     if not query and not case_number:
         return jsonify({'error': 'Search query or case number required'}), 400
     
+    try:
+        facet_names = parse_facets(request.args.get('facets'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    scope = current_user.id if current_user.role == 'judge' else 'all'
+    cache_key = search_cache.key('search', request.args, scope)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        search_log.record('search', request.args, scope, cached['total'], started, cache_hit=True)
+        return jsonify(cached)
+    
     # Build search query
     search_query = CaseFile.query.join(Case)
     
     # Apply user permissions
     if current_user.role == 'judge':
-        search_query = search_query.filter(Case.judge_id == current_user_id)
+        search_query = search_query.filter(Case.judge_id == current_user.id)
     
     # Search conditions
     conditions = []
+    expansions = {}
     
-    if query:
-        # Search in filename
-        filename_condition = CaseFile.original_filename.ilike(f'%{query}%')
-        
-        # Search in OCR text if enabled
-        content_condition = None
-        if search_in_content:
-            content_condition = CaseFile.ocr_text.ilike(f'%{query}%')
-        
-        # Search in case details
-        case_conditions = or_(
+    if query and query_words(query):
+        # Full-text index: every query word must match (by stem, or
+        # approximately with fuzzy=true); the last word may be a prefix
+        fields = None if search_in_content else ['title', 'number', 'filename']
+        matched, expansions = fuzzy_match(query, fields, max_edits if fuzzy else 0, prefix=True)
+        conditions.append(CaseFile.id.in_(matched))
+    elif query:
+        # Only stop words, which are not indexed: match the text as typed
+        search_condition = or_(
+            CaseFile.original_filename.ilike(f'%{query}%'),
             Case.case_number.ilike(f'%{query}%'),
             Case.title.ilike(f'%{query}%'),
             Case.description.ilike(f'%{query}%')
         )
-        
-        # Combine conditions
-        if content_condition:
-            search_condition = or_(filename_condition, content_condition, case_conditions)
-        else:
-            search_condition = or_(filename_condition, case_conditions)
-        
+        if search_in_content:
+            search_condition = or_(search_condition, CaseFile.ocr_text.ilike(f'%{query}%'))
         conditions.append(search_condition)
     
     if case_number:
@@ -92,6 +119,15 @@ def search_files():
     if conditions:
         search_query = search_query.filter(and_(*conditions))
     
+    # Keep one file (the earliest matching) per near-duplicate group
+    if collapse:
+        group_key = func.coalesce(FileFingerprint.duplicate_of, CaseFile.id)
+        ranked = search_query.outerjoin(FileFingerprint, FileFingerprint.file_id == CaseFile.id)\
+            .with_entities(CaseFile.id.label('id'),
+                           func.row_number().over(partition_by=group_key, order_by=CaseFile.id).label('rank'))\
+            .subquery()
+        search_query = search_query.filter(CaseFile.id.in_(select(ranked.c.id).where(ranked.c.rank == 1)))
+    
     # Pagination
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
@@ -100,20 +136,30 @@ def search_files():
     results = search_query.order_by(CaseFile.created_at.desc())\
         .paginate(page=page, per_page=per_page, error_out=False)
     
+    # Highlighted passages come from the positional index
+    snippets = {}
+    if query and with_snippets and search_in_content:
+        terms = [t for terms in expansions.values() for t in terms]
+        snippets = build_snippets([r.id for r in results.items], terms)
+    
+    duplicates = duplicate_index.group_info(r.id for r in results.items)
+    
     # Format results with relevance scoring
     formatted_results = []
     for result in results.items:
         result_dict = result.to_dict()
+        result_dict['snippets'] = snippets.get(result.id, [])
+        result_dict.update(duplicates.get(result.id, {'duplicate_of': None, 'duplicate_count': 0}))
         
         # Calculate relevance score (simplified)
         relevance = 0
         if query:
-            query_lower = query.lower()
-            if query_lower in result.original_filename.lower():
+            needles = [t for terms in expansions.values() for t in terms] if fuzzy else [query.lower()]
+            if any(n in result.original_filename.lower() for n in needles):
                 relevance += 30
-            if result.ocr_text and query_lower in result.ocr_text.lower():
+            if result.ocr_text and any(n in result.ocr_text.lower() for n in needles):
                 relevance += 50
-            if query_lower in result.case.case_number.lower():
+            if any(n in result.case.case_number.lower() for n in needles):
                 relevance += 20
         
         result_dict['relevance'] = min(relevance, 100)
@@ -125,20 +171,34 @@ def search_files():
     if query:
         formatted_results.sort(key=lambda x: x['relevance'], reverse=True)
     
-    return jsonify({
+    response = {
         'results': formatted_results,
         'total': results.total,
         'pages': results.pages,
         'current_page': page,
         'per_page': per_page
-    })
+    }
+    if fuzzy:
+        response['fuzzy_terms'] = expansions
+    if query and suggest and results.total < current_app.config.get('SEARCH_SUGGEST_BELOW', 3):
+        response['did_you_mean'] = suggest_query(query)
+    if facet_names:
+        response['facets'] = compute_facets(search_query, facet_names)
+    
+    search_cache.put(cache_key, response,
+                     judge_id=judge_id if current_user.role in ['admin', 'clerk'] else None,
+                     document_type=document_type)
+    search_log.record('search', request.args, scope, results.total, started)
+    
+    return jsonify(response)
 
 @search_bp.route('/advanced', methods=['GET'])
 @jwt_required()
+@rate_limit('search')
 def advanced_search():
     """Advanced search with more options"""
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    started = time.perf_counter()
+    current_user = current_principal()
     
     if not current_user:
         return jsonify({'error': 'Invalid user'}), 401
@@ -148,58 +208,356 @@ def advanced_search():
     exact_phrase = request.args.get('exact_phrase', 'false').lower() == 'true'
     include_ocr = request.args.get('include_ocr', 'true').lower() == 'true'
     include_metadata = request.args.get('include_metadata', 'true').lower() == 'true'
+    fuzzy = request.args.get('fuzzy', 'false').lower() == 'true'
+    max_edits = request.args.get('max_edits', type=int)
+    default_operator = request.args.get('default_operator', 'and').lower()
+    explain = request.args.get('explain', 'false').lower() == 'true'
+    with_snippets = request.args.get('snippets', 'true').lower() == 'true'
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
     
     if not query:
         return jsonify({'error': 'Search query required'}), 400
+    if default_operator not in ('and', 'or'):
+        return jsonify({'error': 'default_operator must be "and" or "or"'}), 400
     
-    # Build search query
-    search_query = CaseFile.query.join(Case)
+    scope = current_user.id if current_user.role == 'judge' else 'all'
+    cache_key = search_cache.key('advanced', request.args, scope)
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        search_log.record('advanced', request.args, scope, cached['total'], started, cache_hit=True)
+        return jsonify(cached)
+    
+    # Unqualified terms search these index fields
+    fields = ['title', 'number']
+    if include_metadata:
+        fields.append('filename')
+    if include_ocr:
+        fields.append('content')
+    
+    try:
+        parsed = Term(None, query, phrase=True) if exact_phrase else parse_query(query, default_operator)
+        plan = QueryPlan(fields, fuzzy=fuzzy, max_edits=max_edits, explain=explain)
+        condition = plan.compile(parsed)
+    except QuerySyntaxError as e:
+        return jsonify({'error': f'Invalid query: {e}', 'position': e.position}), 400
+    
+    search_query = CaseFile.query.join(Case).filter(condition)
     
     # Apply user permissions
     if current_user.role == 'judge':
-        search_query = search_query.filter(Case.judge_id == current_user_id)
-    
-    # Build search conditions
-    conditions = []
+        search_query = search_query.filter(Case.judge_id == current_user.id)
     
-    if exact_phrase:
-        # Exact phrase matching
-        if include_metadata:
-            conditions.append(CaseFile.original_filename.contains(query))
-        if include_ocr and query:
-            conditions.append(CaseFile.ocr_text.contains(query))
-        conditions.append(Case.case_number.contains(query))
-        conditions.append(Case.title.contains(query))
-    else:
-        # Fuzzy matching
-        search_terms = query.split()
-        for term in search_terms:
-            term_conditions = []
-            if include_metadata:
-                term_conditions.append(CaseFile.original_filename.ilike(f'%{term}%'))
-            if include_ocr:
-                term_conditions.append(CaseFile.ocr_text.ilike(f'%{term}%'))
-            term_conditions.append(Case.case_number.ilike(f'%{term}%'))
-            term_conditions.append(Case.title.ilike(f'%{term}%'))
-            
-            if term_conditions:
-                conditions.append(or_(*term_conditions))
-    
-    # Apply conditions
-    if conditions:
-        search_query = search_query.filter(or_(*conditions))
+    results = search_query.order_by(CaseFile.created_at.desc(), CaseFile.id.desc())\
+        .paginate(page=page, per_page=per_page, error_out=False)
     
-    # Execute query
-    files = search_query.order_by(CaseFile.created_at.desc()).limit(100).all()
+    snippets = {}
+    if with_snippets and include_ocr:
+        snippets = build_snippets([f.id for f in results.items], plan.highlight_terms)
     
     # Format results
     formatted_results = []
-    for file in files:
+    for file in results.items:
         result = file.to_dict()
+        result['snippets'] = snippets.get(file.id, [])
         result['case'] = file.case.to_dict() if file.case else None
         formatted_results.append(result)
     
-    return jsonify({
+    response = {
         'results': formatted_results,
-        'count': len(formatted_results)
+        'count': len(formatted_results),
+        'total': results.total,
+        'pages': results.pages,
+        'current_page': page,
+        'per_page': per_page
+    }
+    if explain:
+        response['plan'] = plan.steps
+    
+    # Filters live inside the query text, so any change may affect this entry
+    search_cache.put(cache_key, response)
+    search_log.record('advanced', request.args, scope, results.total, started)
+    
+    return jsonify(response)
+
+@search_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+def search_cache_stats():
+    """Hit/miss counters of this worker's search result cache"""
+    current_user = current_principal()
+    
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    return jsonify(search_cache.stats())
+
+@search_bp.route('/cache/prewarm', methods=['POST'])
+@jwt_required()
+def prewarm_search_cache():
+    """Replay the most frequent logged searches into this worker's cache"""
+    current_user = current_principal()
+    
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    limit = max(min(request.args.get('limit', search_log.prewarm_top or 20, type=int), 200), 0)
+    return jsonify({'prewarmed': search_log.prewarm(limit)})
+
+@search_bp.route('/analytics', methods=['GET'])
+@jwt_required()
+def search_analytics():
+    """Top, slowest and zero-result queries from the search log"""
+    current_user = current_principal()
+    
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    days = request.args.get('days', 7, type=int)
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    
+    report = search_log.report(since=time.time() - days * 86400, limit=limit)
+    report['days'] = days
+    return jsonify(report)
+
+# ----------------------------------------------------------------------
+# Saved searches and their notifications
+# ----------------------------------------------------------------------
+@search_bp.route('/saved', methods=['GET'])
+@jwt_required()
+def list_saved_searches():
+    current_user = current_principal()
+    
+    if not current_user:
+        return jsonify({'error': 'Invalid user'}), 401
+    
+    saved = SavedSearch.query.filter_by(user_id=current_user.id).order_by(SavedSearch.created_at.desc()).all()
+    return jsonify({'saved_searches': [s.to_dict() for s in saved]})
+
+@search_bp.route('/saved', methods=['POST'])
+@jwt_required()
+def create_saved_search():
+    """Save an advanced-search query; new files matching it raise notifications"""
+    current_user = current_principal()
+    
+    if not current_user:
+        return jsonify({'error': 'Invalid user'}), 401
+    
+    data = request.get_json() or {}
+    name = (data.get('name') or '').strip()
+    query = (data.get('query') or '').strip()
+    if not name or not query:
+        return jsonify({'error': 'name and query are required'}), 400
+    
+    limit = current_app.config.get('SAVED_SEARCH_MAX_PER_USER', 50)
+    if SavedSearch.query.filter_by(user_id=current_user.id).count() >= limit:
+        return jsonify({'error': f'At most {limit} saved searches per user'}), 400
+    
+    saved = SavedSearch(user_id=current_user.id, name=name[:100], query_text=query)
+    db.session.add(saved)
+    try:
+        percolator.register(saved)
+    except QuerySyntaxError as e:
+        db.session.rollback()
+        return jsonify({'error': f'Invalid query: {e}', 'position': e.position}), 400
+    db.session.commit()
+    
+    return jsonify({'message': 'Search saved', 'saved_search': saved.to_dict()}), 201
+
+@search_bp.route('/saved/<int:saved_id>', methods=['PUT'])
+@jwt_required()
+def update_saved_search(saved_id):
+    current_user = current_principal()
+    
+    if not current_user:
+        return jsonify({'error': 'Invalid user'}), 401
+    
+    saved = SavedSearch.query.filter_by(id=saved_id, user_id=current_user.id).first_or_404()
+    data = request.get_json() or {}
+    
+    if data.get('name'):
+        saved.name = data['name'].strip()[:100]
+    if 'is_active' in data:
+        saved.is_active = bool(data['is_active'])
+    if data.get('query') and data['query'].strip() != saved.query_text:
+        saved.query_text = data['query'].strip()
+        try:
+            percolator.register(saved)
+        except QuerySyntaxError as e:
+            db.session.rollback()
+            return jsonify({'error': f'Invalid query: {e}', 'position': e.position}), 400
+    db.session.commit()
+    
+    return jsonify({'message': 'Saved search updated', 'saved_search': saved.to_dict()})
+
+@search_bp.route('/saved/<int:saved_id>', methods=['DELETE'])
+@jwt_required()
+def delete_saved_search(saved_id):
+    current_user = current_principal()
+    
+    if not current_user:
+        return jsonify({'error': 'Invalid user'}), 401
+    
+    saved = SavedSearch.query.filter_by(id=saved_id, user_id=current_user.id).first_or_404()
+    SearchNotification.query.filter_by(saved_search_id=saved.id).delete(synchronize_session=False)
+    db.session.delete(saved)
+    db.session.commit()
+    
+    return jsonify({'message': 'Saved search deleted'})
+
+@search_bp.route('/notifications', methods=['GET'])
+@jwt_required()
+def list_notifications():
+    current_user = current_principal()
+    
+    if not current_user:
+        return jsonify({'error': 'Invalid user'}), 401
+    
+    unread_only = request.args.get('unread', 'false').lower() == 'true'
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    
+    query = db.session.query(SearchNotification, SavedSearch.name, CaseFile.original_filename, Case.case_number)\
+        .join(SavedSearch, SavedSearch.id == SearchNotification.saved_search_id)\
+        .join(CaseFile, CaseFile.id == SearchNotification.file_id)\
+        .outerjoin(Case, Case.id == SearchNotification.case_id)\
+        .filter(SearchNotification.user_id == current_user.id)
+    if unread_only:
+        query = query.filter(SearchNotification.read_at.is_(None))
+    
+    rows = query.order_by(SearchNotification.created_at.desc(), SearchNotification.id.desc())\
+        .offset((page - 1) * per_page).limit(per_page).all()
+    unread = SearchNotification.query.filter_by(user_id=current_user.id, read_at=None).count()
+    
+    notifications = []
+    for notification, search_name, filename, case_number in rows:
+        item = notification.to_dict()
+        item.update({'saved_search': search_name, 'filename': filename, 'case_number': case_number})
+        notifications.append(item)
+    
+    return jsonify({
+        'notifications': notifications,
+        'unread': unread,
+        'current_page': page,
+        'per_page': per_page
+    })
+
+@search_bp.route('/notifications/read', methods=['POST'])
+@jwt_required()
+def mark_notifications_read():
+    """Mark the given notification ids (or all with {"all": true}) as read"""
+    current_user = current_principal()
+    
+    if not current_user:
+        return jsonify({'error': 'Invalid user'}), 401
+    
+    data = request.get_json() or {}
+    query = SearchNotification.query.filter(SearchNotification.user_id == current_user.id,
+                                            SearchNotification.read_at.is_(None))
+    if not data.get('all'):
+        ids = data.get('ids')
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return jsonify({'error': 'ids must be a list of notification ids'}), 400
+        query = query.filter(SearchNotification.id.in_(ids))
+    
+    updated = query.update({'read_at': datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    
+    return jsonify({'message': f'{updated} notifications marked as read', 'updated': updated})
+
+
+# ----------------------------------------------------------------------
+# Entities (parties, advocates, statutes, dates)
+# ----------------------------------------------------------------------
+@search_bp.route('/entities', methods=['GET'])
+@jwt_required()
+def search_entities():
+    """Entities whose normalised name starts with q, with file and case counts"""
+    current_user = current_principal()
+    
+    if not current_user:
+        return jsonify({'error': 'Invalid user'}), 401
+    
+    kind = request.args.get('kind')
+    if kind and kind not in KINDS:
+        return jsonify({'error': f"kind must be one of: {', '.join(KINDS)}"}), 400
+    
+    prefix = entity_key(kind or 'party', request.args.get('q', ''))
+    limit = min(request.args.get('limit', 20, type=int), 100)
+    judge_id = current_user.id if current_user.role == 'judge' else None
+    
+    query = Entity.query
+    if kind:
+        query = query.filter(Entity.kind == kind)
+    if prefix:
+        # Range on the key index rather than LIKE
+        query = query.filter(Entity.key >= prefix, Entity.key < prefix + '\uffff')
+    if judge_id is not None:
+        query = query.filter(Entity.id.in_(
+            select(EntityPosting.entity_id).join(Case, Case.id == EntityPosting.case_id)
+            .where(Case.judge_id == judge_id)
+        ))
+    
+    entities = query.order_by(Entity.file_count.desc(), Entity.key).limit(limit).all()
+    counts = entity_index.counts([e.id for e in entities], judge_id) if entities else {}
+    
+    results = []
+    for entity in entities:
+        item = entity.to_dict()
+        item['file_count'], item['case_count'] = counts.get(entity.id, (0, 0))
+        results.append(item)
+    
+    return jsonify({'entities': results})
+
+@search_bp.route('/entities/<int:entity_id>', methods=['GET'])
+@jwt_required()
+def get_entity_cases(entity_id):
+    """Cases mentioning an entity, most mentions first"""
+    current_user = current_principal()
+    
+    if not current_user:
+        return jsonify({'error': 'Invalid user'}), 401
+    
+    entity = Entity.query.get_or_404(entity_id)
+    judge_id = current_user.id if current_user.role == 'judge' else None
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    
+    # Totals per case first, then the cases joined to them: grouping by
+    # the posting column alone while selecting Case is invalid on PostgreSQL
+    totals = db.session.query(
+        EntityPosting.case_id.label('case_id'),
+        func.sum(EntityPosting.mentions).label('mentions'),
+        func.count(EntityPosting.file_id).label('files'),
+        func.min(EntityPosting.first_page).label('first_page')
+    ).filter(EntityPosting.entity_id == entity.id)\
+        .group_by(EntityPosting.case_id)\
+        .subquery()
+    
+    query = db.session.query(Case, totals.c.mentions, totals.c.files, totals.c.first_page)\
+        .join(totals, totals.c.case_id == Case.id)
+    if judge_id is not None:
+        query = query.filter(Case.judge_id == judge_id)
+    
+    item = entity.to_dict()
+    item['file_count'], item['case_count'] = entity_index.counts([entity.id], judge_id).get(entity.id, (0, 0))
+    total = item['case_count']
+    rows = query.order_by(totals.c.mentions.desc(), Case.id)\
+        .offset((page - 1) * per_page).limit(per_page).all()
+    
+    cases = [{
+        'id': case.id,
+        'case_number': case.case_number,
+        'title': case.title,
+        'status': case.status,
+        'mentions': mentions,
+        'files': files,
+        'first_page': first_page
+    } for case, mentions, files, first_page in rows]
+    
+    return jsonify({
+        'entity': item,
+        'cases': cases,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+        'current_page': page
     })
\ No newline at end of file
@@ -1,7 +1,18 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import User, db, AuditLog
-from app.utils.auth import hash_password
+from sqlalchemy import select, update, insert, or_
+from app.models import User, db
+from app.utils.auth import hash_password, hash_passwords, HashingBusy, hashing_busy_response
+from app.utils.audit import log_action, log_actions
+from app.utils.validators import validate_email_domain
+from app.utils.principal import current_principal, invalidate_principal
+from app.utils.revocation import revocation_list
+from app.utils.user_directory import directory_match, search_directory, normalize_name
+import csv
+import io
+import json
+import secrets
+from datetime import datetime
 
 users_bp = Blueprint('users', __name__)
 
@@ -11,8 +22,7 @@ users_bp = Blueprint('users', __name__)
 @users_bp.route('', methods=['GET'])
 @jwt_required()
 def get_all_users():
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user or current_user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
@@ -23,14 +33,13 @@ def get_all_users():
     status = request.args.get('status', '')
     
     query = User.query
+    order = [User.created_at.desc()]
     
     # Apply filters
-    if search:
-        query = query.filter(
-            (User.full_name.ilike(f'%{search}%')) |
-            (User.email.ilike(f'%{search}%')) |
-            (User.employee_id.ilike(f'%{search}%'))
-        )
+    if search.strip():
+        condition, rank = directory_match(search)
+        query = query.filter(condition)
+        order = [rank, User.search_name]
     
     if role:
         query = query.filter_by(role=role)
@@ -40,7 +49,9 @@ def get_all_users():
     elif status == 'inactive':
         query = query.filter_by(is_active=False)
     elif status == 'pending':
-        query = query.filter_by(is_approved=False)
+        query = query.filter_by(is_approved=False, is_active=True)
+    elif status == 'rejected':
+        query = query.filter_by(is_approved=False, is_active=False)
     elif status == 'approved':
         query = query.filter_by(is_approved=True)
     
@@ -48,7 +59,7 @@ def get_all_users():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 20, type=int)
     
-    users = query.order_by(User.created_at.desc())\
+    users = query.order_by(*order)\
         .paginate(page=page, per_page=per_page, error_out=False)
     
     return jsonify({
@@ -59,20 +70,40 @@ def get_all_users():
     }), 200
 
 
+# ---------------------------------------------------------
+# USER DIRECTORY TYPEAHEAD
+# ---------------------------------------------------------
+@users_bp.route('/directory', methods=['GET'])
+@jwt_required()
+def user_directory():
+    current_user = current_principal()
+    
+    if not current_user or current_user.role not in ['admin', 'clerk']:
+        return jsonify({'error': 'Access denied'}), 403
+    
+    search = request.args.get('q', '').strip()
+    if not search:
+        return jsonify({'users': []}), 200
+    
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    users = search_directory(search, limit=limit, role=request.args.get('role'))
+    
+    return jsonify({'users': users}), 200
+
+
 # ---------------------------------------------------------
 # GET PENDING USERS
 # ---------------------------------------------------------
 @users_bp.route('/pending', methods=['GET'])
 @jwt_required()
 def get_pending_users():
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user or current_user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
     
     # Get pending users
-    pending_users = User.query.filter_by(is_approved=False).all()
+    pending_users = User.query.filter_by(is_approved=False, is_active=True).all()
     
     return jsonify({
         'users': [user.to_dict() for user in pending_users],
@@ -87,7 +118,7 @@ def get_pending_users():
 @jwt_required()
 def approve_user(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user or current_user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
@@ -100,16 +131,17 @@ def approve_user(user_id):
     user.is_active = True
     
     # Audit log
-    audit_log = AuditLog(
+    log_action(
+        'user_approve',
         user_id=current_user_id,
-        action='user_approve',
         resource_type='user',
         resource_id=user_id,
-        details=f'Approved user {user.email} ({user.role})'
+        details=f'Approved user {user.email} ({user.role})',
+        sync=True
     )
     
-    db.session.add(audit_log)
     db.session.commit()
+    invalidate_principal(user_id)
     
     return jsonify({
         'message': 'User approved successfully',
@@ -124,7 +156,7 @@ def approve_user(user_id):
 @jwt_required()
 def reject_user(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user or current_user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
@@ -136,20 +168,25 @@ def reject_user(user_id):
     data = request.get_json() or {}
     reason = data.get('reason', 'No reason provided')
     
-    # Audit log before deletion
-    audit_log = AuditLog(
+    # Rejected accounts are kept, unapproved and inactive: the sealed audit
+    # chain references them by id, and deleting would rewrite those rows
+    user.is_approved = False
+    user.is_active = False
+    
+    log_action(
+        'user_reject',
         user_id=current_user_id,
-        action='user_reject',
         resource_type='user',
         resource_id=user_id,
-        details=f'Rejected user {user.email}: {reason}'
+        details=f'Rejected user {user.email}: {reason}',
+        sync=True
     )
     
-    db.session.add(audit_log)
-    db.session.delete(user)
     db.session.commit()
+    invalidate_principal(user_id)
+    revocation_list.revoke_user(user_id)
     
-    return jsonify({'message': 'User rejected and deleted'}), 200
+    return jsonify({'message': 'User rejected', 'user': user.to_dict()}), 200
 
 
 # ---------------------------------------------------------
@@ -159,7 +196,7 @@ def reject_user(user_id):
 @jwt_required()
 def reset_user_password(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user:
         return jsonify({'error': 'Unauthorized'}), 401
@@ -181,16 +218,17 @@ def reset_user_password(user_id):
     user.password_hash = hash_password(new_password)
     
     # Audit log
-    audit_log = AuditLog(
+    log_action(
+        'password_reset',
         user_id=current_user_id,
-        action='password_reset',
         resource_type='user',
         resource_id=user_id,
-        details='Password reset by ' + ('self' if current_user.id == user_id else 'admin')
+        details='Password reset by ' + ('self' if current_user.id == user_id else 'admin'),
+        sync=True
     )
     
-    db.session.add(audit_log)
     db.session.commit()
+    revocation_list.revoke_user(user_id)
     
     return jsonify({'message': 'Password reset successfully'}), 200
 
@@ -202,7 +240,7 @@ def reset_user_password(user_id):
 @jwt_required()
 def update_user(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user:
         return jsonify({'error': 'Unauthorized'}), 401
@@ -233,16 +271,17 @@ def update_user(user_id):
             user.is_active = bool(data['is_active'])
     
     # Audit log
-    audit_log = AuditLog(
+    log_action(
+        'user_update',
         user_id=current_user_id,
-        action='user_update',
         resource_type='user',
         resource_id=user_id,
-        details='User profile updated'
+        details='User profile updated',
+        sync=True
     )
     
-    db.session.add(audit_log)
     db.session.commit()
+    invalidate_principal(user_id)
     
     return jsonify({
         'message': 'User updated successfully',
@@ -257,7 +296,7 @@ def update_user(user_id):
 @jwt_required()
 def toggle_user_active(user_id):
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user or current_user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
@@ -270,16 +309,19 @@ def toggle_user_active(user_id):
     action = 'activated' if user.is_active else 'deactivated'
     
     # Audit log
-    audit_log = AuditLog(
+    log_action(
+        'user_toggle_active',
         user_id=current_user_id,
-        action='user_toggle_active',
         resource_type='user',
         resource_id=user_id,
-        details=f'User {action}: {user.email}'
+        details=f'User {action}: {user.email}',
+        sync=True
     )
     
-    db.session.add(audit_log)
     db.session.commit()
+    invalidate_principal(user_id)
+    if not user.is_active:
+        revocation_list.revoke_user(user_id)
     
     return jsonify({
         'message': f'User {action} successfully',
@@ -287,21 +329,344 @@ def toggle_user_active(user_id):
     }), 200
 
 
+# ---------------------------------------------------------
+# BULK OPERATIONS (Admin only)
+# ---------------------------------------------------------
+IMPORT_ROLES = ['judge', 'clerk', 'admin']
+
+
+def _bulk_ids():
+    """De-duplicated user IDs from the request body, or an error response."""
+    data = request.get_json(silent=True)
+    ids = data.get('user_ids') if isinstance(data, dict) else None
+    limit = current_app.config.get('USER_BULK_MAX', 1000)
+
+    if not isinstance(ids, list) or not ids:
+        return None, (jsonify({'error': 'user_ids must be a non-empty list'}), 400)
+    if len(ids) > limit:
+        return None, (jsonify({'error': f'At most {limit} users per request'}), 400)
+    try:
+        return list(dict.fromkeys(int(i) for i in ids)), None
+    except (TypeError, ValueError):
+        return None, (jsonify({'error': 'user_ids must be integers'}), 400)
+
+
+def _bulk_lookup(ids):
+    """One query for everything the bulk endpoints need to decide per user."""
+    rows = db.session.execute(
+        select(User.id, User.email, User.role, User.is_approved, User.is_active)
+        .where(User.id.in_(ids))
+    ).all()
+    return {row.id: row for row in rows}
+
+
+def _bulk_summary(results):
+    counts = {}
+    for result in results:
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+    return counts
+
+
+@users_bp.route('/bulk/approve', methods=['POST'])
+@jwt_required()
+def bulk_approve_users():
+    current_user = current_principal()
+    
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    ids, error = _bulk_ids()
+    if error:
+        return error
+    
+    found = _bulk_lookup(ids)
+    results, targets = [], []
+    for user_id in ids:
+        user = found.get(user_id)
+        if not user:
+            results.append({'id': user_id, 'status': 'not_found'})
+        elif user.is_approved and user.is_active:
+            results.append({'id': user_id, 'status': 'unchanged', 'reason': 'Already approved'})
+        else:
+            targets.append(user)
+            results.append({'id': user_id, 'status': 'approved'})
+    
+    if targets:
+        db.session.execute(
+            # Same field changes as approve_user
+            update(User).where(User.id.in_([u.id for u in targets])).values(is_approved=True, is_active=True),
+            execution_options={'synchronize_session': False}
+        )
+        log_actions(
+            [{'resource_id': u.id, 'details': f'Approved user {u.email} ({u.role})'} for u in targets],
+            user_id=current_user.id,
+            action='user_approve',
+            resource_type='user',
+            sync=True
+        )
+        db.session.commit()
+        for user in targets:
+            invalidate_principal(user.id)
+    
+    return jsonify({'results': results, 'summary': _bulk_summary(results)}), 200
+
+
+@users_bp.route('/bulk/reject', methods=['POST'])
+@jwt_required()
+def bulk_reject_users():
+    current_user = current_principal()
+    
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    ids, error = _bulk_ids()
+    if error:
+        return error
+    reason = (request.get_json(silent=True) or {}).get('reason', 'No reason provided')
+    
+    found = _bulk_lookup(ids)
+    results, targets = [], []
+    for user_id in ids:
+        user = found.get(user_id)
+        if not user:
+            results.append({'id': user_id, 'status': 'not_found'})
+        elif user.is_approved:
+            # Bulk reject only clears pending registrations, never live accounts
+            results.append({'id': user_id, 'status': 'unchanged', 'reason': 'Already approved'})
+        elif not user.is_active:
+            results.append({'id': user_id, 'status': 'unchanged', 'reason': 'Already rejected'})
+        else:
+            targets.append(user)
+            results.append({'id': user_id, 'status': 'rejected'})
+    
+    if targets:
+        # Kept inactive rather than deleted, as reject_user does: their
+        # registration entries in the audit chain still point at them
+        db.session.execute(
+            update(User).where(User.id.in_([u.id for u in targets])).values(is_active=False),
+            execution_options={'synchronize_session': False}
+        )
+        log_actions(
+            [{'resource_id': u.id, 'details': f'Rejected user {u.email}: {reason}'} for u in targets],
+            user_id=current_user.id,
+            action='user_reject',
+            resource_type='user',
+            sync=True
+        )
+        db.session.commit()
+        for user in targets:
+            invalidate_principal(user.id)
+            revocation_list.revoke_user(user.id)
+    
+    return jsonify({'results': results, 'summary': _bulk_summary(results)}), 200
+
+
+@users_bp.route('/bulk/deactivate', methods=['POST'])
+@jwt_required()
+def bulk_deactivate_users():
+    current_user = current_principal()
+    
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    ids, error = _bulk_ids()
+    if error:
+        return error
+    
+    found = _bulk_lookup(ids)
+    results, targets = [], []
+    for user_id in ids:
+        user = found.get(user_id)
+        if not user:
+            results.append({'id': user_id, 'status': 'not_found'})
+        elif user_id == current_user.id:
+            results.append({'id': user_id, 'status': 'unchanged', 'reason': 'Cannot deactivate your own account'})
+        elif not user.is_active:
+            results.append({'id': user_id, 'status': 'unchanged', 'reason': 'Already inactive'})
+        else:
+            targets.append(user)
+            results.append({'id': user_id, 'status': 'deactivated'})
+    
+    if targets:
+        db.session.execute(
+            update(User).where(User.id.in_([u.id for u in targets])).values(is_active=False),
+            execution_options={'synchronize_session': False}
+        )
+        log_actions(
+            [{'resource_id': u.id, 'details': f'User deactivated: {u.email}'} for u in targets],
+            user_id=current_user.id,
+            action='user_toggle_active',
+            resource_type='user',
+            sync=True
+        )
+        db.session.commit()
+        for user in targets:
+            invalidate_principal(user.id)
+            revocation_list.revoke_user(user.id)
+    
+    return jsonify({'results': results, 'summary': _bulk_summary(results)}), 200
+
+
+def _read_import_rows():
+    """Rows from an uploaded CSV/JSONL file or a JSON `users` list."""
+    upload = request.files.get('file')
+    if upload is None:
+        data = request.get_json(silent=True)
+        users = data.get('users') if isinstance(data, dict) else None
+        if not isinstance(users, list):
+            raise ValueError('Provide a CSV or JSONL file, or a JSON "users" list')
+        return users
+
+    text = upload.read().decode('utf-8-sig')
+    if upload.filename.lower().endswith('.csv'):
+        return list(csv.DictReader(io.StringIO(text)))
+    if upload.filename.lower().endswith(('.jsonl', '.ndjson')):
+        rows = []
+        for number, line in enumerate(text.splitlines(), 1):
+            if line.strip():
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    raise ValueError(f'Line {number} is not valid JSON')
+        return rows
+    raise ValueError('Import file must be .csv or .jsonl')
+
+
+def _import_row(row):
+    """Normalised user fields from one import row; raises ValueError if invalid."""
+    if not isinstance(row, dict):
+        raise ValueError('Row must be an object')
+    fields = {key: str(row.get(key) or '').strip() for key in
+              ('email', 'full_name', 'employee_id', 'role', 'court_station')}
+    fields['email'] = fields['email'].lower()
+    fields['role'] = fields['role'].lower()
+
+    missing = [key for key, value in fields.items() if not value]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    if not validate_email_domain(fields['email']):
+        raise ValueError('Only official judiciary email domains are allowed')
+    if fields['role'] not in IMPORT_ROLES:
+        raise ValueError(f"Invalid role. Allowed roles: {', '.join(IMPORT_ROLES)}")
+
+    password = str(row.get('password') or '')
+    if password and len(password) < 8:
+        raise ValueError('Password must be at least 8 characters long')
+    return fields, password
+
+
+@users_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_users():
+    """
+    Create many users in one transaction from CSV/JSONL or JSON.
+
+    Columns: email, full_name, employee_id, role, court_station and an
+    optional password; rows without one get a temporary password that is
+    returned once in the results. Invalid rows are reported and skipped.
+    """
+    current_user = current_principal()
+    
+    if not current_user or current_user.role != 'admin':
+        return jsonify({'error': 'Admin access required'}), 403
+    
+    try:
+        rows = _read_import_rows()
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    limit = current_app.config.get('USER_BULK_MAX', 1000)
+    if not rows:
+        return jsonify({'error': 'No users to import'}), 400
+    if len(rows) > limit:
+        return jsonify({'error': f'At most {limit} users per request'}), 400
+    
+    approve = str(request.values.get('approve', 'true')).lower() != 'false'
+    if request.is_json:
+        approve = (request.get_json(silent=True) or {}).get('approve', True) is not False
+    
+    results, accepted = [], []
+    seen_emails, seen_employee_ids = set(), set()
+    for number, row in enumerate(rows, 1):
+        try:
+            fields, password = _import_row(row)
+            if fields['email'] in seen_emails or fields['employee_id'] in seen_employee_ids:
+                raise ValueError('Duplicate email or employee ID in import')
+        except ValueError as e:
+            results.append({'row': number, 'email': row.get('email') if isinstance(row, dict) else None,
+                            'status': 'error', 'error': str(e)})
+            continue
+        seen_emails.add(fields['email'])
+        seen_employee_ids.add(fields['employee_id'])
+        result = {'row': number, 'email': fields['email'], 'status': 'created'}
+        if not password:
+            password = secrets.token_urlsafe(12)
+            result['temporary_password'] = password
+        results.append(result)
+        accepted.append((result, fields, password))
+    
+    # One query for conflicts with existing accounts
+    if accepted:
+        existing = db.session.execute(
+            select(User.email, User.employee_id).where(or_(
+                User.email.in_([fields['email'] for _, fields, _ in accepted]),
+                User.employee_id.in_([fields['employee_id'] for _, fields, _ in accepted])
+            ))
+        ).all()
+        taken_emails = {row.email.lower() for row in existing}
+        taken_employee_ids = {row.employee_id for row in existing}
+        still_accepted = []
+        for result, fields, password in accepted:
+            if fields['email'] in taken_emails or fields['employee_id'] in taken_employee_ids:
+                result.update(status='error', error='Email or employee ID already registered')
+                result.pop('temporary_password', None)
+            else:
+                still_accepted.append((result, fields, password))
+        accepted = still_accepted
+    
+    if accepted:
+        try:
+            hashes = hash_passwords([password for _, _, password in accepted])
+        except HashingBusy as e:
+            return hashing_busy_response(e)
+        
+        now = datetime.utcnow()
+        created = db.session.execute(
+            insert(User).returning(User.id, sort_by_parameter_order=True),
+            [dict(fields, password_hash=password_hash, search_name=normalize_name(fields['full_name']),
+                  is_active=True, is_approved=approve, created_at=now)
+             for (_, fields, _), password_hash in zip(accepted, hashes)]
+        ).all()
+        for (result, fields, _), row in zip(accepted, created):
+            result['id'] = row.id
+        
+        log_actions(
+            [{'resource_id': result['id'], 'details': f"Imported user {fields['email']} ({fields['role']})"}
+             for result, fields, _ in accepted],
+            user_id=current_user.id,
+            action='user_import',
+            resource_type='user',
+            sync=True
+        )
+        db.session.commit()
+    
+    return jsonify({'results': results, 'summary': _bulk_summary(results)}), 200
+
+
 # ---------------------------------------------------------
 # GET USER STATISTICS
 # ---------------------------------------------------------
 @users_bp.route('/statistics', methods=['GET'])
 @jwt_required()
 def get_user_statistics():
-    current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = current_principal()
     
     if not current_user or current_user.role != 'admin':
         return jsonify({'error': 'Admin access required'}), 403
     
     total_users = User.query.count()
     active_users = User.query.filter_by(is_active=True).count()
-    pending_users = User.query.filter_by(is_approved=False).count()
+    pending_users = User.query.filter_by(is_approved=False, is_active=True).count()
     
     # Count by role
     judges = User.query.filter_by(role='judge', is_active=True).count()
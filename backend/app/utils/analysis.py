@@ -0,0 +1,218 @@
+# app/utils/analysis.py
+"""
+Text analysis shared by search indexing and querying.
+
+Both sides must produce identical terms, so anything that turns text into
+index terms lives here. The chain is: normalise (case, accents), tokenise,
+drop the document language's stop words, stem with that language's light
+stemmer. A document's language is detected from its stop words; a query's
+language is unknown, so each query word is looked up under its stem in
+every registered language (see query_words).
+
+Stop-word removal keeps token positions, so phrases still match across
+the gaps. Stemmers are suffix tables checked in order, memoised per word.
+"""
+import bisect
+import functools
+import re
+import unicodedata
+from collections import Counter, namedtuple
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+MAX_TERM_LENGTH = 64
+
+# Page separators written by app.utils.ocr.extract_text_from_pdf
+PAGE_MARKER_RE = re.compile(r'^--- Page (\d+) ---$', re.MULTILINE)
+
+# `position` counts every token, stop words included, so phrases stay aligned
+Token = namedtuple('Token', 'term start end position')  # offsets into the original text
+QueryWord = namedtuple('QueryWord', 'word position terms')  # terms: stem per language
+
+DEFAULT_LANGUAGE = 'en'
+DETECT_CHARS = 20000  # language detection reads the start of long documents
+DETECT_MIN_HITS = 3
+STEM_CACHE_SIZE = 100000
+
+
+def normalize(text):
+    """Lower-case and strip accents (NFKD) so "Zoë" and "zoe" index alike."""
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+# ----------------------------------------------------------------------
+# Language analyzers
+# ----------------------------------------------------------------------
+Analyzer = namedtuple('Analyzer', 'stop_words stem')
+ANALYZERS = {}
+_ALL_STOP_WORDS = frozenset()
+_SIGNALS = {}
+
+
+def register_analyzer(language, stop_words, stem):
+    """Add (or replace) a language's stop words and stemmer."""
+    global _ALL_STOP_WORDS
+    ANALYZERS[language] = Analyzer(frozenset(stop_words), functools.lru_cache(maxsize=STEM_CACHE_SIZE)(stem))
+    _ALL_STOP_WORDS = frozenset().union(*(a.stop_words for a in ANALYZERS.values()))
+    # Detection only counts stop words no other language shares
+    for lang, analyzer in ANALYZERS.items():
+        others = frozenset().union(*(a.stop_words for l, a in ANALYZERS.items() if l != lang))
+        _SIGNALS[lang] = analyzer.stop_words - others
+
+
+def suffix_stemmer(rules, min_stem=3, final_vowel=False):
+    """
+    Stemmer from an ordered table of (suffix, exceptions, replacement): the
+    first suffix the word ends with (and no exception matches) is replaced.
+    With `final_vowel`, a trailing vowel is then dropped from longer stems.
+    """
+    rules = tuple((suffix, tuple(exceptions), replacement) for suffix, exceptions, replacement in rules)
+
+    def stem(word):
+        if len(word) <= min_stem or not word.isalpha():
+            return word
+        for suffix, exceptions, replacement in rules:
+            if word.endswith(suffix) and not (exceptions and word.endswith(exceptions)):
+                if len(word) - len(suffix) >= min_stem:
+                    word = word[:-len(suffix)] + replacement
+                break
+        if final_vowel and len(word) > min_stem + 1 and word[-1] in 'aeiou':
+            word = word[:-1]
+        return word
+    return stem
+
+
+# English: plural and possessive forms only ("rulings" -> "ruling")
+ENGLISH_STOP_WORDS = (
+    'a an and are as at be been but by for from had has have he her his i if in into is it its no not '
+    'of on or our s she so such that the their them then there these they this those to was we were '
+    'which while who will with would you your'
+).split()
+stem_english = suffix_stemmer((
+    ('ies', ('eies', 'aies'), 'y'),
+    ('sses', (), 'ss'),
+    ('xes', (), 'x'),
+    ('ches', (), 'ch'),
+    ('shes', (), 'sh'),
+    ('es', ('aes', 'ees', 'oes'), 'e'),
+    ('s', ('us', 'ss', 'is'), ''),
+))
+
+# Swahili: locative -ni, passive/causative extensions and the final vowel,
+# so "mahakamani", "mahakama" and "hukumiwa", "hukumu" meet
+SWAHILI_STOP_WORDS = (
+    'na ya wa kwa za la cha vya katika ni si au lakini kama hii hiyo huo hayo hizo hizi haya hili hilo '
+    'huu ile ule lile yule huyo hao yake wake zake yao wao pia tu sana kwamba ili hadi mpaka bila kuwa '
+    'kwenye mimi wewe yeye sisi ninyi hivyo hata ambayo ambao ambaye ambapo baada kabla kuhusu zaidi '
+    'hapa pale wala je'
+).split()
+stem_swahili = suffix_stemmer((
+    ('ishwa', (), ''),
+    ('eshwa', (), ''),
+    ('liwa', (), ''),
+    ('lewa', (), ''),
+    ('iwa', (), ''),
+    ('ewa', (), ''),
+    ('ni', (), ''),
+), final_vowel=True)
+
+register_analyzer('en', ENGLISH_STOP_WORDS, stem_english)
+register_analyzer('sw', SWAHILI_STOP_WORDS, stem_swahili)
+
+
+def detect_language(text):
+    """Registered language whose own stop words are most frequent; the default when unclear."""
+    if not text:
+        return DEFAULT_LANGUAGE
+    counts = Counter(TOKEN_RE.findall(normalize(text[:DETECT_CHARS])))
+    hits = {lang: sum(counts[w] for w in words) for lang, words in _SIGNALS.items()}
+    language = max(hits, key=hits.get, default=DEFAULT_LANGUAGE)
+    return language if hits.get(language, 0) >= DETECT_MIN_HITS else DEFAULT_LANGUAGE
+
+
+def tokenize(text, language=None):
+    """Index terms of a text, in order (detecting its language if not given)."""
+    return [token.term for token in tokenize_with_offsets(text, language)]
+
+
+def query_words(text):
+    """
+    Words of query text with their index terms: one stem per registered
+    language, since the documents a query should match may be in any of
+    them. Stop words of any language are dropped; they cannot be required
+    of every document, and positions keep phrase gaps intact.
+    """
+    if not text:
+        return []
+    words = []
+    position = 0
+    for word in TOKEN_RE.findall(normalize(text)):
+        if len(word) > MAX_TERM_LENGTH:
+            continue
+        if word not in _ALL_STOP_WORDS:
+            words.append(QueryWord(word, position, tuple(dict.fromkeys(a.stem(word) for a in ANALYZERS.values()))))
+        position += 1
+    return words
+
+
+def _normalized_with_map(text):
+    """Normalised text plus, for each of its characters, the source index."""
+    if text.isascii():
+        return text.lower(), None
+    chars = []
+    source = []
+    for i, c in enumerate(text):
+        folded = normalize(c)
+        chars.append(folded)
+        source.extend([i] * len(folded))
+    return ''.join(chars), source
+
+
+def tokenize_with_offsets(text, language=None):
+    """
+    Index terms of a text with their character offsets in `text`.
+
+    OCR page markers are skipped, so they neither become terms nor shift
+    the offsets of the text around them.
+    """
+    if not text:
+        return []
+    analyzer = ANALYZERS.get(language or detect_language(text)) or ANALYZERS[DEFAULT_LANGUAGE]
+    stop_words, stem = analyzer
+    folded, source = _normalized_with_map(text)
+    markers = [(m.start(), m.end()) for m in PAGE_MARKER_RE.finditer(text)]
+
+    tokens = []
+    marker = 0
+    position = 0
+    for match in TOKEN_RE.finditer(folded):
+        term = match.group()
+        if len(term) > MAX_TERM_LENGTH:
+            continue
+        if source is None:
+            start, end = match.start(), match.end()
+        else:
+            start, end = source[match.start()], source[match.end() - 1] + 1
+        while marker < len(markers) and markers[marker][1] <= start:
+            marker += 1
+        if marker < len(markers) and markers[marker][0] <= start:
+            continue
+        if term not in stop_words:
+            tokens.append(Token(stem(term), start, end, position))
+        position += 1
+    return tokens
+
+
+def page_starts(text):
+    """[(page number, offset where the page's text begins)] from OCR page markers."""
+    if not text:
+        return []
+    return [(int(m.group(1)), m.end()) for m in PAGE_MARKER_RE.finditer(text)]
+
+
+def page_at(pages, offset):
+    """Page number containing `offset`, given page_starts(); None without markers."""
+    if not pages:
+        return None
+    i = bisect.bisect_right([start for _, start in pages], offset) - 1
+    return pages[max(i, 0)][0]
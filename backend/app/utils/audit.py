@@ -0,0 +1,309 @@
+# app/utils/audit.py
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class AuditWriter:
+    """
+    Buffered audit log writer.
+
+    Entries are appended to a per-process spill file (so they survive a crash)
+    and queued in memory; a background thread bulk-inserts them when the batch
+    fills up or the flush interval elapses. Spill files left behind by dead
+    processes are replayed on startup, so delivery is at-least-once.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread = None
+        self._pid = None
+        self._spill = None
+        self._spill_seq = 0
+        self._pending_files = []
+        self.batch_size = 100
+        self.flush_interval = 2.0
+        self.spill_dir = None
+        self.fsync = False
+        self.enabled = True
+        self.seal_interval = 30
+        self._last_seal = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.batch_size = app.config.get('AUDIT_BATCH_SIZE', 100)
+        self.flush_interval = app.config.get('AUDIT_FLUSH_INTERVAL', 2.0)
+        self.spill_dir = app.config.get('AUDIT_SPILL_DIR') or os.path.join(app.instance_path, 'audit_spill')
+        self.fsync = app.config.get('AUDIT_SPILL_FSYNC', False)
+        self.enabled = app.config.get('AUDIT_ASYNC', True)
+        self.seal_interval = app.config.get('AUDIT_SEAL_INTERVAL', 30)
+        os.makedirs(self.spill_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def enqueue(self, entry):
+        """Queue an entry dict for the next batch."""
+        with self._lock:
+            self._ensure_started()
+            self._spill.write(json.dumps(entry, default=_json_default) + '\n')
+            self._spill.flush()
+            if self.fsync:
+                os.fsync(self._spill.fileno())
+
+            self._buffer.append(entry)
+            if len(self._buffer) >= self.batch_size:
+                self._wakeup.notify()
+
+    def _ensure_started(self):
+        # Gunicorn forks after import, so the thread and spill file are
+        # created lazily in whichever process actually writes.
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+
+        self._pid = pid
+        self._buffer = []
+        self._pending_files = []
+        self._open_spill()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def _open_spill(self):
+        self._spill_seq += 1
+        path = os.path.join(self.spill_dir, f'spill-{self._pid}-{self._spill_seq}.jsonl')
+        self._spill = open(path, 'a', encoding='utf-8')
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+    def _run(self):
+        try:
+            self.recover()
+        except Exception as e:
+            print(f"Audit spill recovery failed: {e}")
+
+        while True:
+            with self._lock:
+                self._wakeup.wait(timeout=self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Audit flush failed, will retry: {e}")
+
+            if time.monotonic() - self._last_seal >= self.seal_interval:
+                self._last_seal = time.monotonic()
+                try:
+                    self._seal()
+                except Exception as e:
+                    print(f"Audit sealing failed, will retry: {e}")
+
+    def flush(self):
+        """Write everything queued so far in one bulk insert."""
+        with self._lock:
+            if not self._buffer or self._spill is None:
+                return 0
+
+            batch = self._buffer
+            self._buffer = []
+
+            # Rotate the spill file so entries queued during the insert are
+            # not deleted along with the batch being written.
+            self._spill.close()
+            self._pending_files.append(self._spill.name)
+            self._open_spill()
+
+        try:
+            self._insert(batch)
+        except Exception:
+            with self._lock:
+                self._buffer = batch + self._buffer
+            raise
+
+        with self._lock:
+            done, self._pending_files = self._pending_files, []
+        for path in done:
+            _remove_quietly(path)
+
+        return len(batch)
+
+    def _insert(self, rows):
+        from app import db
+        from app.models.audit import AuditLog
+
+        with self.app.app_context():
+            try:
+                db.session.execute(AuditLog.__table__.insert(), rows)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+
+    def _seal(self):
+        from app.utils.audit_chain import seal_pending
+
+        with self.app.app_context():
+            seal_pending()
+
+    def recover(self):
+        """Replay spill files left behind by processes that are no longer running."""
+        recovered = 0
+        paths = glob.glob(os.path.join(self.spill_dir, 'spill-*.jsonl'))
+        paths += glob.glob(os.path.join(self.spill_dir, 'recover-*.jsonl'))
+        for path in sorted(paths):
+            # spill-<pid>-<seq>.jsonl, or recover-<pid>-<spill name> while a
+            # worker replays it; either way <pid> owns the file.
+            name = os.path.basename(path)
+            try:
+                pid = int(name.split('-')[1])
+            except (IndexError, ValueError):
+                continue
+            if pid == os.getpid() or _pid_alive(pid):
+                continue
+
+            # Claim the file before reading it: the rename is atomic, so when
+            # several workers start together only one of them replays it.
+            original = name.split('-', 2)[2] if name.startswith('recover-') else name
+            claimed = os.path.join(self.spill_dir, f'recover-{os.getpid()}-{original}')
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+
+            rows = []
+            with open(claimed, encoding='utf-8') as spill:
+                for line in spill:
+                    try:
+                        rows.append(_from_json(json.loads(line)))
+                    except ValueError:
+                        # Torn final line from the crash
+                        continue
+
+            if rows:
+                try:
+                    self._insert(rows)
+                except Exception:
+                    # Hand it back so the next worker to start retries it
+                    os.rename(claimed, os.path.join(self.spill_dir, original))
+                    raise
+                recovered += len(rows)
+            _remove_quietly(claimed)
+
+        return recovered
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialise {type(value).__name__}")
+
+
+def _from_json(entry):
+    if entry.get('created_at'):
+        entry['created_at'] = datetime.fromisoformat(entry['created_at'])
+    return entry
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+audit_writer = AuditWriter()
+
+
+def log_action(action, user_id=None, resource_type=None, resource_id=None,
+               details=None, ip_address=None, user_agent=None, sync=False):
+    """
+    Record an audit entry.
+
+    With sync=True the row is added to the current session and commits
+    (or rolls back) together with the caller's change. Otherwise it is
+    buffered and written in the next batch.
+    """
+    from app import db
+    from app.models.audit import AuditLog
+
+    entry = {
+        'user_id': int(user_id) if user_id is not None else None,
+        'action': action,
+        'resource_type': resource_type,
+        'resource_id': resource_id,
+        'details': details,
+        'ip_address': ip_address,
+        'user_agent': user_agent,
+        'created_at': datetime.utcnow()
+    }
+
+    if sync or not audit_writer.enabled:
+        audit = AuditLog(**entry)
+        db.session.add(audit)
+        if not sync:
+            db.session.commit()
+        return audit
+
+    audit_writer.enqueue(entry)
+    return None
+
+
+def log_actions(entries, sync=False, **common):
+    """
+    Record many audit entries at once.
+
+    Each entry is a dict of log_action keyword arguments; `common` fills in
+    fields shared by all of them. With sync=True the rows go into the current
+    transaction as a single bulk INSERT.
+    """
+    from app import db
+    from app.models.audit import AuditLog
+
+    now = datetime.utcnow()
+    rows = []
+    for entry in entries:
+        row = {
+            'user_id': None, 'resource_type': None, 'resource_id': None, 'details': None,
+            'ip_address': None, 'user_agent': None, **common, **entry, 'created_at': now
+        }
+        if row['user_id'] is not None:
+            row['user_id'] = int(row['user_id'])
+        rows.append(row)
+
+    if not rows:
+        return 0
+
+    if sync or not audit_writer.enabled:
+        db.session.execute(AuditLog.__table__.insert(), rows)
+        if not sync:
+            db.session.commit()
+    else:
+        for row in rows:
+            audit_writer.enqueue(row)
+    return len(rows)
+
+
+def client_details(request):
+    """IP address and user agent of the current request, as the audit log stores them."""
+    return {
+        'ip_address': request.remote_addr or 'unknown',
+        'user_agent': request.user_agent.string if request.user_agent else 'unknown'
+    }
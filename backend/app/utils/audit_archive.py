@@ -0,0 +1,547 @@
+# app/utils/audit_archive.py
+"""
+Time-partitioned storage for the audit log.
+
+New entries always land in the hot `audit_logs` table. Closed months are
+rolled into per-month partitions (`audit_logs_YYYY_MM`): native range
+partitions of `audit_logs_history` on PostgreSQL, plain tables on SQLite.
+Partitions older than AUDIT_COLD_AFTER_MONTHS are written out as immutable
+gzip JSONL segments with a sidecar index and dropped from the database.
+
+`query_audit` reads all three tiers and merges them newest-first.
+"""
+import gzip
+import heapq
+import itertools
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+import click
+from flask import current_app
+from sqlalchemy import Column, Index, MetaData, Table, and_, or_, func, inspect, select, text, tuple_
+
+from app import db
+from app.models.audit import AuditLog
+
+PARTITION_PATTERN = re.compile(r'^audit_logs_(\d{4})_(\d{2})$')
+HISTORY_TABLE = 'audit_logs_history'
+
+# Same shapes as the indexes on audit_logs, so every tier serves the same filters
+PARTITION_INDEXES = {
+    'created': ('created_at', 'id'),
+    'user_created': ('user_id', 'created_at', 'id'),
+    'action_created': ('action', 'created_at', 'id'),
+    'resource_created': ('resource_type', 'resource_id', 'created_at', 'id'),
+    'chain_seq': ('chain_seq',)
+}
+
+_metadata = MetaData()
+_partition_cache = {'tables': None, 'loaded_at': 0}
+
+
+# ----------------------------------------------------------------------
+# Month arithmetic
+# ----------------------------------------------------------------------
+def month_start(moment):
+    return datetime(moment.year, moment.month, 1)
+
+
+def add_months(moment, months):
+    index = moment.year * 12 + (moment.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(moment):
+    return f'audit_logs_{moment.year:04d}_{moment.month:02d}'
+
+
+def _partition_month(name):
+    match = PARTITION_PATTERN.match(name)
+    return datetime(int(match.group(1)), int(match.group(2)), 1)
+
+
+# ----------------------------------------------------------------------
+# Partition tables
+# ----------------------------------------------------------------------
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _table(name):
+    """Core Table with the audit columns, for partitions and the history parent."""
+    if name in _metadata.tables:
+        return _metadata.tables[name]
+
+    columns = [
+        Column(c.name, c.type, primary_key=c.primary_key and not _is_postgres())
+        for c in AuditLog.__table__.columns
+    ]
+    indexes = []
+    if not _is_postgres() or name == HISTORY_TABLE:
+        # On PostgreSQL indexes live on the parent and cascade to partitions
+        indexes = [Index(f'ix_{name}_{suffix}', *cols) for suffix, cols in PARTITION_INDEXES.items()]
+    return Table(name, _metadata, *columns, *indexes)
+
+
+def ensure_partition(connection, month):
+    """Create the partition holding `month` if it does not exist yet."""
+    name = partition_name(month)
+
+    if _is_postgres():
+        connection.execute(text(
+            f'CREATE TABLE IF NOT EXISTS {HISTORY_TABLE} '
+            f'(LIKE audit_logs INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)'
+        ))
+        for suffix, columns in PARTITION_INDEXES.items():
+            # Indexes on the parent cascade to every partition
+            connection.execute(text(
+                f'CREATE INDEX IF NOT EXISTS ix_{HISTORY_TABLE}_{suffix} '
+                f'ON {HISTORY_TABLE} ({", ".join(columns)})'
+            ))
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {HISTORY_TABLE} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        ))
+    else:
+        _table(name).create(bind=connection, checkfirst=True)
+
+    _partition_cache['tables'] = None
+    return name
+
+
+def list_partitions(refresh=False):
+    """Names of existing month partitions, oldest first (cached briefly)."""
+    stale = time.monotonic() - _partition_cache['loaded_at'] > 60
+    if refresh or stale or _partition_cache['tables'] is None:
+        names = [n for n in inspect(db.engine).get_table_names() if PARTITION_PATTERN.match(n)]
+        _partition_cache['tables'] = sorted(names)
+        _partition_cache['loaded_at'] = time.monotonic()
+    return _partition_cache['tables']
+
+
+def partition_tables(connection):
+    """Core tables to upgrade alongside audit_logs: every partition, or the PostgreSQL parent."""
+    names = [n for n in inspect(connection).get_table_names() if PARTITION_PATTERN.match(n)]
+    if not names:
+        return []
+    return [_table(HISTORY_TABLE)] if _is_postgres() else [_table(name) for name in sorted(names)]
+
+
+def roll_partitions(now=None):
+    """Move rows of closed months out of the hot table into their partitions."""
+    from app.utils.audit_chain import seal_pending
+
+    # Only sealed entries leave the hot table; anything flushed after this
+    # seal stays behind until the next roll
+    seal_pending()
+
+    now = now or datetime.utcnow()
+    hot_from = add_months(month_start(now), 1 - current_app.config.get('AUDIT_HOT_MONTHS', 1))
+    columns = [c.name for c in AuditLog.__table__.columns]
+    column_list = ', '.join(columns)
+    moved = {}
+
+    oldest = db.session.query(func.min(AuditLog.created_at))\
+        .filter(AuditLog.created_at < hot_from).scalar()
+    db.session.commit()
+    if not oldest:
+        return moved
+
+    month = month_start(oldest)
+    while month < hot_from:
+        end = add_months(month, 1)
+        with db.engine.begin() as connection:
+            name = ensure_partition(connection, month)
+            target = HISTORY_TABLE if _is_postgres() else name
+            params = {'start': month, 'end': end}
+            connection.execute(text(
+                f'INSERT INTO {target} ({column_list}) SELECT {column_list} FROM audit_logs '
+                f'WHERE created_at >= :start AND created_at < :end AND chain_seq IS NOT NULL'
+            ), params)
+            result = connection.execute(text(
+                'DELETE FROM audit_logs WHERE created_at >= :start AND created_at < :end '
+                'AND chain_seq IS NOT NULL'
+            ), params)
+            if result.rowcount:
+                moved[name] = result.rowcount
+        month = end
+
+    return moved
+
+
+# ----------------------------------------------------------------------
+# Cold segments
+# ----------------------------------------------------------------------
+def _archive_dir():
+    path = current_app.config['AUDIT_ARCHIVE_DIR']
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _serialise(row):
+    record = dict(row)
+    if record.get('created_at'):
+        record['created_at'] = record['created_at'].isoformat()
+    return record
+
+
+def archive_partitions(now=None):
+    """Write partitions past the cold cutoff to compressed segments and drop them."""
+    now = now or datetime.utcnow()
+    cold_before = add_months(month_start(now), -current_app.config.get('AUDIT_COLD_AFTER_MONTHS', 12))
+    block_size = current_app.config.get('AUDIT_SEGMENT_BLOCK_SIZE', 1000)
+    archived = _finish_interrupted()
+
+    for name in list_partitions(refresh=True):
+        month = _partition_month(name)
+        if month >= cold_before:
+            continue
+
+        table = _table(name)
+        rows = db.session.execute(
+            select(table).order_by(table.c.created_at, table.c.id)
+        ).mappings()
+        segment = write_segment(name, (_serialise(row) for row in rows), block_size)
+        db.session.commit()
+
+        # The segment only gets its final name once the partition is gone, so
+        # a crash in between never leaves the same rows in two places.
+        with db.engine.begin() as connection:
+            connection.execute(text(f'DROP TABLE {name}'))
+        _partition_cache['tables'] = None
+
+        if segment:
+            archived.append(publish_segment(segment))
+
+    _segment_cache.clear()
+    return archived
+
+
+def write_segment(name, records, block_size):
+    """
+    Write records as independent gzip members of `block_size` lines each.
+
+    Concatenated members are still a valid .gz file, while the sidecar's
+    byte offsets let readers decompress only the blocks they need. Both
+    files are staged under a .tmp suffix; publish_segment() renames them.
+    """
+    directory = _archive_dir()
+    existing = [f for f in os.listdir(directory) if f.startswith(name + '.') and f.endswith('.jsonl.gz')]
+    base = os.path.join(directory, f'{name}.{len(existing) + 1:03d}')
+    data_path, index_path = base + '.jsonl.gz', base + '.idx.json'
+
+    index = {'partition': name, 'rows': 0, 'blocks': []}
+    offset = 0
+    with open(data_path + '.tmp', 'wb') as out:
+        while True:
+            block = list(itertools.islice(records, block_size))
+            if not block:
+                break
+            payload = gzip.compress(
+                ''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in block).encode('utf-8')
+            )
+            out.write(payload)
+            index['blocks'].append({
+                'offset': offset,
+                'length': len(payload),
+                'rows': len(block),
+                'min_id': min(r['id'] for r in block),
+                'max_id': max(r['id'] for r in block),
+                'min_created_at': block[0]['created_at'],
+                'max_created_at': block[-1]['created_at'],
+                'user_ids': sorted({r['user_id'] for r in block if r['user_id'] is not None}),
+                'actions': _count(r['action'] for r in block),
+                'min_seq': min((r['chain_seq'] for r in block if r.get('chain_seq')), default=None),
+                'max_seq': max((r['chain_seq'] for r in block if r.get('chain_seq')), default=None)
+            })
+            offset += len(payload)
+            index['rows'] += len(block)
+
+    if not index['rows']:
+        os.remove(data_path + '.tmp')
+        return None
+
+    blocks = index['blocks']
+    index.update({
+        'min_id': min(b['min_id'] for b in blocks),
+        'max_id': max(b['max_id'] for b in blocks),
+        'min_created_at': blocks[0]['min_created_at'],
+        'max_created_at': blocks[-1]['max_created_at']
+    })
+    with open(index_path + '.tmp', 'w', encoding='utf-8') as out:
+        json.dump(index, out)
+    return data_path
+
+
+def publish_segment(data_path):
+    """Give a staged segment and its sidecar their final, read-only names."""
+    index_path = data_path[:-len('.jsonl.gz')] + '.idx.json'
+    for path in (data_path, index_path):
+        os.replace(path + '.tmp', path)
+        os.chmod(path, 0o444)
+    return data_path
+
+
+def _finish_interrupted():
+    """
+    Resolve segments staged by a run that died before publishing them: if
+    the partition was dropped the staged copy is the only one and is
+    published, otherwise it is discarded and the partition archived again.
+    """
+    directory = _archive_dir()
+    partitions = set(list_partitions(refresh=True))
+    published = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.jsonl.gz.tmp'):
+            continue
+        data_path = os.path.join(directory, filename[:-len('.tmp')])
+        index_tmp = data_path[:-len('.jsonl.gz')] + '.idx.json.tmp'
+        if filename.split('.')[0] not in partitions and os.path.exists(index_tmp):
+            published.append(publish_segment(data_path))
+        else:
+            for path in (data_path + '.tmp', index_tmp):
+                if os.path.exists(path):
+                    os.remove(path)
+    return published
+
+
+def _count(values):
+    counts = {}
+    for value in values:
+        counts[value] = counts.get(value, 0) + 1
+    return counts
+
+
+_segment_cache = {}
+
+
+def list_segments():
+    """Sidecar indexes of all cold segments, keyed by data file path."""
+    directory = current_app.config['AUDIT_ARCHIVE_DIR']
+    if not os.path.isdir(directory):
+        return []
+
+    segments = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.idx.json'):
+            continue
+        index_path = os.path.join(directory, filename)
+        if index_path not in _segment_cache:
+            with open(index_path, encoding='utf-8') as f:
+                index = json.load(f)
+            index['path'] = index_path[:-len('.idx.json')] + '.jsonl.gz'
+            _segment_cache[index_path] = index
+        segments.append(_segment_cache[index_path])
+    return segments
+
+
+def read_block(segment, block):
+    with open(segment['path'], 'rb') as f:
+        f.seek(block['offset'])
+        payload = gzip.decompress(f.read(block['length']))
+    return [json.loads(line) for line in payload.decode('utf-8').splitlines()]
+
+
+# ----------------------------------------------------------------------
+# Queries across hot, partitioned and cold tiers
+# ----------------------------------------------------------------------
+def _conditions(table, filters, start, end, before=None, resources=None):
+    conditions = [getattr(table.c, k) == v for k, v in filters.items()]
+    if start:
+        conditions.append(table.c.created_at >= start)
+    if end:
+        conditions.append(table.c.created_at < end)
+    if before:
+        # Row-value comparison keeps the (…, created_at, id) index usable
+        conditions.append(tuple_(table.c.created_at, table.c.id) < tuple_(*before))
+    if resources is not None:
+        conditions.append(or_(*[
+            and_(table.c.resource_type == resource_type, table.c.resource_id.in_(ids))
+            for resource_type, ids in resources
+        ]))
+    return conditions
+
+
+def _sql_source(table, filters, start, end, limit, before=None, resources=None):
+    conditions = _conditions(table, filters, start, end, before, resources)
+
+    statement = select(table)
+    if conditions:
+        statement = statement.where(and_(*conditions))
+    statement = statement.order_by(table.c.created_at.desc(), table.c.id.desc()).limit(limit)
+
+    for row in db.session.execute(statement).mappings():
+        record = _serialise(row)
+        yield (row['created_at'], row['id'], record)
+
+
+def _block_matches(block, filters, start, end, before=None):
+    if start and block['max_created_at'] < start.isoformat():
+        return False
+    if end and block['min_created_at'] >= end.isoformat():
+        return False
+    if before and block['min_created_at'] > before[0].isoformat():
+        return False
+    if 'user_id' in filters and filters['user_id'] not in block['user_ids']:
+        return False
+    if 'action' in filters and filters['action'] not in block['actions']:
+        return False
+    return True
+
+
+def _segment_source(segment, filters, start, end, before=None, resources=None):
+    wanted = {(t, i) for t, ids in resources for i in ids} if resources is not None else None
+    for block in reversed(segment['blocks']):
+        if not _block_matches(block, filters, start, end, before):
+            continue
+        for record in reversed(read_block(segment, block)):
+            created_at = datetime.fromisoformat(record['created_at'])
+            if start and created_at < start:
+                continue
+            if end and created_at >= end:
+                continue
+            if before and (created_at, record['id']) >= before:
+                continue
+            if any(record.get(k) != v for k, v in filters.items()):
+                continue
+            if wanted is not None and (record['resource_type'], record['resource_id']) not in wanted:
+                continue
+            yield (created_at, record['id'], record)
+
+
+def _sources(filters, start, end, limit, before=None, resources=None):
+    sources = [_sql_source(AuditLog.__table__, filters, start, end, limit, before, resources)]
+
+    partitions = []
+    for name in list_partitions():
+        month = _partition_month(name)
+        if (start and add_months(month, 1) <= start) or (end and month >= end):
+            continue
+        partitions.append(name)
+
+    if partitions and _is_postgres():
+        # One statement against the parent; the planner prunes partitions
+        sources.append(_sql_source(_table(HISTORY_TABLE), filters, start, end, limit, before, resources))
+    else:
+        sources.extend(
+            _sql_source(_table(name), filters, start, end, limit, before, resources)
+            for name in partitions
+        )
+
+    for segment in list_segments():
+        if start and segment['max_created_at'] < start.isoformat():
+            continue
+        if end and segment['min_created_at'] >= end.isoformat():
+            continue
+        if before and segment['min_created_at'] > before[0].isoformat():
+            continue
+        sources.append(_segment_source(segment, filters, start, end, before, resources))
+
+    return sources
+
+
+def query_audit(start=None, end=None, limit=100, before=None, resources=None, **filters):
+    """
+    Newest-first audit entries across every storage tier.
+
+    `filters` are exact matches on user_id, action, resource_type or
+    resource_id; `end` is exclusive. `before` is a (created_at, id) keyset
+    cursor and `resources` an optional list of (resource_type, ids) pairs,
+    any of which may match.
+    """
+    filters = {k: v for k, v in filters.items() if v is not None}
+    merged = heapq.merge(
+        *_sources(filters, start, end, limit, before, resources),
+        key=lambda item: (item[0], item[1]),
+        reverse=True
+    )
+    return [record for _, _, record in itertools.islice(merged, limit)]
+
+
+def audit_tables():
+    """The hot table and every partition (or their PostgreSQL parent)."""
+    tables = [AuditLog.__table__]
+    if list_partitions():
+        tables += [_table(HISTORY_TABLE)] if _is_postgres() else [_table(n) for n in list_partitions()]
+    return tables
+
+
+def find_entry(entry_id):
+    """Look up a single audit entry by id in whichever tier holds it."""
+    for table in audit_tables():
+        row = db.session.execute(select(table).where(table.c.id == entry_id)).mappings().first()
+        if row:
+            return _serialise(row)
+
+    for segment in list_segments():
+        if not segment['min_id'] <= entry_id <= segment['max_id']:
+            continue
+        for block in segment['blocks']:
+            if block['min_id'] <= entry_id <= block['max_id']:
+                for record in read_block(segment, block):
+                    if record['id'] == entry_id:
+                        return record
+    return None
+
+
+def iter_chain(first_seq, last_seq):
+    """Sealed entries with chain_seq in [first_seq, last_seq], in chain order."""
+    records = []
+    for table in audit_tables():
+        statement = select(table)\
+            .where(table.c.chain_seq >= first_seq, table.c.chain_seq <= last_seq)
+        records.extend(_serialise(row) for row in db.session.execute(statement).mappings())
+
+    for segment in list_segments():
+        for block in segment['blocks']:
+            if block.get('min_seq') is None or block['max_seq'] < first_seq or block['min_seq'] > last_seq:
+                continue
+            records.extend(
+                r for r in read_block(segment, block)
+                if r.get('chain_seq') and first_seq <= r['chain_seq'] <= last_seq
+            )
+
+    records.sort(key=lambda r: r['chain_seq'])
+    return records
+
+
+def count_audit(start=None, end=None, **filters):
+    """Count audit entries across every tier, using block statistics where possible."""
+    filters = {k: v for k, v in filters.items() if v is not None}
+    total = 0
+
+    for table in audit_tables():
+        conditions = _conditions(table, filters, start, end)
+        statement = select(func.count()).select_from(table)
+        if conditions:
+            statement = statement.where(and_(*conditions))
+        total += db.session.execute(statement).scalar() or 0
+
+    for segment in list_segments():
+        for block in segment['blocks']:
+            if not _block_matches(block, filters, start, end):
+                continue
+            inside = (not start or block['min_created_at'] >= start.isoformat()) and \
+                     (not end or block['max_created_at'] < end.isoformat())
+            if inside and set(filters) <= {'action'}:
+                total += block['actions'].get(filters['action'], 0) if filters else block['rows']
+            else:
+                total += sum(1 for _ in _segment_source({'path': segment['path'], 'blocks': [block]},
+                                                        filters, start, end))
+    return total
+
+
+def init_app(app):
+    @app.cli.command('audit-archive')
+    @click.option('--skip-cold', is_flag=True, help='Only roll closed months into partitions.')
+    def audit_archive_command(skip_cold):
+        """Roll closed months into partitions and archive cold ones."""
+        moved = roll_partitions()
+        for name, count in moved.items():
+            click.echo(f'Moved {count} entries into {name}')
+        if not skip_cold:
+            for path in archive_partitions():
+                click.echo(f'Archived {path}')
@@ -0,0 +1,371 @@
+# app/utils/audit_chain.py
+"""
+Tamper evidence for the audit log.
+
+Entries are sealed in batches: each gets a `chain_seq`, the hash of its
+predecessor and its own hash over both. Every batch closes with a signed
+checkpoint holding the Merkle root (RFC 6962 style) of its entry hashes,
+so a single entry can be proven with an O(log n) inclusion path and the
+whole log can be verified checkpoint by checkpoint, in parallel.
+"""
+import hashlib
+import hmac
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import click
+from flask import current_app
+from sqlalchemy import bindparam, func, select, text
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.audit import AuditCheckpoint
+
+GENESIS_HASH = '0' * 64
+HASHED_FIELDS = (
+    'id', 'chain_seq', 'user_id', 'action', 'resource_type', 'resource_id',
+    'details', 'ip_address', 'user_agent', 'created_at'
+)
+SEAL_LOCK_KEY = 0x61756469  # pg_advisory_xact_lock key for the sealer
+
+
+# ----------------------------------------------------------------------
+# Hashing primitives (pure functions, safe to run in worker processes)
+# ----------------------------------------------------------------------
+def entry_digest(record, prev_hash):
+    body = {}
+    for field in HASHED_FIELDS:
+        value = record.get(field)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        body[field] = value
+    payload = prev_hash + json.dumps(body, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _leaf(entry_hash):
+    return hashlib.sha256(b'\x00' + bytes.fromhex(entry_hash)).digest()
+
+
+def _node(left, right):
+    return hashlib.sha256(b'\x01' + left + right).digest()
+
+
+def _split(size):
+    """Largest power of two strictly smaller than size."""
+    k = 1
+    while k * 2 < size:
+        k *= 2
+    return k
+
+
+def _tree_hash(nodes):
+    if len(nodes) == 1:
+        return nodes[0]
+    k = _split(len(nodes))
+    return _node(_tree_hash(nodes[:k]), _tree_hash(nodes[k:]))
+
+
+def merkle_root(entry_hashes):
+    return _tree_hash([_leaf(h) for h in entry_hashes]).hex()
+
+
+def inclusion_path(entry_hashes, index):
+    """Audit path for leaf `index`, ordered from the leaf up."""
+    def path(m, nodes):
+        if len(nodes) == 1:
+            return []
+        k = _split(len(nodes))
+        if m < k:
+            return path(m, nodes[:k]) + [_tree_hash(nodes[k:])]
+        return path(m - k, nodes[k:]) + [_tree_hash(nodes[:k])]
+
+    return [node.hex() for node in path(index, [_leaf(h) for h in entry_hashes])]
+
+
+def verify_inclusion(entry_hash, index, size, path, root):
+    """RFC 9162 inclusion proof verification."""
+    if index >= size:
+        return False
+
+    fn, sn, r = index, size - 1, _leaf(entry_hash)
+    for sibling in path:
+        sibling = bytes.fromhex(sibling)
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            r = _node(sibling, r)
+            if not fn & 1:
+                while not fn & 1 and fn != 0:
+                    fn >>= 1
+                    sn >>= 1
+        else:
+            r = _node(r, sibling)
+        fn >>= 1
+        sn >>= 1
+
+    return sn == 0 and r.hex() == root
+
+
+def sign_checkpoint(key, checkpoint):
+    message = '|'.join(str(part) for part in (
+        checkpoint['first_seq'], checkpoint['last_seq'], checkpoint['entry_count'],
+        checkpoint['merkle_root'], checkpoint['last_entry_hash'], checkpoint['prev_signature'] or ''
+    ))
+    return hmac.new(key, message.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def verify_segment(job):
+    """Recompute one checkpoint's chain and Merkle root; returns a list of problems."""
+    checkpoint, records, prev_hash = job['checkpoint'], job['records'], job['prev_hash']
+    problems = []
+
+    expected_seqs = range(checkpoint['first_seq'], checkpoint['last_seq'] + 1)
+    if [r['chain_seq'] for r in records] != list(expected_seqs):
+        problems.append({'checkpoint': checkpoint['id'], 'reason': 'entries missing or duplicated'})
+        return problems
+
+    hashes = []
+    for record in records:
+        digest = entry_digest(record, prev_hash)
+        if record['prev_hash'] != prev_hash or record['entry_hash'] != digest:
+            problems.append({
+                'checkpoint': checkpoint['id'],
+                'chain_seq': record['chain_seq'],
+                'entry_id': record['id'],
+                'reason': 'entry altered or chain broken'
+            })
+        # Continue from the stored hash so one bad row doesn't flag every successor
+        hashes.append(record['entry_hash'])
+        prev_hash = record['entry_hash']
+
+    if prev_hash != checkpoint['last_entry_hash']:
+        problems.append({'checkpoint': checkpoint['id'], 'reason': 'chain head does not match checkpoint'})
+    if merkle_root(hashes) != checkpoint['merkle_root']:
+        problems.append({'checkpoint': checkpoint['id'], 'reason': 'Merkle root mismatch'})
+    return problems
+
+
+# ----------------------------------------------------------------------
+# Sealing
+# ----------------------------------------------------------------------
+def _signing_key():
+    key = current_app.config.get('AUDIT_SIGNING_KEY') or current_app.config['SECRET_KEY']
+    return key.encode('utf-8') if isinstance(key, str) else key
+
+
+def seal_pending():
+    """Seal all unsealed entries, one checkpoint per AUDIT_CHECKPOINT_SIZE batch."""
+    sealed = 0
+    while True:
+        count = _seal_batch(current_app.config.get('AUDIT_CHECKPOINT_SIZE', 1024))
+        if not count:
+            return sealed
+        sealed += count
+
+
+def _seal_batch(size):
+    from app.utils.audit_archive import audit_tables
+
+    try:
+        if db.engine.dialect.name == 'postgresql':
+            db.session.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': SEAL_LOCK_KEY})
+
+        head = AuditCheckpoint.query.order_by(AuditCheckpoint.id.desc()).first()
+        prev_hash = head.last_entry_hash if head else GENESIS_HASH
+        next_seq = head.last_seq + 1 if head else 1
+
+        # Mostly the hot table's tail, but partitions can hold entries from
+        # before the chain existed
+        rows = []
+        for table in audit_tables():
+            rows.extend(
+                (row['id'], table, row) for row in db.session.execute(
+                    select(table).where(table.c.chain_seq.is_(None)).order_by(table.c.id).limit(size)
+                ).mappings()
+            )
+        rows = sorted(rows, key=lambda item: item[0])[:size]
+        if not rows:
+            db.session.commit()
+            return 0
+
+        updates, hashes = [], []
+        by_table = {}
+        for _, table, row in rows:
+            record = dict(row)
+            record['chain_seq'] = next_seq
+            digest = entry_digest(record, prev_hash)
+            update = {'b_id': row['id'], 'b_seq': next_seq, 'b_prev': prev_hash, 'b_hash': digest}
+            updates.append(update)
+            by_table.setdefault(table, []).append(update)
+            hashes.append(digest)
+            prev_hash = digest
+            next_seq += 1
+
+        for table, table_updates in by_table.items():
+            db.session.execute(
+                table.update()
+                .where(table.c.id == bindparam('b_id'))
+                .values(chain_seq=bindparam('b_seq'), prev_hash=bindparam('b_prev'), entry_hash=bindparam('b_hash')),
+                table_updates
+            )
+
+        checkpoint = {
+            'first_seq': updates[0]['b_seq'],
+            'last_seq': updates[-1]['b_seq'],
+            'entry_count': len(updates),
+            'merkle_root': merkle_root(hashes),
+            'last_entry_hash': prev_hash,
+            'prev_signature': head.signature if head else None
+        }
+        db.session.add(AuditCheckpoint(signature=sign_checkpoint(_signing_key(), checkpoint), **checkpoint))
+        db.session.commit()
+        return len(updates)
+
+    except IntegrityError:
+        # Another worker sealed the same tail first
+        db.session.rollback()
+        return 0
+
+
+# ----------------------------------------------------------------------
+# Verification and proofs
+# ----------------------------------------------------------------------
+def _checkpoint_jobs(checkpoints, prev=None):
+    from app.utils.audit_archive import iter_chain
+
+    for checkpoint in checkpoints:
+        yield {
+            'checkpoint': checkpoint.to_dict(),
+            'records': iter_chain(checkpoint.first_seq, checkpoint.last_seq),
+            'prev_hash': prev.last_entry_hash if prev else GENESIS_HASH
+        }
+        prev = checkpoint
+
+
+def verify_log(workers=None, after=None, limit=None):
+    """
+    Verify every checkpoint signature, the checkpoint chain and every entry.
+
+    Checkpoints are independent once their predecessor's head hash is known,
+    so entry rehashing is spread over a process pool. `after` (a checkpoint
+    id) and `limit` verify a range instead, starting from the signed head of
+    checkpoint `after`; raises LookupError if there is no such checkpoint.
+    """
+    from app.utils.audit_archive import audit_tables
+
+    key = _signing_key()
+    workers = workers or current_app.config.get('AUDIT_VERIFY_WORKERS', 1)
+    checkpoints = AuditCheckpoint.query.order_by(AuditCheckpoint.id)
+
+    previous = None
+    if after is not None:
+        previous = db.session.get(AuditCheckpoint, after)
+        if previous is None:
+            raise LookupError(f'No checkpoint {after}')
+        checkpoints = checkpoints.filter(AuditCheckpoint.id > after)
+    if limit is not None:
+        checkpoints = checkpoints.limit(limit)
+
+    problems, entries, count = [], 0, 0
+    prev_signature = previous.signature if previous else None
+    expected_seq = previous.last_seq + 1 if previous else 1
+    last_checkpoint = after
+
+    def checked(source):
+        nonlocal prev_signature, expected_seq, count, last_checkpoint
+        for checkpoint in source:
+            data = checkpoint.to_dict()
+            if checkpoint.first_seq != expected_seq:
+                problems.append({'checkpoint': checkpoint.id, 'reason': 'gap in checkpoint sequence'})
+            if checkpoint.prev_signature != prev_signature:
+                problems.append({'checkpoint': checkpoint.id, 'reason': 'checkpoint chain broken'})
+            if not hmac.compare_digest(sign_checkpoint(key, data), checkpoint.signature):
+                problems.append({'checkpoint': checkpoint.id, 'reason': 'invalid signature'})
+            prev_signature = checkpoint.signature
+            expected_seq = checkpoint.last_seq + 1
+            last_checkpoint = checkpoint.id
+            count += 1
+            yield checkpoint
+
+    jobs = _checkpoint_jobs(checked(checkpoints.yield_per(100)), previous)
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = []
+            for job in jobs:
+                entries += len(job['records'])
+                pending.append(pool.submit(verify_segment, job))
+                # Bound memory: never hold more than a few segments in flight
+                if len(pending) >= workers * 2:
+                    problems.extend(pending.pop(0).result())
+            for future in pending:
+                problems.extend(future.result())
+    else:
+        for job in jobs:
+            entries += len(job['records'])
+            problems.extend(verify_segment(job))
+
+    unsealed = sum(
+        db.session.execute(select(func.count()).select_from(table).where(table.c.chain_seq.is_(None))).scalar()
+        for table in audit_tables()
+    )
+    return {
+        'valid': not problems,
+        'after': after,
+        'last_checkpoint': last_checkpoint,
+        'checkpoints': count,
+        'entries': entries,
+        'unsealed': unsealed,
+        'problems': problems
+    }
+
+
+def inclusion_proof(entry_id):
+    """Merkle inclusion proof for one entry against its signed checkpoint."""
+    from app.utils.audit_archive import find_entry, iter_chain
+
+    record = find_entry(entry_id)
+    if not record or not record.get('chain_seq'):
+        return None
+
+    checkpoint = AuditCheckpoint.query.filter(
+        AuditCheckpoint.first_seq <= record['chain_seq'],
+        AuditCheckpoint.last_seq >= record['chain_seq']
+    ).first()
+    if not checkpoint:
+        return None
+
+    hashes = [r['entry_hash'] for r in iter_chain(checkpoint.first_seq, checkpoint.last_seq)]
+    index = record['chain_seq'] - checkpoint.first_seq
+    path = inclusion_path(hashes, index)
+    data = checkpoint.to_dict()
+
+    entry_intact = entry_digest(record, record['prev_hash']) == record['entry_hash']
+    signature_valid = hmac.compare_digest(sign_checkpoint(_signing_key(), data), checkpoint.signature)
+    included = verify_inclusion(record['entry_hash'], index, checkpoint.entry_count, path, checkpoint.merkle_root)
+
+    return {
+        'entry': record,
+        'leaf_index': index,
+        'tree_size': checkpoint.entry_count,
+        'path': path,
+        'checkpoint': data,
+        'verified': entry_intact and signature_valid and included
+    }
+
+
+def init_app(app):
+    @app.cli.command('audit-seal')
+    def audit_seal_command():
+        """Seal pending audit entries into the hash chain."""
+        click.echo(f'Sealed {seal_pending()} entries')
+
+    @app.cli.command('audit-verify')
+    @click.option('--workers', default=None, type=int, help='Processes used for rehashing.')
+    def audit_verify_command(workers):
+        """Verify the full audit hash chain and its checkpoints."""
+        result = verify_log(workers)
+        click.echo(json.dumps(result, indent=2))
+        if not result['valid']:
+            raise SystemExit(1)
@@ -1,15 +1,168 @@
 # app/utils/auth.py
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
 import bcrypt
+from flask import jsonify
+
+
+class HashingBusy(Exception):
+    """Raised when too many password hashes are already queued."""
+
+    def __init__(self, retry_after=1):
+        super().__init__('Password hashing queue is full')
+        self.retry_after = retry_after
+
+
+def _hashpw(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _checkpw(password, hashed_password):
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a small dedicated process pool.
+
+    Request workers only wait on a future, so a burst of logins cannot take
+    every worker away from cheap API calls. At most `max_pending` hashes are
+    queued or running per process; beyond that callers get HashingBusy and
+    should answer 503 with Retry-After instead of piling up.
+    """
+
+    def __init__(self):
+        self.rounds = 12
+        self.pool_size = 2
+        self.max_pending = 32
+        self.timeout = 30
+        self.retry_after = 2
+        self._pool = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_ROUNDS', 12)
+        self.pool_size = app.config.get('BCRYPT_POOL_SIZE', 2)
+        self.max_pending = app.config.get('BCRYPT_MAX_PENDING', 32)
+        self.timeout = app.config.get('BCRYPT_TIMEOUT', 30)
+        self.retry_after = app.config.get('BCRYPT_RETRY_AFTER', 2)
+        app.register_error_handler(HashingBusy, hashing_busy_response)
+
+    def _executor(self):
+        # Created lazily so every gunicorn worker gets its own pool after fork
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._pool = ProcessPoolExecutor(max_workers=self.pool_size)
+                self._slots = threading.BoundedSemaphore(self.max_pending)
+            return self._pool
+
+    def _replace(self, pool):
+        # A pool process that dies (OOM killer, signal) leaves the executor
+        # broken for good; swap in a fresh one unless another thread already has
+        with self._lock:
+            if self._pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = ProcessPoolExecutor(max_workers=self.pool_size)
+
+    def run(self, fn, *args):
+        if not self.pool_size:
+            return fn(*args)
+
+        pool = self._executor()
+        try:
+            return self._run_once(pool, fn, args)
+        except BrokenProcessPool:
+            self._replace(pool)
+            return self._run_once(self._executor(), fn, args)
+
+    def _run_once(self, pool, fn, args):
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            raise HashingBusy(self.retry_after)
+        try:
+            future = pool.submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            raise HashingBusy(self.retry_after)
+
+    def run_many(self, fn, arg_tuples):
+        """
+        Run a batch through the pool and return results in order.
+
+        A batch never holds more than `pool_size` queue slots, so logins keep
+        getting served while a bulk import hashes its passwords.
+        """
+        if not self.pool_size:
+            return [fn(*args) for args in arg_tuples]
+
+        pool = self._executor()
+        try:
+            return self._run_many_once(pool, fn, arg_tuples)
+        except BrokenProcessPool:
+            self._replace(pool)
+            return self._run_many_once(self._executor(), fn, arg_tuples)
+
+    def _run_many_once(self, pool, fn, arg_tuples):
+        slots = self._slots
+        window = threading.BoundedSemaphore(self.pool_size)
+        futures = []
+        for args in arg_tuples:
+            window.acquire()
+            if not slots.acquire(timeout=self.timeout):
+                window.release()
+                for future in futures:
+                    future.cancel()
+                raise HashingBusy(self.retry_after)
+
+            def release(_):
+                slots.release()
+                window.release()
+
+            try:
+                future = pool.submit(fn, *args)
+            except Exception:
+                release(None)
+                for future in futures:
+                    future.cancel()
+                raise
+            future.add_done_callback(release)
+            futures.append(future)
+
+        return [future.result(timeout=self.timeout) for future in futures]
+
+    def needs_rehash(self, hashed_password):
+        """True when a stored hash was made with a different cost than configured."""
+        try:
+            return int(hashed_password.split('$')[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+
+password_hasher = PasswordHasher()
+
 
 def hash_password(password):
     """Hash a password for storing."""
     if not password:
         raise ValueError("Password cannot be empty")
-    
+
     try:
-        salt = bcrypt.gensalt()
-        pwd_hash = bcrypt.hashpw(password.encode('utf-8'), salt)
-        return pwd_hash.decode('utf-8')
+        return password_hasher.run(_hashpw, password, password_hasher.rounds)
+    except HashingBusy:
+        raise
     except Exception as e:
         raise ValueError(f"Password hashing failed: {str(e)}")
 
@@ -17,11 +170,25 @@ def verify_password(password, hashed_password):
     """Verify a stored password against one provided by user."""
     if not password or not hashed_password:
         return False
-    
+
     try:
-        return bcrypt.checkpw(
-            password.encode('utf-8'), 
-            hashed_password.encode('utf-8')
-        )
+        return password_hasher.run(_checkpw, password, hashed_password)
+    except HashingBusy:
+        raise
     except Exception:
-        return False
\ No newline at end of file
+        return False
+
+def hash_passwords(passwords):
+    """Hash a batch of passwords in parallel on the hashing pool."""
+    if not all(passwords):
+        raise ValueError("Password cannot be empty")
+    return password_hasher.run_many(_hashpw, [(p, password_hasher.rounds) for p in passwords])
+
+def needs_rehash(hashed_password):
+    return password_hasher.needs_rehash(hashed_password)
+
+def hashing_busy_response(error):
+    response = jsonify({'error': 'Server is busy, please try again shortly'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
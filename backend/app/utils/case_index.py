@@ -0,0 +1,177 @@
+# app/utils/case_index.py
+import bisect
+import re
+import threading
+import time
+
+TOKEN_RE = re.compile(r'[a-z0-9]{2,}')
+
+
+class CaseNumberIndex:
+    """
+    In-memory sorted index of case numbers (and title words) for typeahead.
+
+    Case numbers live in sorted lists of (lower-cased key, case id), so a
+    prefix lookup is a bisect plus a short scan. Besides the list of all
+    cases, each judge has lists of their own cases, so a judge's lookup
+    never steps over other judges' matches. The index is loaded when the
+    app starts, kept current from case change events (which reach every
+    worker when events are relayed through Redis), and fully reloaded in
+    the background every CASE_INDEX_REFRESH seconds as a safety net.
+    """
+
+    def __init__(self):
+        self._numbers = {}    # judge id (None: all cases) -> sorted (lower-cased case number, case id)
+        self._tokens = {}     # judge id (None: all cases) -> sorted (title token, case id)
+        self._cases = {}      # case id -> (case_number, title, judge_id, status)
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._reloading = False
+        self.refresh_interval = 300
+        self.app = None
+
+    def init_app(self, app):
+        from app.utils.events import event_hub
+
+        self.app = app
+        self.refresh_interval = app.config.get('CASE_INDEX_REFRESH', 300)
+        event_hub.add_listener(self._on_event)
+
+    # ------------------------------------------------------------------
+    # Loading and maintenance
+    # ------------------------------------------------------------------
+    def warm(self):
+        """Load at startup, once the schema is current, so no request waits for it."""
+        with self.app.app_context():
+            try:
+                self.load()
+            except Exception as e:
+                # The first lookup tries again
+                print(f"Case index load failed: {e}")
+
+    def load(self):
+        """Rebuild from the database (needs an app context)."""
+        from app.models import Case
+
+        rows = Case.query.with_entities(
+            Case.id, Case.case_number, Case.title, Case.judge_id, Case.status
+        ).all()
+
+        cases = {row.id: (row.case_number, row.title or '', row.judge_id, row.status) for row in rows}
+        numbers, tokens = {None: []}, {None: []}
+        for case_id, (number, title, judge_id, _) in cases.items():
+            for scope in _scopes(judge_id):
+                numbers.setdefault(scope, []).append((number.lower(), case_id))
+                tokens.setdefault(scope, []).extend(
+                    (token, case_id) for token in set(TOKEN_RE.findall(title.lower()))
+                )
+        for entries in (*numbers.values(), *tokens.values()):
+            entries.sort()
+
+        with self._lock:
+            self._cases = cases
+            self._numbers = numbers
+            self._tokens = tokens
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None:
+            self.load()
+        elif time.monotonic() - self._loaded_at > self.refresh_interval and not self._reloading:
+            # Serve the current index while a fresh copy loads
+            self._reloading = True
+            threading.Thread(target=self._reload, daemon=True).start()
+
+    def _reload(self):
+        try:
+            with self.app.app_context():
+                self.load()
+        except Exception as e:
+            print(f"Case index reload failed: {e}")
+        finally:
+            self._reloading = False
+
+    def add(self, case_id, case_number, title, judge_id, status):
+        with self._lock:
+            self._remove(case_id)
+            self._cases[case_id] = (case_number, title or '', judge_id, status)
+            for scope in _scopes(judge_id):
+                bisect.insort(self._numbers.setdefault(scope, []), (case_number.lower(), case_id))
+                for token in set(TOKEN_RE.findall((title or '').lower())):
+                    bisect.insort(self._tokens.setdefault(scope, []), (token, case_id))
+
+    def remove(self, case_id):
+        with self._lock:
+            self._remove(case_id)
+
+    def _remove(self, case_id):
+        entry = self._cases.pop(case_id, None)
+        if entry is None:
+            return
+        case_number, title, judge_id, _ = entry
+        for scope in _scopes(judge_id):
+            _discard(self._numbers.get(scope, []), (case_number.lower(), case_id))
+            for token in set(TOKEN_RE.findall(title.lower())):
+                _discard(self._tokens.get(scope, []), (token, case_id))
+
+    def _on_event(self, event):
+        if event.get('topic') != 'case' or self._loaded_at is None:
+            return
+        data = event['data']
+        if event['op'] in ('created', 'updated'):
+            self.add(data['id'], data['case_number'], data.get('title'), event.get('judge_id'), data.get('status'))
+        elif event['op'] == 'deleted':
+            self.remove(data['id'])
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+    def suggest(self, prefix, limit=10, judge_id=None, include_titles=False):
+        """
+        Case numbers starting with `prefix`, then (optionally) cases with a
+        title word starting with it. `judge_id` restricts results to that
+        judge's cases.
+        """
+        self._ensure_loaded()
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+
+        results, seen = [], set()
+        with self._lock:
+            self._scan(self._numbers.get(judge_id, []), prefix, 'case_number', limit, results, seen)
+            if include_titles:
+                self._scan(self._tokens.get(judge_id, []), prefix, 'title', limit, results, seen)
+        return results
+
+    def _scan(self, entries, prefix, match, limit, results, seen):
+        position = bisect.bisect_left(entries, (prefix,))
+        while position < len(entries) and len(results) < limit:
+            key, case_id = entries[position]
+            if not key.startswith(prefix):
+                break
+            if case_id not in seen:
+                seen.add(case_id)
+                case_number, title, _, status = self._cases[case_id]
+                results.append({
+                    'id': case_id,
+                    'case_number': case_number,
+                    'title': title,
+                    'status': status,
+                    'match': match
+                })
+            position += 1
+
+
+def _scopes(judge_id):
+    """The lists a case belongs in: all cases, and its judge's if it has one."""
+    return (None,) if judge_id is None else (None, judge_id)
+
+
+def _discard(entries, entry):
+    position = bisect.bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
+
+
+case_index = CaseNumberIndex()
@@ -0,0 +1,118 @@
+# app/utils/citations.py
+"""
+Citation graph between cases.
+
+Rulings cite other cases by number (CR-2024-001). At ingest a file's text
+is scanned once with a single compiled pattern whose alternatives cover
+the canonical form and the variants OCR produces (slashes, en-dashes,
+stray spaces around the separators). Each distinct citation becomes one
+row of case_citations, indexed from both ends, so "what does this case
+cite" and "which cases cite it" are single index range reads. Numbers
+that do not match a case yet are kept and linked when that case is
+created.
+"""
+import re
+
+import click
+from sqlalchemy import delete, select, update
+
+from app import db
+from app.models import Case, CaseCitation, CaseFile
+from app.utils.analysis import page_at, page_starts
+from app.utils.validators import validate_case_number
+
+_DASH = r'[-‐‑‒–—]'
+CITATION_RE = re.compile(
+    r'(?<![A-Za-z0-9])(?P<prefix>[A-Z]{2,4})'
+    r'(?:'
+    rf'(?P<d>\s?{_DASH}\s?)'          # CR-2024-001, CR – 2024 – 001
+    r'|(?P<s>\s?/\s?)'                # CR/2024/001
+    r'|(?P<w>\s)'                     # CR 2024 001
+    r')(?P<year>\d{4})'
+    rf'(?:(?(d)\s?{_DASH}\s?|(?(s)\s?/\s?|\s)))'
+    r'(?P<serial>\d{3,5})(?![A-Za-z0-9])'
+)
+
+
+def extract_citations(text):
+    """{canonical case number: (mentions, offset of first mention)} in `text`."""
+    found = {}
+    for match in CITATION_RE.finditer(text or ''):
+        number = f"{match.group('prefix')}-{match.group('year')}-{match.group('serial')}"
+        if not validate_case_number(number):
+            continue
+        mentions, first = found.get(number, (0, match.start()))
+        found[number] = (mentions + 1, first)
+    return found
+
+
+class CitationIndex:
+    """Maintains the case_citations adjacency table."""
+
+    def init_app(self, app):
+        @app.cli.command('cases-citations')
+        @click.option('--batch-size', default=200, show_default=True)
+        def cases_citations_command(batch_size):
+            """Extract citations from every existing case file."""
+            click.echo(f'Found {self.backfill(batch_size)} citations')
+
+    def index_file(self, case_file, analyzed=None):
+        """
+        Ingest stage: replace the file's outgoing citations in the current
+        transaction. Returns the number of distinct cases cited.
+        """
+        self.forget_file(case_file.id)
+        found = extract_citations(case_file.ocr_text)
+        own_number = case_file.case.case_number if case_file.case else None
+        found.pop(own_number, None)
+        if not found:
+            return 0
+
+        known = dict(db.session.execute(
+            select(Case.case_number, Case.id).where(Case.case_number.in_(list(found)))
+        ).all())
+        pages = page_starts(case_file.ocr_text)
+        db.session.add_all(
+            CaseCitation(citing_file_id=case_file.id, citing_case_id=case_file.case_id,
+                         cited_number=number, cited_case_id=known.get(number),
+                         mentions=mentions, first_page=page_at(pages, first))
+            for number, (mentions, first) in found.items()
+        )
+        return len(found)
+
+    def forget_file(self, file_id):
+        db.session.execute(delete(CaseCitation).where(CaseCitation.citing_file_id == file_id))
+
+    def link_case(self, case):
+        """Attach citations recorded before `case` existed; the caller commits."""
+        db.session.execute(
+            update(CaseCitation).where(CaseCitation.cited_number == case.case_number,
+                                       CaseCitation.citing_case_id != case.id)
+            .values(cited_case_id=case.id),
+            execution_options={'synchronize_session': False}
+        )
+
+    def unlink_case(self, case_id):
+        """Citations of a deleted case fall back to the bare number."""
+        db.session.execute(
+            update(CaseCitation).where(CaseCitation.cited_case_id == case_id).values(cited_case_id=None),
+            execution_options={'synchronize_session': False}
+        )
+
+    def backfill(self, batch_size=200):
+        """Re-extract citations for every case file, in id order."""
+        count = 0
+        last_id = 0
+        while True:
+            batch = CaseFile.query.filter(CaseFile.id > last_id).order_by(CaseFile.id).limit(batch_size).all()
+            if not batch:
+                break
+            for case_file in batch:
+                count += self.index_file(case_file)
+            last_id = batch[-1].id
+            db.session.commit()
+            db.session.expunge_all()
+        return count
+
+
+citation_index = CitationIndex()
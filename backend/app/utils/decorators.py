@@ -1,8 +1,7 @@
 # app/utils/decorators.py
 from functools import wraps
 from flask import jsonify
-from flask_jwt_extended import get_jwt_identity
-from app.models import User
+from app.utils.principal import current_principal
 
 def role_required(*required_roles):
     """
@@ -17,8 +16,7 @@ def role_required(*required_roles):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             try:
-                current_user_id = get_jwt_identity()
-                user = User.query.get(int(current_user_id))
+                user = current_principal()
                 
                 if not user:
                     return jsonify({'error': 'User not found'}), 404
@@ -0,0 +1,295 @@
+# app/utils/entities.py
+"""
+Named entities extracted from case files at ingest.
+
+Parties, advocates, statute references and dates are pulled from each
+file's text (and parties also from the case title) with compiled patterns
+tuned to the layout of Kenyan pleadings and rulings. Names are normalised
+to a key - case, honorifics, punctuation and company suffixes folded - so
+"JOHN KAMAU MWANGI", "Mr. John Kamau Mwangi" and "john kamau mwangi" are
+one entity. Each entity has a row in `entities` and one posting per file
+(with its case), so "every case involving this advocate" is an index read
+instead of a LIKE scan over the OCR text.
+"""
+import re
+from collections import namedtuple
+from datetime import date
+
+import click
+from sqlalchemy import delete, distinct, func, insert, select, update
+
+from app import db
+from app.models import Case, CaseFile, Entity, EntityPosting
+from app.utils.analysis import normalize, page_at, page_starts
+
+KINDS = ('party', 'advocate', 'statute', 'date')
+MAX_NAME_LENGTH = 120
+
+Mention = namedtuple('Mention', 'kind key name offset')
+
+_NAME = r"[A-Z][A-Za-z'\-]+(?:\s+(?:&\s+)?[A-Z][A-Za-z'\-]+\.?){0,5}"
+_ROLE = (r'(?i:plaintiff|defendant|applicant|respondent|appellant|petitioner|accused|'
+         r'complainant|interested\s+party|prosecut(?:or|ion)|state)')
+_ORDINAL = r'(?i:\d+(?:st|nd|rd|th)\s+)?'
+
+# Cause-list style: "JOHN KAMAU MWANGI ........ 1ST RESPONDENT"
+PARTY_ROLE_RE = re.compile(
+    rf'^[ \t]*(?P<name>[A-Z][A-Za-z.&,\'\- ]{{2,{MAX_NAME_LENGTH}}}?)[ \t]*(?:\.{{3,}}|…+|-{{3,}}|_{{3,}})'
+    rf'[ \t]*{_ORDINAL}{_ROLE}(?i:s)?\b',
+    re.MULTILINE
+)
+# Companies anywhere in the text: "Kenya Commercial Bank Limited"
+COMPANY_RE = re.compile(
+    rf"\b(?P<name>{_NAME}\s+(?:Limited|Ltd|LLP|PLC|Sacco|Company|Co\.?\s+Ltd|Bank|Insurance|Authority))\b\.?"
+)
+# Case titles: "Republic v John Kamau", "ABC Ltd vs. XYZ Bank"
+TITLE_PARTIES_RE = re.compile(r'\s+(?:v|vs|versus)\.?\s+', re.IGNORECASE)
+
+# "Mr. Otieno for the Applicant", "Ms Wanjiru, learned counsel for the 2nd Respondent"
+ADVOCATE_RE = re.compile(
+    rf"\b(?:Mr|Mrs|Ms|Miss|Dr|Prof|MR|MRS|MS|DR)\.?\s+(?P<name>{_NAME})\s*,?\s*"
+    rf"(?i:(?:learned\s+)?(?:counsel|advocate)\s+)?(?i:appear(?:ed|ing)\s+)?(?i:for\s+the)\s+{_ORDINAL}{_ROLE}"
+)
+# Firms: "Kamau & Associates Advocates", "M/s Otieno & Co. Advocates"
+FIRM_RE = re.compile(
+    rf"(?:\bM/[Ss]\.?\s+)?\b(?P<name>{_NAME})\s+(?i:advocates)\b"
+)
+
+# "section 296(2) of the Penal Code", "Article 50(2) of the Constitution"
+SECTION_RE = re.compile(
+    r'\b(?P<unit>(?i:sections?|s\.|sec\.|articles?|art\.|rules?|order))\s*(?P<number>\d+[A-Z]?(?:\s?\(\w{1,4}\))*)'
+    r'\s+of\s+the\s+(?P<act>(?:[A-Z][A-Za-z,\'()]*\s+){0,8}?(?:Act|Code|Constitution|Rules|Regulations))'
+)
+# Bare references: "the Land Registration Act, 2012", "the Penal Code (Cap. 63)"
+ACT_RE = re.compile(
+    r'\bthe\s+(?P<act>(?:[A-Z][A-Za-z,\'()]*\s+){1,8}?(?:Act|Code))\b'
+)
+
+_MONTHS = {name: i + 1 for i, name in enumerate(
+    ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'])}
+_MONTH = r'(?P<month>Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?|' \
+         r'Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)'
+DATE_RES = (
+    # "12th day of March, 2024", "12 March 2024"
+    re.compile(rf'\b(?P<day>\d{{1,2}})(?:st|nd|rd|th)?\s+(?:day\s+of\s+)?{_MONTH}\.?,?\s+(?P<year>\d{{4}})\b',
+               re.IGNORECASE),
+    # "March 12, 2024"
+    re.compile(rf'\b{_MONTH}\.?\s+(?P<day>\d{{1,2}})(?:st|nd|rd|th)?,?\s+(?P<year>\d{{4}})\b', re.IGNORECASE),
+    # "12/03/2024", "12.03.2024" (day first)
+    re.compile(r'\b(?P<day>\d{1,2})[/.\-](?P<month>\d{1,2})[/.\-](?P<year>\d{4})\b'),
+)
+
+_HONORIFICS = {'mr', 'mrs', 'ms', 'miss', 'dr', 'prof', 'hon', 'the'}
+_SUFFIXES = {'limited': 'ltd', 'company': 'co', 'incorporated': 'inc'}
+_LEADING = {'in', 'on', 'by', 'of', 'and', 'for', 'from', 'against', 'with', 'to', 'that', 'between', 'versus'}
+_NOT_PARTIES = {'court', 'judgment', 'ruling', 'the state'}
+
+
+# ----------------------------------------------------------------------
+# Normalisation
+# ----------------------------------------------------------------------
+def entity_key(kind, name):
+    """Normalised matching key of an entity name."""
+    words = re.findall(r'[a-z0-9&]+', normalize(name))
+    if kind in ('party', 'advocate'):
+        while words and words[0] in _HONORIFICS:
+            words = words[1:]
+        words = [_SUFFIXES.get(w, w) for w in words]
+    if kind == 'statute':
+        words = [w for w in words if w != 'the']
+    return ' '.join(words)[:255]
+
+
+def display_name(name):
+    """Tidy an extracted name: collapse spaces, title-case SHOUTED names."""
+    words = name.split()
+    while len(words) > 1 and words[0].lower() in _LEADING:
+        words = words[1:]
+    name = ' '.join(words).strip(' .,;:-')
+    if name.isupper() and len(name) > 4:
+        name = ' '.join(w if w in ('PLC', 'LLP') else w.capitalize() for w in name.split())
+    return name[:MAX_NAME_LENGTH]
+
+
+def _statute_name(match):
+    # Chapter numbers and years vary between citations of the same act
+    return display_name(match.group('act'))
+
+
+# ----------------------------------------------------------------------
+# Extraction
+# ----------------------------------------------------------------------
+def extract_entities(text, title=None):
+    """[Mention] found in a file's text (and its case title), in text order."""
+    text = text or ''
+    mentions = []
+
+    def add(kind, name, offset):
+        name = display_name(name)
+        key = entity_key(kind, name)
+        if len(key) >= 3 and key not in _NOT_PARTIES:
+            mentions.append(Mention(kind, key, name, offset))
+
+    if title:
+        sides = TITLE_PARTIES_RE.split(title)
+        if len(sides) == 2:
+            for side in sides:
+                for name in re.split(r'\s*(?:,|&|\band\b)\s*(?=[A-Z])', side):
+                    add('party', name, 0)
+
+    for match in PARTY_ROLE_RE.finditer(text):
+        add('party', match.group('name'), match.start('name'))
+    for match in COMPANY_RE.finditer(text):
+        add('party', match.group('name'), match.start('name'))
+
+    for match in ADVOCATE_RE.finditer(text):
+        add('advocate', match.group('name'), match.start('name'))
+    for match in FIRM_RE.finditer(text):
+        add('advocate', f"{match.group('name')} Advocates", match.start('name'))
+
+    # A sectioned reference counts once for the act and once for the section
+    sectioned = set()
+    for match in SECTION_RE.finditer(text):
+        statute = _statute_name(match)
+        add('statute', statute, match.start())
+        unit = match.group('unit').lower().rstrip('.')
+        unit = {'s': 'section', 'sec': 'section', 'art': 'article'}.get(unit, unit.rstrip('s'))
+        add('statute', f"{statute} {unit} {''.join(match.group('number').split())}", match.start())
+        sectioned.add(match.start('act'))
+    for match in ACT_RE.finditer(text):
+        if match.start('act') not in sectioned:
+            add('statute', _statute_name(match), match.start('act'))
+
+    for pattern in DATE_RES:
+        for match in pattern.finditer(text):
+            month = match.group('month')
+            month = int(month) if month.isdigit() else _MONTHS[month.lower()[:3]]
+            try:
+                value = date(int(match.group('year')), month, int(match.group('day')))
+            except ValueError:
+                continue
+            if 1900 <= value.year <= 2100:
+                mentions.append(Mention('date', value.isoformat(), value.isoformat(), match.start()))
+
+    mentions.sort(key=lambda m: m.offset)
+    return mentions
+
+
+# ----------------------------------------------------------------------
+# Index
+# ----------------------------------------------------------------------
+def _entity_ids(found):
+    """{(kind, key): entity id} for `found` {(kind, key): name}, creating missing ones."""
+    ids = {}
+    for kind in KINDS:
+        keys = [key for k, key in found if k == kind]
+        for start in range(0, len(keys), 500):
+            ids.update(((kind, key), entity_id) for key, entity_id in db.session.execute(
+                select(Entity.key, Entity.id).where(Entity.kind == kind, Entity.key.in_(keys[start:start + 500]))
+            ))
+
+    missing = [{'kind': kind, 'key': key, 'name': found[(kind, key)], 'file_count': 0}
+               for kind, key in found if (kind, key) not in ids]
+    if missing:
+        dialect = db.engine.dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            # Another worker may create the same entity concurrently
+            db.session.execute(
+                dialect_insert(Entity).on_conflict_do_nothing(index_elements=['kind', 'key']), missing
+            )
+        else:
+            db.session.execute(insert(Entity), missing)
+        for row in missing:
+            ids[(row['kind'], row['key'])] = db.session.execute(
+                select(Entity.id).where(Entity.kind == row['kind'], Entity.key == row['key'])
+            ).scalar_one()
+    return ids
+
+
+class EntityIndex:
+    """Maintains the entities dictionary and its per-file postings."""
+
+    def init_app(self, app):
+        @app.cli.command('files-entities')
+        @click.option('--batch-size', default=200, show_default=True)
+        def files_entities_command(batch_size):
+            """Re-extract entities from every existing case file."""
+            click.echo(f'Extracted entities from {self.rebuild(batch_size)} files')
+
+    def index_file(self, case_file, analyzed=None):
+        """
+        Ingest stage: replace the file's entity postings in the current
+        transaction. Returns the number of distinct entities found.
+        """
+        self.forget(case_file.id)
+        title = case_file.case.title if case_file.case else None
+        mentions = extract_entities(case_file.ocr_text, title)
+        if not mentions or case_file.case_id is None:
+            return 0
+
+        found, counts, first = {}, {}, {}
+        for mention in mentions:
+            entity = (mention.kind, mention.key)
+            found.setdefault(entity, mention.name)
+            counts[entity] = counts.get(entity, 0) + 1
+            first.setdefault(entity, mention.offset)
+
+        ids = _entity_ids(found)
+        pages = page_starts(case_file.ocr_text)
+        db.session.execute(insert(EntityPosting), [
+            {'entity_id': ids[entity], 'file_id': case_file.id, 'case_id': case_file.case_id,
+             'mentions': counts[entity], 'first_page': page_at(pages, first[entity])}
+            for entity in found
+        ])
+        db.session.execute(
+            update(Entity).where(Entity.id.in_(list(ids.values())))
+            .values(file_count=Entity.file_count + 1),
+            execution_options={'synchronize_session': False}
+        )
+        return len(found)
+
+    def forget(self, file_id):
+        """Drop a file's postings; entities no file mentions any more go too."""
+        entity_ids = db.session.execute(
+            select(EntityPosting.entity_id).where(EntityPosting.file_id == file_id)
+        ).scalars().all()
+        if not entity_ids:
+            return
+        db.session.execute(
+            update(Entity).where(Entity.id.in_(entity_ids)).values(file_count=Entity.file_count - 1),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.execute(delete(EntityPosting).where(EntityPosting.file_id == file_id))
+        db.session.execute(delete(Entity).where(Entity.id.in_(entity_ids), Entity.file_count <= 0))
+
+    def counts(self, entity_ids, judge_id=None):
+        """{entity_id: (files, cases)}; `judge_id` counts only that judge's cases."""
+        query = select(EntityPosting.entity_id, func.count(), func.count(distinct(EntityPosting.case_id))) \
+            .where(EntityPosting.entity_id.in_(list(entity_ids)))
+        if judge_id is not None:
+            query = query.join(Case, Case.id == EntityPosting.case_id).where(Case.judge_id == judge_id)
+        return {entity_id: (files, cases)
+                for entity_id, files, cases in db.session.execute(query.group_by(EntityPosting.entity_id))}
+
+    def rebuild(self, batch_size=200):
+        """Re-extract every file in id order; returns the number of files."""
+        count = 0
+        last_id = 0
+        while True:
+            batch = CaseFile.query.filter(CaseFile.id > last_id).order_by(CaseFile.id).limit(batch_size).all()
+            if not batch:
+                break
+            for case_file in batch:
+                self.index_file(case_file)
+                count += 1
+            last_id = batch[-1].id
+            db.session.commit()
+            db.session.expunge_all()
+        return count
+
+
+entity_index = EntityIndex()
@@ -0,0 +1,202 @@
+# app/utils/events.py
+import itertools
+import json
+import queue
+import threading
+from datetime import datetime
+
+
+class Subscription:
+    """A single SSE client's bounded mailbox of pending events."""
+
+    def __init__(self, hub, user_id, role, max_queue):
+        self.hub = hub
+        self.user_id = user_id
+        self.role = role
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def accepts(self, event):
+        """Judges only receive case events for their own cases; everyone else sees all case and backup events."""
+        if event['op'] in ('assigned', 'unassigned'):
+            # Only the judge a case was given to or taken from changes their counts
+            return self.role == 'judge' and event.get('judge_id') == self.user_id
+        if event['topic'] == 'file':
+            # Consumed by in-process listeners only; no dashboard counter uses them
+            return False
+        if self.role != 'judge':
+            return True
+        if event['topic'] == 'backup':
+            return True
+        return event.get('judge_id') == self.user_id
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # A slow client must never block publishers: drop the backlog and
+            # tell the client to refetch its statistics instead.
+            self.overflowed = True
+            with self.queue.mutex:
+                self.queue.queue.clear()
+
+    def get(self, timeout):
+        if self.overflowed:
+            self.overflowed = False
+            return {'id': None, 'topic': 'resync', 'op': 'resync', 'data': {}}
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    """
+    Fan-out hub that pushes compact change events to dashboard streams.
+
+    Every open stream holds only a small queue here and publishers never
+    touch the database, so idle dashboards cost almost nothing. When EVENTS_REDIS_URL is configured, events
+    are relayed through Redis pub/sub so all gunicorn workers see them.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._redis = None
+        self._channel = 'judiciary:events'
+        self.max_queue = 100
+        self.heartbeat = 25
+
+    def init_app(self, app):
+        self.max_queue = app.config.get('EVENT_QUEUE_SIZE', 100)
+        self.heartbeat = app.config.get('EVENT_HEARTBEAT_SECONDS', 25)
+        self._channel = app.config.get('EVENTS_REDIS_CHANNEL', self._channel)
+
+        redis_url = app.config.get('EVENTS_REDIS_URL')
+        if redis_url and self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(redis_url)
+            listener = threading.Thread(target=self._listen, daemon=True)
+            listener.start()
+
+    def subscribe(self, user_id, role):
+        subscription = Subscription(self, user_id, role, self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def add_listener(self, callback):
+        """Call `callback(event)` in-process for every event, from any worker."""
+        self._listeners.append(callback)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, topic, op, data, judge_id=None):
+        """Publish a change event; `judge_id` scopes case and file events."""
+        event = {
+            'topic': topic,
+            'op': op,
+            'judge_id': judge_id,
+            'data': data,
+            'at': datetime.utcnow().isoformat()
+        }
+
+        if self._redis is not None:
+            try:
+                self._redis.publish(self._channel, json.dumps(event))
+                return
+            except Exception as e:
+                print(f"Event relay failed, delivering locally: {e}")
+
+        self._dispatch(event)
+
+    def _dispatch(self, event):
+        event['id'] = next(self._ids)
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for subscription in subscribers:
+            if subscription.accepts(event):
+                subscription.put(event)
+
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Event listener failed: {e}")
+
+    def _listen(self):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self._channel)
+        for message in pubsub.listen():
+            try:
+                self._dispatch(json.loads(message['data']))
+            except (ValueError, TypeError) as e:
+                print(f"Ignoring malformed event: {e}")
+
+    def stream(self, subscription):
+        """Yield Server-Sent Event frames for a subscription until the client goes away."""
+        try:
+            yield 'retry: 5000\n\n'
+            yield format_sse({'topic': 'hello', 'op': 'hello', 'data': {}})
+
+            while True:
+                event = subscription.get(timeout=self.heartbeat)
+                if event is None:
+                    # Comment frame keeps proxies from closing idle connections
+                    yield ': keepalive\n\n'
+                    continue
+                yield format_sse(event)
+        finally:
+            subscription.close()
+
+
+def format_sse(event):
+    """Serialise an event as an SSE frame without the internal scoping fields."""
+    payload = {
+        'op': event['op'],
+        'data': event['data'],
+        'at': event.get('at')
+    }
+    frame = ''
+    if event.get('id'):
+        frame += f"id: {event['id']}\n"
+    frame += f"event: {event['topic']}\n"
+    frame += f"data: {json.dumps(payload, separators=(',', ':'))}\n\n"
+    return frame
+
+
+event_hub = EventHub()
+
+
+def case_summary(case):
+    """Compact case payload: just what the dashboard counters and table need."""
+    return {
+        'id': case.id,
+        'case_number': case.case_number,
+        'title': case.title,
+        'status': case.status,
+        'case_type': case.case_type,
+        'court_station': case.court_station,
+        'created_at': case.created_at.isoformat() if case.created_at else None
+    }
+
+
+def file_summary(case_file):
+    return {
+        'id': case_file.id,
+        'case_id': case_file.case_id,
+        'document_type': case_file.document_type,
+        'file_size': case_file.file_size
+    }
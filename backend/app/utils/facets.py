@@ -0,0 +1,71 @@
+# app/utils/facets.py
+"""
+Facet counts for search results.
+
+All requested facets come from a single GROUP BY over the matching set,
+grouped by every facet column at once; the per-facet counts are then
+rolled up from those combined groups. The number of groups is bounded by
+the combinations that actually occur, which stays small for these
+low-cardinality columns.
+"""
+from collections import Counter
+
+from sqlalchemy import extract, func
+
+from app.models import Case, CaseFile, User
+
+FACETS = {
+    'document_type': lambda: CaseFile.document_type,
+    'case_type': lambda: Case.case_type,
+    'court_station': lambda: Case.court_station,
+    'judge': lambda: Case.judge_id,
+    'year': lambda: extract('year', CaseFile.created_at),
+}
+
+
+def parse_facets(value):
+    """
+    Facet names requested by a `facets` query parameter: 'true' or 'all'
+    for every facet, otherwise a comma-separated list. Raises ValueError
+    for unknown names.
+    """
+    if not value or value.lower() in ('false', '0', 'none'):
+        return []
+    if value.lower() in ('true', '1', 'all'):
+        return list(FACETS)
+    names = [n.strip() for n in value.split(',') if n.strip()]
+    unknown = [n for n in names if n not in FACETS]
+    if unknown:
+        raise ValueError(f'Unknown facets: {", ".join(unknown)}')
+    return list(dict.fromkeys(names))
+
+
+def compute_facets(search_query, names):
+    """{facet: [{'value', 'count'}, ...]} for the rows `search_query` matches."""
+    if not names:
+        return {}
+
+    columns = [FACETS[name]() for name in names]
+    rows = search_query.order_by(None)\
+        .with_entities(*columns, func.count(CaseFile.id))\
+        .group_by(*columns).all()
+
+    counts = {name: Counter() for name in names}
+    for row in rows:
+        count = row[-1]
+        for name, value in zip(names, row[:-1]):
+            if value is not None:
+                counts[name][int(value) if name == 'year' else value] += count
+
+    facets = {
+        name: [{'value': value, 'count': count}
+               for value, count in sorted(counter.items(), key=lambda item: (-item[1], str(item[0])))]
+        for name, counter in counts.items()
+    }
+
+    if 'judge' in facets and facets['judge']:
+        names_by_id = dict(User.query.filter(User.id.in_([b['value'] for b in facets['judge']]))
+                           .with_entities(User.id, User.full_name).all())
+        for bucket in facets['judge']:
+            bucket['label'] = names_by_id.get(bucket['value'])
+    return facets
@@ -0,0 +1,221 @@
+# app/utils/fingerprint.py
+"""
+Near-duplicate detection for case files.
+
+Each file's OCR text is reduced to word 3-shingles and a 128-value MinHash
+signature (one-permutation hashing: a single 64-bit hash per shingle,
+binned, with empty bins densified from their neighbours). The signature is
+split into 16 bands of 8 values; files that agree on a whole band share an
+LSH bucket row, so candidates for a new file come from an indexed lookup
+of its 16 buckets rather than a comparison with every stored signature.
+Candidates are confirmed by estimated Jaccard similarity, and a file that
+clears the threshold joins the earliest copy's group (`duplicate_of`).
+"""
+import hashlib
+import struct
+
+import click
+from sqlalchemy import delete, func, select, tuple_, update
+
+from app import db
+from app.models import FileFingerprint, FingerprintBand
+
+SIGNATURE_SIZE = 128
+BANDS = 16
+ROWS = SIGNATURE_SIZE // BANDS
+SHINGLE_SIZE = 3
+_EMPTY = (1 << 64) - 1
+_BIN_SPAN = 1 << 57  # per-bin values are below 2**64 / SIGNATURE_SIZE
+
+
+def _hash64(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'big')
+
+
+def shingles(terms, size=SHINGLE_SIZE):
+    return {' '.join(terms[i:i + size]) for i in range(len(terms) - size + 1)}
+
+
+def signature(shingle_set):
+    """One-permutation MinHash signature of a shingle set."""
+    bins = [_EMPTY] * SIGNATURE_SIZE
+    for shingle in shingle_set:
+        value = _hash64(shingle.encode('utf-8'))
+        index = value % SIGNATURE_SIZE
+        value //= SIGNATURE_SIZE
+        if value < bins[index]:
+            bins[index] = value
+
+    if all(v == _EMPTY for v in bins):
+        return bins
+    # Densify: an empty bin borrows the next filled bin's value, offset by
+    # the distance so borrowed values never collide with genuine ones
+    dense = list(bins)
+    for i, value in enumerate(bins):
+        if value == _EMPTY:
+            distance = 1
+            while bins[(i + distance) % SIGNATURE_SIZE] == _EMPTY:
+                distance += 1
+            dense[i] = bins[(i + distance) % SIGNATURE_SIZE] + distance * _BIN_SPAN
+    return dense
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / SIGNATURE_SIZE
+
+
+def band_buckets(sig):
+    """[(band, bucket key)] for the LSH table; keys are signed 64-bit."""
+    return [
+        (band, int.from_bytes(
+            hashlib.blake2b(struct.pack(f'>{ROWS}Q', *sig[band * ROWS:(band + 1) * ROWS]), digest_size=8).digest(),
+            'big', signed=True))
+        for band in range(BANDS)
+    ]
+
+
+def _pack(sig):
+    return struct.pack(f'>{SIGNATURE_SIZE}Q', *sig)
+
+
+def _unpack(data):
+    return list(struct.unpack(f'>{SIGNATURE_SIZE}Q', data))
+
+
+class NearDuplicateIndex:
+    """Fingerprint store plus LSH candidate lookup, backed by two tables."""
+
+    def __init__(self):
+        self.threshold = 0.8
+        self.min_shingles = 20
+        self.max_candidates = 200
+
+    def init_app(self, app):
+        self.threshold = app.config.get('DUPLICATE_THRESHOLD', 0.8)
+        self.min_shingles = app.config.get('DUPLICATE_MIN_SHINGLES', 20)
+        self.max_candidates = app.config.get('DUPLICATE_MAX_CANDIDATES', 200)
+
+        @app.cli.command('files-fingerprint')
+        def files_fingerprint_command():
+            """Recompute near-duplicate fingerprints for every case file."""
+            click.echo(f'Fingerprinted {self.rebuild()} files')
+
+    def fingerprint_file(self, case_file, analyzed):
+        """
+        (Re)fingerprint a file in the current transaction; the caller
+        commits. Returns its FileFingerprint, or None if the text is too
+        short to judge.
+        """
+        self.forget(case_file.id)
+        shingle_set = shingles([token.term for token in analyzed.get('content', [])])
+        if len(shingle_set) < self.min_shingles:
+            return None
+
+        sig = signature(shingle_set)
+        buckets = band_buckets(sig)
+
+        # Files sharing the most bands first; a cap bounds work on boilerplate
+        candidate_ids = db.session.execute(
+            select(FingerprintBand.file_id)
+            .where(tuple_(FingerprintBand.band, FingerprintBand.bucket).in_(buckets),
+                   FingerprintBand.file_id != case_file.id)
+            .group_by(FingerprintBand.file_id)
+            .order_by(func.count().desc(), FingerprintBand.file_id)
+            .limit(self.max_candidates)
+        ).scalars().all()
+
+        best = None
+        if candidate_ids:
+            for candidate in FileFingerprint.query.filter(FileFingerprint.file_id.in_(candidate_ids)):
+                score = similarity(sig, _unpack(candidate.signature))
+                if score >= self.threshold and (best is None or score > best[0]):
+                    best = (score, candidate.duplicate_of or candidate.file_id)
+
+        fingerprint = FileFingerprint(
+            file_id=case_file.id,
+            signature=_pack(sig),
+            shingle_count=len(shingle_set),
+            duplicate_of=best[1] if best else None,
+            similarity=round(best[0], 4) if best else None
+        )
+        db.session.add(fingerprint)
+        db.session.add_all(FingerprintBand(band=band, bucket=bucket, file_id=case_file.id)
+                           for band, bucket in buckets)
+        return fingerprint
+
+    def forget(self, file_id):
+        """Drop a file's fingerprint; its copies regroup under the next earliest one."""
+        db.session.execute(delete(FingerprintBand).where(FingerprintBand.file_id == file_id))
+        copies = db.session.execute(
+            select(FileFingerprint.file_id).where(FileFingerprint.duplicate_of == file_id)
+            .order_by(FileFingerprint.file_id)
+        ).scalars().all()
+        if copies:
+            db.session.execute(
+                update(FileFingerprint).where(FileFingerprint.file_id == copies[0])
+                .values(duplicate_of=None, similarity=None),
+                execution_options={'synchronize_session': False}
+            )
+            db.session.execute(
+                update(FileFingerprint).where(FileFingerprint.file_id.in_(copies[1:]))
+                .values(duplicate_of=copies[0]),
+                execution_options={'synchronize_session': False}
+            )
+        db.session.execute(delete(FileFingerprint).where(FileFingerprint.file_id == file_id))
+
+    def duplicates_of(self, file_id):
+        """[(file id, estimated similarity)] of the other files in a file's group."""
+        fingerprint = db.session.get(FileFingerprint, file_id)
+        if fingerprint is None:
+            return []
+        group = fingerprint.duplicate_of or file_id
+        members = FileFingerprint.query.filter(
+            (FileFingerprint.file_id == group) | (FileFingerprint.duplicate_of == group),
+            FileFingerprint.file_id != file_id
+        ).all()
+        sig = _unpack(fingerprint.signature)
+        return sorted(((m.file_id, round(similarity(sig, _unpack(m.signature)), 4)) for m in members),
+                      key=lambda item: -item[1])
+
+    def group_info(self, file_ids):
+        """{file_id: {'duplicate_of', 'duplicate_count'}} for fingerprinted files."""
+        rows = db.session.execute(
+            select(FileFingerprint.file_id, FileFingerprint.duplicate_of)
+            .where(FileFingerprint.file_id.in_(list(file_ids)))
+        ).all()
+        if not rows:
+            return {}
+        groups = {file_id: duplicate_of or file_id for file_id, duplicate_of in rows}
+        group_key = func.coalesce(FileFingerprint.duplicate_of, FileFingerprint.file_id)
+        sizes = dict(db.session.execute(
+            select(group_key, func.count()).where(group_key.in_(set(groups.values()))).group_by(group_key)
+        ).all())
+        return {
+            file_id: {'duplicate_of': duplicate_of, 'duplicate_count': sizes.get(groups[file_id], 1) - 1}
+            for file_id, duplicate_of in rows
+        }
+
+    def rebuild(self, batch_size=200):
+        """Fingerprint every file in id order, so the earliest copy leads each group."""
+        from app.models import CaseFile
+        from app.utils.search_index import analyze_document
+
+        db.session.execute(delete(FingerprintBand))
+        db.session.execute(delete(FileFingerprint))
+        count = 0
+        last_id = 0
+        while True:
+            batch = CaseFile.query.filter(CaseFile.id > last_id).order_by(CaseFile.id).limit(batch_size).all()
+            if not batch:
+                break
+            for case_file in batch:
+                if self.fingerprint_file(case_file, analyze_document(case_file)) is not None:
+                    count += 1
+            last_id = batch[-1].id
+            db.session.commit()
+            db.session.expunge_all()
+        return count
+
+
+duplicate_index = NearDuplicateIndex()
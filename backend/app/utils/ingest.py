@@ -0,0 +1,71 @@
+# app/utils/ingest.py
+"""
+Post-processing pipeline for case files.
+
+Runs once a file's text is final (after upload and OCR): every stage sees
+the same analysed fields, so the text is tokenised only once per file.
+Failures are logged and never undo the upload itself.
+"""
+from flask import current_app
+
+from app import db
+from app.utils import percolator, search_index
+from app.utils.citations import citation_index
+from app.utils.entities import entity_index
+from app.utils.events import event_hub, file_summary
+from app.utils.fingerprint import duplicate_index
+from app.utils.related import related_index
+
+STAGES = (
+    ('fingerprint', duplicate_index.fingerprint_file),
+    ('saved searches', percolator.percolate),
+    ('related files', related_index.update_file),
+    ('citations', citation_index.index_file),
+    ('entities', entity_index.index_file),
+)
+
+
+def ingest_file(case_file):
+    """Index a new or re-processed file and run the downstream stages."""
+    try:
+        analyzed = search_index.index_file(case_file)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error('Ingest failed for file %s: %s', case_file.id, e)
+        return
+
+    # Downstream stages reuse the analysed text; each commits on its own
+    for name, stage in STAGES:
+        try:
+            stage(case_file, analyzed)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error('Ingest stage %s failed for file %s: %s', name, case_file.id, e)
+
+    # New text is searchable: lets cached results (in every worker) refresh
+    judge_id = case_file.case.judge_id if case_file.case else None
+    event_hub.publish('file', 'indexed', file_summary(case_file), judge_id=judge_id)
+
+
+def reindex_case(case):
+    """Refresh the case-level fields (title, number) of every file in a case."""
+    try:
+        for case_file in case.files:
+            search_index.index_file(case_file)
+            entity_index.index_file(case_file)  # parties named in the title
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error('Reindex failed for case %s: %s', case.id, e)
+
+
+def forget_file(file_id):
+    """Remove a file from every index; runs inside the caller's transaction."""
+    search_index.remove_file(file_id)
+    duplicate_index.forget(file_id)
+    related_index.forget(file_id)
+    percolator.forget_file(file_id)
+    citation_index.forget_file(file_id)
+    entity_index.forget(file_id)
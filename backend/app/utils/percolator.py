@@ -0,0 +1,187 @@
+# app/utils/percolator.py
+"""
+Saved searches matched against new files at ingest (percolation).
+
+Instead of re-running every saved query over the archive, each query is
+registered under "anchor" terms: a set of terms at least one of which any
+matching file must contain (the rarest word of a required clause, or the
+union over an OR's branches). When a file is ingested, its own terms pick
+the candidate queries from that reverse index and only those are checked
+against the file in memory. The work per file depends on the file and the
+candidates, not on the size of the archive.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import delete, select
+
+from app import db
+from app.models import SavedSearch, SavedSearchKey, SearchNotification, SearchTerm
+from app.utils.analysis import query_words
+from app.utils.principal import load_principal
+from app.utils.query_language import (
+    TEXT_FIELDS, And, Not, Or, QuerySyntaxError, Term, parse_query, structured_match
+)
+from app.utils.search_index import FIELDS
+
+ANY_KEY = '*'  # queries without anchor terms are checked for every file
+
+
+# ----------------------------------------------------------------------
+# Registration
+# ----------------------------------------------------------------------
+def _words(node):
+    if isinstance(node, Term):
+        return {t for w in query_words(node.value) for t in w.terms} if node.is_text else set()
+    if isinstance(node, Not):
+        return _words(node.child)
+    return set().union(*(_words(child) for child in node.children))
+
+
+def anchor_terms(node, frequencies):
+    """Terms of which a matching file must contain at least one, or None."""
+    if isinstance(node, Term):
+        words = query_words(node.value) if node.is_text else []
+        if not words:
+            return None
+        # A file matches the word through any of its stems
+        rarest = min(words, key=lambda w: (sum(frequencies.get(t, 0) for t in w.terms), -len(w.word)))
+        return set(rarest.terms)
+    if isinstance(node, And):
+        options = [a for a in (anchor_terms(child, frequencies) for child in node.children) if a]
+        if not options:
+            return None
+        return min(options, key=lambda terms: sum(frequencies.get(t, 0) for t in terms))
+    if isinstance(node, Or):
+        union = set()
+        for child in node.children:
+            anchors = anchor_terms(child, frequencies)
+            if not anchors:
+                return None
+            union |= anchors
+        return union
+    return None
+
+
+def register(saved_search):
+    """
+    Validate the query and (re)write its reverse-index keys in the current
+    transaction. Raises QuerySyntaxError for an invalid query.
+    """
+    node = parse_query(saved_search.query_text)
+    words = _words(node)
+    frequencies = dict(db.session.execute(
+        select(SearchTerm.term, SearchTerm.doc_freq).where(SearchTerm.term.in_(list(words)))
+    ).all()) if words else {}
+    anchors = anchor_terms(node, frequencies) or {ANY_KEY}
+
+    if saved_search.id is None:
+        db.session.flush()
+    db.session.execute(delete(SavedSearchKey).where(SavedSearchKey.saved_search_id == saved_search.id))
+    db.session.add_all(SavedSearchKey(term=term, saved_search_id=saved_search.id) for term in anchors)
+    return anchors
+
+
+# ----------------------------------------------------------------------
+# Matching
+# ----------------------------------------------------------------------
+class _Document:
+    """Term positions of one analysed file, for in-memory query checks."""
+
+    def __init__(self, case_file, analyzed):
+        self.case_file = case_file
+        self.positions = {}
+        for field, tokens in analyzed.items():
+            by_term = defaultdict(set)
+            for token in tokens:
+                by_term[token.term].add(token.position)
+            self.positions[field] = by_term
+
+    @property
+    def terms(self):
+        return set().union(*self.positions.values())
+
+    def contains(self, word, fields):
+        return any(t in self.positions.get(field, ()) for field in fields for t in word.terms)
+
+    def has_phrase(self, words, fields):
+        first = words[0]
+        for field in fields:
+            by_term = self.positions.get(field, {})
+            starts = set().union(*(by_term.get(t, ()) for t in first.terms))
+            if any(all(any(o + w.position - first.position in by_term.get(t, ()) for t in w.terms)
+                       for w in words[1:]) for o in starts):
+                return True
+        return False
+
+
+def matches(node, document):
+    """Whether a parsed query matches one document."""
+    if isinstance(node, Term):
+        if not node.is_text:
+            return structured_match(node, document.case_file)
+        fields = [TEXT_FIELDS[node.field]] if node.field else FIELDS
+        words = query_words(node.value)
+        if not words or not all(document.contains(w, fields) for w in words):
+            return False
+        return not node.phrase or len(words) < 2 or document.has_phrase(words, fields)
+    if isinstance(node, And):
+        return all(matches(child, document) for child in node.children)
+    if isinstance(node, Or):
+        return any(matches(child, document) for child in node.children)
+    if isinstance(node, Not):
+        return not matches(node.child, document)
+    raise TypeError(f'Unknown query node {node!r}')
+
+
+def _can_see(principal, case_file):
+    if not principal or not principal.is_active:
+        return False
+    if principal.role == 'judge':
+        return case_file.case is not None and case_file.case.judge_id == principal.id
+    return True
+
+
+def percolate(case_file, analyzed):
+    """
+    Record notifications for every active saved search the file matches;
+    runs in the current transaction. Returns the number of new matches.
+    """
+    document = _Document(case_file, analyzed)
+    keys = list(document.terms | {ANY_KEY})
+
+    candidate_ids = set()
+    for start in range(0, len(keys), 500):
+        candidate_ids.update(db.session.execute(
+            select(SavedSearchKey.saved_search_id).where(SavedSearchKey.term.in_(keys[start:start + 500]))
+        ).scalars())
+    if not candidate_ids:
+        return 0
+
+    notified = set(db.session.execute(
+        select(SearchNotification.saved_search_id).where(SearchNotification.file_id == case_file.id)
+    ).scalars())
+    searches = SavedSearch.query.filter(SavedSearch.id.in_(candidate_ids - notified),
+                                        SavedSearch.is_active.is_(True)).all()
+
+    now = datetime.utcnow()
+    count = 0
+    for saved_search in searches:
+        if not _can_see(load_principal(saved_search.user_id), case_file):
+            continue
+        try:
+            if not matches(parse_query(saved_search.query_text), document):
+                continue
+        except QuerySyntaxError:
+            continue
+        db.session.add(SearchNotification(user_id=saved_search.user_id, saved_search_id=saved_search.id,
+                                          file_id=case_file.id, case_id=case_file.case_id))
+        saved_search.match_count += 1
+        saved_search.last_matched_at = now
+        count += 1
+    return count
+
+
+def forget_file(file_id):
+    """Drop notifications about a deleted file in the current transaction."""
+    db.session.execute(delete(SearchNotification).where(SearchNotification.file_id == file_id))
@@ -0,0 +1,107 @@
+# app/utils/principal.py
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import g, has_app_context
+from flask_jwt_extended import get_jwt_identity
+
+# Read-only snapshot of the fields handlers need for authorization.
+# ORM instances are never shared across requests or sessions.
+Principal = namedtuple('Principal', [
+    'id', 'email', 'full_name', 'role', 'court_station', 'is_active', 'is_approved'
+])
+
+
+class PrincipalCache:
+    """Bounded LRU of principals with a short TTL, shared by all requests in a process."""
+
+    def __init__(self, max_size=1024, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or entry[1] < time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user_id, principal):
+        with self._lock:
+            self._entries[user_id] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+def init_app(app):
+    principal_cache.max_size = app.config.get('PRINCIPAL_CACHE_SIZE', 1024)
+    principal_cache.ttl = app.config.get('PRINCIPAL_CACHE_TTL', 60)
+
+
+def load_principal(user_id):
+    """Principal for a user id, from the shared cache or a single DB lookup."""
+    from app.models import User
+
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+    principal = principal_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    user = User.query.get(user_id)
+    if not user:
+        return None
+
+    principal = Principal(
+        id=user.id,
+        email=user.email,
+        full_name=user.full_name,
+        role=user.role,
+        court_station=user.court_station,
+        is_active=user.is_active,
+        is_approved=user.is_approved
+    )
+    principal_cache.put(user_id, principal)
+    return principal
+
+
+def current_principal():
+    """The authenticated user for this request, resolved at most once per request."""
+    if '_principal' not in g:
+        g._principal = load_principal(get_jwt_identity())
+    return g._principal
+
+
+def invalidate_principal(user_id):
+    """
+    Drop a user's cached principal after their role, status or credentials change.
+
+    Other worker processes pick up the change when their entry's TTL expires.
+    """
+    principal_cache.invalidate(int(user_id))
+    if has_app_context():
+        principal = g.get('_principal')
+        if principal is not None and principal.id == int(user_id):
+            g.pop('_principal')
@@ -0,0 +1,397 @@
+# app/utils/query_language.py
+"""
+Query language for advanced search.
+
+    title:"Republic vs" AND doctype:ruling NOT station:Kisumu year:2024..2025
+
+Terms are bare words, "quoted phrases" or field:value pairs; values can be
+ranges (a..b). Clauses combine with AND, OR, NOT / leading '-', and
+parentheses; juxtaposed clauses use the default operator (AND).
+
+Text fields are answered from the full-text index: posting lists of the
+text terms in an AND are intersected in SQL (an INTERSECT of per-word
+subqueries), and only the survivors of a phrase are checked against
+positions. Structured fields compile to SQL conditions on indexed columns
+and are applied in the same query, so pagination is exact.
+"""
+import re
+from dataclasses import dataclass, field as dataclass_field
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import and_, false, func, intersect, not_, or_, select, true
+
+from app import db
+from app.models import Case, CaseFile, SearchTerm
+from app.utils.analysis import query_words
+from app.utils.search_index import files_matching, fuzzy_expansions, phrase_matches
+
+TEXT_FIELDS = {
+    'title': 'title', 'content': 'content', 'text': 'content', 'ocr': 'content',
+    'filename': 'filename', 'file': 'filename', 'number': 'number', 'case': 'number'
+}
+STRUCTURED_FIELDS = {'doctype', 'type', 'casetype', 'station', 'status', 'judge', 'year', 'date'}
+
+
+class QuerySyntaxError(ValueError):
+    def __init__(self, message, position):
+        super().__init__(f'{message} at position {position}')
+        self.position = position
+
+
+# ----------------------------------------------------------------------
+# AST
+# ----------------------------------------------------------------------
+@dataclass
+class Term:
+    field: Optional[str]
+    value: str
+    phrase: bool = False
+    upper: Optional[str] = None  # set for ranges
+
+    @property
+    def is_text(self):
+        return self.field is None or self.field in TEXT_FIELDS
+
+
+@dataclass
+class Not:
+    child: object
+
+
+@dataclass
+class And:
+    children: List[object] = dataclass_field(default_factory=list)
+
+
+@dataclass
+class Or:
+    children: List[object] = dataclass_field(default_factory=list)
+
+
+# ----------------------------------------------------------------------
+# Parsing
+# ----------------------------------------------------------------------
+_TOKEN_RE = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<lparen>\()
+  | (?P<rparen>\))
+  | (?P<minus>-(?=[\w"(]))
+  | (?P<fieldname>[A-Za-z_]+):
+  | (?P<phrase>"(?:[^"\\]|\\.)*")
+  | (?P<word>[^\s()"]+)
+''', re.VERBOSE)
+
+
+def _lex(text):
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if not match:
+            raise QuerySyntaxError('Unterminated phrase' if text[position] == '"' else 'Unexpected character',
+                                   position)
+        kind = match.lastgroup
+        if kind != 'ws':
+            value = match.group(kind)
+            if kind == 'word' and value in ('AND', 'OR', 'NOT'):
+                kind = value
+            tokens.append((kind, value, position))
+        position = match.end()
+    tokens.append(('end', None, position))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, text, default_operator):
+        self.tokens = _lex(text)
+        self.index = 0
+        self.default_operator = default_operator
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def take(self, kind=None):
+        token = self.tokens[self.index]
+        if kind and token[0] != kind:
+            raise QuerySyntaxError(f'Expected {kind}', token[2])
+        self.index += 1
+        return token
+
+    def parse(self):
+        node = self.parse_or()
+        kind, _, position = self.peek()
+        if kind != 'end':
+            raise QuerySyntaxError('Unexpected input', position)
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek()[0] == 'OR':
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self):
+        children = [self.parse_unary()]
+        while True:
+            kind = self.peek()[0]
+            if kind == 'AND':
+                self.take()
+                children.append(self.parse_unary())
+            elif kind in ('NOT', 'minus', 'lparen', 'fieldname', 'phrase', 'word'):
+                if self.default_operator == 'or':
+                    # Juxtaposition means OR; collect into an Or at this level
+                    right = self.parse_unary()
+                    left = children.pop() if len(children) == 1 else And(children)
+                    children = [Or([left, right])]
+                else:
+                    children.append(self.parse_unary())
+            else:
+                break
+        return children[0] if len(children) == 1 else And(children)
+
+    def parse_unary(self):
+        kind, _, _ = self.peek()
+        if kind in ('NOT', 'minus'):
+            self.take()
+            return Not(self.parse_unary())
+        return self.parse_primary()
+
+    def parse_primary(self):
+        kind, value, position = self.peek()
+        if kind == 'lparen':
+            self.take()
+            node = self.parse_or()
+            self.take('rparen')
+            return node
+        if kind == 'fieldname':
+            self.take()
+            name = value.lower()
+            if name not in TEXT_FIELDS and name not in STRUCTURED_FIELDS:
+                raise QuerySyntaxError(f'Unknown field "{name}"', position)
+            kind, value, position = self.take()
+            if kind == 'phrase':
+                return Term(name, _unquote(value), phrase=True)
+            if kind != 'word':
+                raise QuerySyntaxError(f'Missing value for field "{name}"', position)
+            if '..' in value and name not in TEXT_FIELDS:
+                lower, upper = value.split('..', 1)
+                return Term(name, lower, upper=upper)
+            return Term(name, value)
+        if kind == 'phrase':
+            self.take()
+            return Term(None, _unquote(value), phrase=True)
+        if kind == 'word':
+            self.take()
+            return Term(None, value)
+        raise QuerySyntaxError('Expected a search term', position)
+
+
+def _unquote(value):
+    return re.sub(r'\\(.)', r'\1', value[1:-1])
+
+
+def parse_query(text, default_operator='and'):
+    if not text or not text.strip():
+        raise QuerySyntaxError('Empty query', 0)
+    return _Parser(text, default_operator).parse()
+
+
+# ----------------------------------------------------------------------
+# Planning and execution
+# ----------------------------------------------------------------------
+def _year_bounds(lower, upper):
+    try:
+        start = datetime(int(lower), 1, 1)
+        end = datetime(int(upper or lower) + 1, 1, 1)
+    except ValueError:
+        raise QuerySyntaxError('Years must be numbers, e.g. year:2024..2025', 0)
+    return start, end
+
+
+def _date_bounds(lower, upper):
+    try:
+        start = datetime.strptime(lower, '%Y-%m-%d')
+        end = datetime.strptime(upper or lower, '%Y-%m-%d')
+    except ValueError:
+        raise QuerySyntaxError('Dates must look like 2024-01-31', 0)
+    return start, end.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+
+def structured_condition(term):
+    """SQL condition for a structured field term."""
+    name, value = term.field, term.value
+    if name in ('doctype', 'type'):
+        return CaseFile.document_type == value.lower()
+    if name == 'casetype':
+        return Case.case_type == value.lower()
+    if name == 'status':
+        return Case.status == value.lower()
+    if name == 'station':
+        return func.lower(Case.court_station) == value.lower()
+    if name == 'judge':
+        if not value.isdigit():
+            raise QuerySyntaxError('judge: expects a user id', 0)
+        return Case.judge_id == int(value)
+    if name == 'year':
+        start, end = _year_bounds(value, term.upper)
+        return and_(CaseFile.created_at >= start, CaseFile.created_at < end)
+    if name == 'date':
+        start, end = _date_bounds(value, term.upper)
+        return and_(CaseFile.created_at >= start, CaseFile.created_at <= end)
+    raise QuerySyntaxError(f'Unknown field "{name}"', 0)
+
+
+def structured_match(term, case_file):
+    """Python twin of structured_condition, for checking one loaded file."""
+    case = case_file.case
+    name, value = term.field, term.value
+    if name in ('doctype', 'type'):
+        return case_file.document_type == value.lower()
+    if case is None:
+        return False
+    if name == 'casetype':
+        return case.case_type == value.lower()
+    if name == 'status':
+        return case.status == value.lower()
+    if name == 'station':
+        return (case.court_station or '').lower() == value.lower()
+    if name == 'judge':
+        return value.isdigit() and case.judge_id == int(value)
+    created_at = case_file.created_at or datetime.utcnow()
+    if name == 'year':
+        start, end = _year_bounds(value, term.upper)
+        return start <= created_at < end
+    if name == 'date':
+        start, end = _date_bounds(value, term.upper)
+        return start <= created_at <= end
+    raise QuerySyntaxError(f'Unknown field "{name}"', 0)
+
+
+class QueryPlan:
+    """
+    Compiles a parsed query into one SQL condition over CaseFile JOIN Case.
+
+    `steps` records what the planner did (term and estimated size) for
+    `explain=true`; with `explain` set each step also counts the files
+    still matching, which costs a query per step.
+    """
+
+    def __init__(self, default_fields, fuzzy=False, max_edits=None, explain=False):
+        self.default_fields = list(default_fields)
+        self.fuzzy = fuzzy
+        self.max_edits = max_edits
+        self.explain = explain
+        self.steps = []
+        self.highlight_terms = set()
+        self._freq_cache = {}
+
+    # -- estimates -------------------------------------------------------
+    def _expansions(self, word, phrase):
+        """Index terms a QueryWord may match: its stems, or their fuzzy neighbours."""
+        if self.fuzzy and not phrase:
+            terms = [t for stem in word.terms for t in fuzzy_expansions(stem, self.max_edits)]
+            return list(dict.fromkeys(terms)) or list(word.terms)
+        return list(word.terms)
+
+    def _doc_freqs(self, terms):
+        missing = [t for t in terms if t not in self._freq_cache]
+        if missing:
+            found = dict(db.session.execute(
+                select(SearchTerm.term, SearchTerm.doc_freq).where(SearchTerm.term.in_(missing))
+            ).all())
+            for term in missing:
+                self._freq_cache[term] = found.get(term, 0)
+        return sum(self._freq_cache[t] for t in terms)
+
+    def estimate(self, term):
+        words = query_words(term.value)
+        if not words:
+            return 0
+        return min(self._doc_freqs(self._expansions(w, term.phrase)) for w in words)
+
+    # -- posting access --------------------------------------------------
+    def _fields(self, term):
+        return [TEXT_FIELDS[term.field]] if term.field else self.default_fields
+
+    def _add_text_selects(self, term, selects):
+        """
+        Append to `selects` one posting subquery per word of a text term,
+        rarest first. Returns False as soon as a word matches nothing.
+        """
+        fields = self._fields(term)
+        words = query_words(term.value)
+        if not words:
+            return False
+
+        unique = {w.word: w for w in words}.values()
+        expanded = sorted(
+            ({'word': w.word, 'terms': self._expansions(w, term.phrase)} for w in unique),
+            key=lambda item: self._doc_freqs(item['terms'])
+        )
+        for item in expanded:
+            estimate = self._doc_freqs(item['terms'])
+            self.highlight_terms.update(item['terms'])
+            step = {'term': item['word'], 'fields': fields, 'estimate': estimate}
+            self.steps.append(step)
+            if not estimate:
+                step['matches'] = 0
+                return False
+            selects.append(files_matching(item['terms'], fields))
+            if self.explain:
+                step['matches'] = db.session.scalar(
+                    select(func.count()).select_from(_intersect(selects).subquery())
+                )
+        return True
+
+    # -- compilation -----------------------------------------------------
+    def compile(self, node):
+        if isinstance(node, Term):
+            return self._compile_and([node])
+        if isinstance(node, And):
+            return self._compile_and(node.children)
+        if isinstance(node, Or):
+            return or_(*[self.compile(child) for child in node.children])
+        if isinstance(node, Not):
+            # A comparison with a NULL column is unknown, and NOT unknown is
+            # still unknown; count it as false first, as structured_match does
+            return not_(func.coalesce(self.compile(node.child), false()))
+        raise TypeError(f'Unknown query node {node!r}')
+
+    def _compile_and(self, children):
+        text_terms = sorted((c for c in children if isinstance(c, Term) and c.is_text), key=self.estimate)
+        conditions = []
+
+        if text_terms:
+            selects = []
+            for term in text_terms:
+                if not self._add_text_selects(term, selects):
+                    return false()
+            candidates = _intersect(selects)
+            conditions.append(CaseFile.id.in_(candidates))
+
+            # Phrases need positions, read only for files matching every word
+            for term in text_terms:
+                words = query_words(term.value)
+                if term.phrase and len(words) > 1:
+                    ids = phrase_matches(candidates, words, self._fields(term))
+                    self.steps.append({'phrase': term.value, 'fields': self._fields(term), 'matches': len(ids)})
+                    if not ids:
+                        return false()
+                    conditions.append(CaseFile.id.in_(ids))
+
+        for child in children:
+            if isinstance(child, Term) and child.is_text:
+                continue
+            if isinstance(child, Term):
+                conditions.append(structured_condition(child))
+                self.steps.append({'filter': child.field, 'value': child.value, 'upper': child.upper})
+            else:
+                conditions.append(self.compile(child))
+
+        return and_(*conditions) if conditions else true()
+
+
+def _intersect(selects):
+    return selects[0] if len(selects) == 1 else intersect(*selects)
@@ -0,0 +1,191 @@
+# app/utils/rate_limit.py
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+
+
+class MemoryWindowStore:
+    """
+    Sliding-window counters kept in process memory.
+
+    Each key holds the count for the current fixed window and the one before
+    it; the sliding count weights the previous window by how much of it still
+    overlaps the last `period` seconds. That is O(1) memory per key and close
+    enough to an exact log of timestamps for abuse protection.
+    """
+
+    def __init__(self, max_keys=100000):
+        self._windows = {}
+        self._lock = threading.Lock()
+        self.max_keys = max_keys
+
+    def hit(self, key, limit, period, now):
+        window = int(now // period)
+        with self._lock:
+            start, current, previous = self._windows.get(key, (window, 0, 0))
+            if window == start + 1:
+                current, previous = 0, current
+            elif window != start:
+                current, previous = 0, 0
+
+            estimate = _estimate(current, previous, now, period)
+            allowed = estimate < limit
+            if allowed:
+                current += 1
+            self._windows[key] = (window, current, previous)
+
+            if len(self._windows) > self.max_keys:
+                self._prune(now)
+
+        return allowed, _retry_after(current, previous, limit, now, period)
+
+    def _prune(self, now):
+        # Keys idle for two windows carry no weight any more
+        stale = [key for key, (start, _, _) in self._windows.items()
+                 if start < int(now // _period_of(key)) - 1]
+        for key in stale:
+            del self._windows[key]
+
+
+# Check and increment in one atomic step, so concurrent requests from
+# several workers cannot all read a count under the limit and pass.
+# KEYS: current window, previous window. ARGV: limit, weight of the
+# previous window, expiry in seconds.
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if current + previous * tonumber(ARGV[2]) >= tonumber(ARGV[1]) then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {1, current, previous}
+"""
+
+
+class RedisWindowStore:
+    """The same sliding-window counters in Redis, shared by every worker."""
+
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._hit = self._redis.register_script(SLIDING_WINDOW_SCRIPT)
+
+    def hit(self, key, limit, period, now):
+        window = int(now // period)
+        weight = 1 - (now % period) / period
+        allowed, current, previous = self._hit(
+            keys=[f'ratelimit:{key}:{window}', f'ratelimit:{key}:{window - 1}'],
+            args=[limit, repr(weight), period * 2]
+        )
+        return bool(allowed), _retry_after(current, previous, limit, now, period)
+
+
+def _period_of(key):
+    # Keys are "<endpoint>:<scope>:<period>:<value>"
+    return int(key.split(':')[2])
+
+
+def _estimate(current, previous, now, period):
+    elapsed = (now % period) / period
+    return current + previous * (1 - elapsed)
+
+
+def _retry_after(current, previous, limit, now, period):
+    """Seconds until the sliding count drops below the limit, assuming no new hits."""
+    elapsed = now % period
+    if current < limit:
+        if not previous:
+            return 1
+        # Enough of the previous window slides out before this one ends
+        wait = period * (1 - (limit - current) / previous) - elapsed
+    else:
+        # The current window has to become the previous one and decay
+        wait = (period - elapsed) + period * (1 - limit / current)
+    return max(1, math.ceil(wait))
+
+
+class RateLimiter:
+    def __init__(self):
+        self.store = MemoryWindowStore()
+        self.enabled = True
+        self.limits = {}
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATELIMIT_ENABLED', True)
+        self.limits = app.config.get('RATE_LIMITS', {})
+        redis_url = app.config.get('RATELIMIT_REDIS_URL')
+        if redis_url:
+            self.store = RedisWindowStore(redis_url)
+        else:
+            self.store = MemoryWindowStore(app.config.get('RATELIMIT_MAX_KEYS', 100000))
+
+    def check(self, endpoint, keys):
+        """
+        Count a hit against every configured scope for an endpoint.
+
+        `keys` maps a scope ('ip', 'account', 'user') to its value for this
+        request. Returns the largest Retry-After among exceeded limits, or None.
+        """
+        now = time.time()
+        retry_after = None
+        for scope, (limit, period) in self.limits.get(endpoint, {}).items():
+            value = keys.get(scope)
+            if value is None:
+                continue
+            allowed, wait = self.store.hit(f'{endpoint}:{scope}:{period}:{value}', limit, period, now)
+            if not allowed:
+                retry_after = max(retry_after or 0, wait)
+        return retry_after
+
+
+rate_limiter = RateLimiter()
+
+
+def rate_limit(endpoint, account_field=None):
+    """
+    Reject requests over the RATE_LIMITS configured for `endpoint` with 429.
+
+    Runs before the view body, so throttled requests never reach the database
+    or bcrypt. `account_field` names the JSON field identifying the targeted
+    account (e.g. the login email); on authenticated endpoints the JWT
+    identity is used as the 'user' scope.
+
+    Usage:
+    @rate_limit('login', account_field='email')
+    def login():
+        ...
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not rate_limiter.enabled:
+                return f(*args, **kwargs)
+
+            keys = {'ip': request.remote_addr or 'unknown'}
+            if account_field:
+                data = request.get_json(silent=True)
+                account = data.get(account_field) if isinstance(data, dict) else None
+                if isinstance(account, str) and account.strip():
+                    keys['account'] = account.strip().lower()
+            try:
+                keys['user'] = get_jwt_identity()
+            except RuntimeError:
+                pass  # not behind jwt_required
+
+            retry_after = rate_limiter.check(endpoint, keys)
+            if retry_after is not None:
+                current_app.logger.warning('Rate limit exceeded on %s from %s', endpoint, keys['ip'])
+                response = jsonify({'error': 'Too many requests, please try again later'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+
+            return f(*args, **kwargs)
+
+        return decorated_function
+    return decorator
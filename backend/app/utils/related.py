@@ -0,0 +1,185 @@
+# app/utils/related.py
+"""
+Related-document recommendations from TF-IDF vectors.
+
+A file's vector is its content postings weighted (1 + ln tf) * ln(1 + N/df);
+terms found in more than RELATED_MAX_DF of all files carry little signal
+and are left out. Neighbours are computed a batch of files at a time: the
+batch's highest-weighted terms form a sparse query matrix, one posting read
+for those terms supplies the matching columns, and the product is
+accumulated for the whole batch at once. The top k neighbours from other
+cases are stored in related_files, so serving them is one indexed read.
+"""
+import heapq
+import math
+from collections import defaultdict
+
+import click
+from sqlalchemy import delete, func, select
+
+from app import db
+from app.models import CaseFile, FileVector, RelatedFile, SearchDocument, SearchPosting, SearchTerm
+
+
+class RelatedIndex:
+    """Maintains file_vectors norms and the related_files neighbour lists."""
+
+    def __init__(self):
+        self.top_k = 10
+        self.query_terms = 40
+        self.max_df = 0.5
+
+    def init_app(self, app):
+        self.top_k = app.config.get('RELATED_TOP_K', 10)
+        self.query_terms = app.config.get('RELATED_QUERY_TERMS', 40)
+        self.max_df = app.config.get('RELATED_MAX_DF', 0.5)
+
+        @app.cli.command('files-related')
+        def files_related_command():
+            """Recompute TF-IDF vectors and related files for every case file."""
+            click.echo(f'Computed related files for {self.rebuild()} files')
+
+    # ------------------------------------------------------------------
+    # Vectors
+    # ------------------------------------------------------------------
+    def _weighter(self):
+        total = db.session.scalar(select(func.count()).select_from(SearchDocument)) or 1
+        max_df = self.max_df * total if total >= 10 else total
+
+        def weight(term_freq, doc_freq):
+            if doc_freq > max_df:
+                return 0.0
+            return (1 + math.log(term_freq)) * math.log(1 + total / max(doc_freq, 1))
+        return weight
+
+    def _postings(self, weight, where):
+        """[(file_id, term_id, weight)] of content postings matching `where`."""
+        rows = db.session.execute(
+            select(SearchPosting.file_id, SearchPosting.term_id, SearchPosting.term_freq, SearchTerm.doc_freq)
+            .join(SearchTerm, SearchTerm.id == SearchPosting.term_id)
+            .where(SearchPosting.field == 'content', where)
+        )
+        return [(f, t, w) for f, t, tf, df in rows if (w := weight(tf, df)) > 0]
+
+    def vectors(self, file_ids, weight=None):
+        """{file_id: {term_id: weight}} for a batch of files."""
+        weight = weight or self._weighter()
+        vectors = defaultdict(dict)
+        for file_id, term_id, w in self._postings(weight, SearchPosting.file_id.in_(list(file_ids))):
+            vectors[file_id][term_id] = w
+        return vectors
+
+    def norms(self, file_ids, weight=None):
+        """{file_id: vector length} without holding the vectors, read in chunks."""
+        weight = weight or self._weighter()
+        file_ids = list(file_ids)
+        squares = defaultdict(float)
+        for start in range(0, len(file_ids), 500):
+            chunk = file_ids[start:start + 500]
+            for file_id, _, w in self._postings(weight, SearchPosting.file_id.in_(chunk)):
+                squares[file_id] += w * w
+        return {file_id: math.sqrt(total) for file_id, total in squares.items()}
+
+    def _store_norms(self, file_ids, norms):
+        db.session.execute(delete(FileVector).where(FileVector.file_id.in_(list(file_ids))))
+        db.session.add_all(FileVector(file_id=file_id, norm=norm) for file_id, norm in norms.items())
+        db.session.flush()
+
+    # ------------------------------------------------------------------
+    # Neighbours
+    # ------------------------------------------------------------------
+    def compute(self, file_ids, weight=None):
+        """{file_id: [(related_id, cosine)]} for a batch, best first."""
+        weight = weight or self._weighter()
+        vectors = self.vectors(file_ids, weight)
+        norms = {file_id: math.sqrt(sum(w * w for w in vector.values()))
+                 for file_id, vector in vectors.items() if vector}
+        self._store_norms(file_ids, norms)
+        results = {file_id: [] for file_id in file_ids}
+        if not vectors:
+            return results
+
+        # Sparse query matrix: each file's strongest terms
+        by_term = defaultdict(list)
+        for file_id, vector in vectors.items():
+            for term_id, w in heapq.nlargest(self.query_terms, vector.items(), key=lambda item: item[1]):
+                by_term[term_id].append((file_id, w))
+
+        scores = {file_id: defaultdict(float) for file_id in vectors}
+        term_ids = list(by_term)
+        for start in range(0, len(term_ids), 500):
+            chunk = term_ids[start:start + 500]
+            for other_id, term_id, w in self._postings(weight, SearchPosting.term_id.in_(chunk)):
+                for file_id, query_weight in by_term[term_id]:
+                    if other_id != file_id:
+                        scores[file_id][other_id] += query_weight * w
+
+        candidates = {o for s in scores.values() for o in heapq.nlargest(self.top_k * 5, s, key=s.get)}
+        # Candidate norms must use the same weights as the dot products; a
+        # stored norm dates from that file's ingest, before N and doc_freq moved
+        others = candidates - set(vectors)
+        other_norms = self.norms(others, weight)
+        self._store_norms(others, other_norms)
+        norms.update(other_norms)
+        cases = dict(db.session.execute(
+            select(CaseFile.id, CaseFile.case_id).where(CaseFile.id.in_(list(candidates | set(vectors))))
+        ).all())
+
+        for file_id, raw in scores.items():
+            ranked = []
+            for other_id in heapq.nlargest(self.top_k * 5, raw, key=raw.get):
+                # Recommendations come from other cases
+                if cases.get(other_id) == cases.get(file_id) or not norms.get(other_id):
+                    continue
+                ranked.append((other_id, raw[other_id] / (norms[file_id] * norms[other_id])))
+            ranked.sort(key=lambda item: -item[1])
+            results[file_id] = [(other_id, round(score, 4)) for other_id, score in ranked[:self.top_k]]
+        return results
+
+    def store(self, results, link_back=False):
+        """
+        Replace the neighbour lists of the files in `results`. With
+        `link_back`, each neighbour also gains the file if it makes that
+        neighbour's own top k (used for files ingested one at a time).
+        """
+        db.session.execute(delete(RelatedFile).where(RelatedFile.file_id.in_(list(results))))
+        db.session.add_all(
+            RelatedFile(file_id=file_id, related_id=other_id, score=score)
+            for file_id, neighbours in results.items() for other_id, score in neighbours
+        )
+        if not link_back:
+            return
+
+        for file_id, neighbours in results.items():
+            for other_id, score in neighbours:
+                db.session.merge(RelatedFile(file_id=other_id, related_id=file_id, score=score))
+                db.session.flush()
+                beyond = db.session.execute(
+                    select(RelatedFile.related_id).where(RelatedFile.file_id == other_id)
+                    .order_by(RelatedFile.score.desc()).offset(self.top_k)
+                ).scalars().all()
+                if beyond:
+                    db.session.execute(delete(RelatedFile).where(RelatedFile.file_id == other_id,
+                                                                 RelatedFile.related_id.in_(beyond)))
+
+    def update_file(self, case_file, analyzed=None):
+        """Ingest stage: vector and neighbours for one new or re-processed file."""
+        self.store(self.compute([case_file.id]), link_back=True)
+
+    def forget(self, file_id):
+        db.session.execute(delete(RelatedFile).where(
+            (RelatedFile.file_id == file_id) | (RelatedFile.related_id == file_id)))
+        db.session.execute(delete(FileVector).where(FileVector.file_id == file_id))
+
+    def rebuild(self, batch_size=100):
+        """Recompute every neighbour list (and norm), batch by batch."""
+        weight = self._weighter()
+        file_ids = db.session.execute(select(CaseFile.id).order_by(CaseFile.id)).scalars().all()
+
+        for start in range(0, len(file_ids), batch_size):
+            self.store(self.compute(file_ids[start:start + batch_size], weight))
+            db.session.commit()
+        return len(file_ids)
+
+
+related_index = RelatedIndex()
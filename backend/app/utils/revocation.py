@@ -0,0 +1,195 @@
+# app/utils/revocation.py
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows development server: single process, no locking needed
+    fcntl = None
+
+
+class RevocationList:
+    """
+    In-memory JWT denylist shared across workers through an append-only file.
+
+    Tokens can be revoked individually (by `jti`) or all at once for a user,
+    in which case every token issued before the revocation is rejected.
+    Lookups are plain dict hits; each process tails the file at most once
+    per sync interval to pick up revocations made by other workers. Entries
+    are dropped once every token they could match has expired, and the file
+    is compacted when it grows past a size threshold.
+    """
+
+    def __init__(self):
+        self._jtis = {}       # jti -> expiry timestamp
+        self._users = {}      # user id -> revoked-at timestamp
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._inode = None
+        self._last_sync = 0
+        self.path = None
+        self.sync_interval = 1.0
+        self.compact_bytes = 1024 * 1024
+        self.max_token_age = 30 * 24 * 3600
+
+    def init_app(self, app):
+        self.path = app.config.get('REVOCATION_FILE') or os.path.join(app.instance_path, 'revoked_tokens.jsonl')
+        self.sync_interval = app.config.get('REVOCATION_SYNC_INTERVAL', 1.0)
+        self.compact_bytes = app.config.get('REVOCATION_COMPACT_BYTES', 1024 * 1024)
+        self.max_token_age = max(
+            _seconds(app.config.get('JWT_ACCESS_TOKEN_EXPIRES')),
+            _seconds(app.config.get('JWT_REFRESH_TOKEN_EXPIRES'))
+        ) or self.max_token_age
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Revoking
+    # ------------------------------------------------------------------
+    def revoke_token(self, jti, expires_at):
+        """Revoke a single token until its own expiry."""
+        self._record({'jti': jti, 'until': expires_at})
+
+    def revoke_user(self, user_id):
+        """Revoke every token issued to a user up to now."""
+        self._record({'user': int(user_id), 'at': time.time()})
+
+    def _record(self, entry):
+        with self._lock:
+            self._apply(entry)
+        self._append(json.dumps(entry) + '\n')
+
+    def _apply(self, entry):
+        if 'jti' in entry:
+            self._jtis[entry['jti']] = entry['until']
+        elif 'user' in entry:
+            self._users[entry['user']] = max(entry['at'], self._users.get(entry['user'], 0))
+
+    # ------------------------------------------------------------------
+    # Checking
+    # ------------------------------------------------------------------
+    def is_revoked(self, claims):
+        self._sync()
+
+        if claims.get('jti') in self._jtis:
+            return True
+
+        try:
+            user_id = int(claims.get('sub'))
+        except (TypeError, ValueError):
+            return False
+        revoked_at = self._users.get(user_id)
+        if revoked_at is None:
+            return False
+        # Tokens minted by this app carry a sub-second issue time; older ones only `iat`
+        return claims.get('auth_time', claims.get('iat', 0)) <= revoked_at
+
+    # ------------------------------------------------------------------
+    # File synchronisation
+    # ------------------------------------------------------------------
+    def _sync(self, force=False):
+        if self.path is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_sync < self.sync_interval:
+            return
+
+        with self._lock:
+            self._last_sync = now
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return
+
+            if stat.st_ino != self._inode:
+                # File was compacted (or created): reload from the start
+                self._inode = stat.st_ino
+                self._offset = 0
+                self._jtis.clear()
+                self._users.clear()
+            if stat.st_size <= self._offset:
+                return
+
+            with open(self.path, 'rb') as f:
+                f.seek(self._offset)
+                data = f.read()
+            # Only consume complete lines; a concurrent append may be mid-write
+            end = data.rfind(b'\n') + 1
+            self._offset += end
+            for line in data[:end].splitlines():
+                try:
+                    self._apply(json.loads(line))
+                except ValueError:
+                    continue
+            self._expire()
+
+    def _expire(self):
+        now = time.time()
+        for jti in [j for j, until in self._jtis.items() if until < now]:
+            del self._jtis[jti]
+        cutoff = now - self.max_token_age
+        for user_id in [u for u, at in self._users.items() if at < cutoff]:
+            del self._users[user_id]
+
+    def _append(self, line):
+        if self.path is None:
+            return
+        while True:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                    # Another worker may have compacted the file while we
+                    # waited for the lock; never write to the replaced inode.
+                    if os.fstat(f.fileno()).st_ino != _inode_of(self.path):
+                        continue
+                f.write(line)
+                f.flush()
+                if f.tell() > self.compact_bytes:
+                    self._compact()
+                return
+
+    def _compact(self):
+        """Rewrite the file with only live entries (caller holds the file lock)."""
+        self._sync(force=True)
+        with self._lock:
+            entries = [{'jti': j, 'until': until} for j, until in self._jtis.items()]
+            entries += [{'user': u, 'at': at} for u, at in self._users.items()]
+
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as tmp:
+            for entry in entries:
+                tmp.write(json.dumps(entry) + '\n')
+        os.replace(tmp_path, self.path)
+
+
+def _inode_of(path):
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+def _seconds(delta):
+    if delta is None or delta is False:
+        return 0
+    if hasattr(delta, 'total_seconds'):
+        return int(delta.total_seconds())
+    return int(delta)
+
+
+revocation_list = RevocationList()
+
+
+def init_app(app, jwt):
+    revocation_list.init_app(app)
+
+    @jwt.additional_claims_loader
+    def add_auth_time(identity):
+        # `iat` only has one-second resolution, which is too coarse to tell a
+        # token revoked by a password change from the one issued right after it.
+        return {'auth_time': time.time()}
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return revocation_list.is_revoked(jwt_payload)
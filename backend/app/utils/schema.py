@@ -0,0 +1,139 @@
+# app/utils/schema.py
+"""
+In-place schema upgrades for existing databases.
+
+db.create_all() creates missing tables but never touches tables that
+already exist, so a database created by an older release lacks the
+columns and indexes added since. upgrade_schema() closes that gap: it
+creates new tables, adds missing model columns with ALTER TABLE ... ADD
+COLUMN and creates missing indexes. Every step checks the live schema
+first, so it is safe to run on every start and from several workers at
+once. Columns that need data derived from existing rows are backfilled
+by whichever worker added them, unless that means rebuilding something
+as large as the search index: those are left to a CLI command, which
+the worker logs.
+"""
+import click
+from flask import current_app
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DatabaseError
+
+from app import db
+
+
+def _backfills():
+    """{(table, column): function} to run once, right after the column is added."""
+    from app.utils.user_directory import reindex_users
+
+    return {
+        ('users', 'search_name'): reindex_users,
+    }
+
+
+# {(table, column): command} for backfills too long to run while the app
+# starts; upgrade_schema() only adds the column and asks for the command.
+DEFERRED_BACKFILLS = {
+    # An index without languages was built by the unstemmed analyser
+    ('search_documents', 'language'): 'flask search-reindex',
+}
+
+
+def _quote(connection, name):
+    return connection.dialect.identifier_preparer.quote(name)
+
+
+def add_missing_columns(connection, table):
+    """ALTER `table` to add model columns the database does not have yet."""
+    existing = {c['name'] for c in inspect(connection).get_columns(table.name)}
+    added = []
+    for column in table.columns:
+        if column.name in existing:
+            continue
+        if not column.nullable and column.server_default is None:
+            raise RuntimeError(f'Cannot add NOT NULL column {table.name}.{column.name} without a server default')
+
+        ddl = f'ALTER TABLE {_quote(connection, table.name)} ADD COLUMN {_quote(connection, column.name)} ' \
+              f'{column.type.compile(dialect=connection.dialect)}'
+        if column.server_default is not None:
+            ddl += f' DEFAULT {column.server_default.arg}'
+        try:
+            with connection.begin_nested():
+                connection.execute(text(ddl))
+        except DatabaseError:
+            # Another worker added it first
+            if column.name not in {c['name'] for c in inspect(connection).get_columns(table.name)}:
+                raise
+            continue
+
+        if column.unique:
+            # ADD COLUMN cannot carry a UNIQUE constraint on SQLite; an index enforces the same
+            connection.execute(text(
+                f'CREATE UNIQUE INDEX IF NOT EXISTS {_quote(connection, f"uq_{table.name}_{column.name}")} '
+                f'ON {_quote(connection, table.name)} ({_quote(connection, column.name)})'
+            ))
+        added.append(column.name)
+    return added
+
+
+def add_missing_indexes(connection, table):
+    existing = {i['name'] for i in inspect(connection).get_indexes(table.name)}
+    created = []
+    for index in table.indexes:
+        if index.name not in existing:
+            index.create(bind=connection, checkfirst=True)
+            created.append(index.name)
+    return created
+
+
+def upgrade_schema():
+    """
+    Bring the database up to the current models. Returns
+    {table: {'columns': [...], 'indexes': [...]}} for whatever changed.
+    """
+    from app.utils.audit_archive import partition_tables
+
+    with db.engine.connect() as connection:
+        before = set(inspect(connection).get_table_names())
+
+    db.create_all()
+
+    changes = {}
+    with db.engine.begin() as connection:
+        # Month partitions of the audit log copy its columns and need them too
+        tables = [t for t in db.metadata.sorted_tables if t.name in before]
+        tables += partition_tables(connection)
+        for table in tables:
+            columns = add_missing_columns(connection, table)
+            indexes = add_missing_indexes(connection, table)
+            if columns or indexes:
+                changes[table.name] = {'columns': columns, 'indexes': indexes}
+
+    for (table, column), backfill in _backfills().items():
+        if column in changes.get(table, {}).get('columns', ()):
+            backfill()
+    for (table, column), command in DEFERRED_BACKFILLS.items():
+        if column in changes.get(table, {}).get('columns', ()):
+            current_app.logger.warning('Added %s.%s to an existing database: run `%s` to backfill it',
+                                       table, column, command)
+    return changes
+
+
+def init_app(app):
+    @app.cli.command('schema-upgrade')
+    def schema_upgrade_command():
+        """Add tables, columns and indexes missing from an existing database."""
+        changes = upgrade_schema()
+        for table, change in changes.items():
+            for column in change['columns']:
+                click.echo(f'Added column {table}.{column}')
+            for index in change['indexes']:
+                click.echo(f'Created index {index} on {table}')
+        if not changes:
+            click.echo('Schema is up to date')
+
+    if app.config.get('SCHEMA_AUTO_UPGRADE', True):
+        with app.app_context():
+            try:
+                upgrade_schema()
+            except Exception as e:
+                print(f"Schema upgrade failed, run `flask schema-upgrade`: {e}")
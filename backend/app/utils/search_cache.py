@@ -0,0 +1,126 @@
+# app/utils/search_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+# Parameters whose values are matched case-insensitively by the search routes
+CASE_INSENSITIVE = {
+    'q', 'case_number', 'document_type', 'search_in_content', 'fuzzy', 'facets',
+    'exact_phrase', 'include_ocr', 'include_metadata', 'default_operator', 'explain', 'suggest'
+}
+
+
+class SearchCache:
+    """
+    LRU + TTL cache of search responses.
+
+    Keys are the endpoint, the normalised query parameters and the caller's
+    permission scope (a judge's id, or 'all' for admins and clerks). Each
+    entry also remembers the judge and document type it was filtered to, so
+    a change to one file or case only drops entries that could have
+    matched it. Changes arrive as file/case events from the event hub,
+    which reach every worker when events are relayed through Redis.
+    """
+
+    def __init__(self, max_entries=500, ttl=120):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = True
+        self._entries = OrderedDict()  # key -> (expires_at, scope, judge_id, document_type, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def init_app(self, app):
+        from app.utils.events import event_hub
+
+        self.enabled = app.config.get('SEARCH_CACHE_ENABLED', True)
+        self.max_entries = app.config.get('SEARCH_CACHE_SIZE', 500)
+        self.ttl = app.config.get('SEARCH_CACHE_TTL', 120)
+        event_hub.add_listener(self._on_event)
+
+    @staticmethod
+    def key(endpoint, args, scope):
+        params = []
+        for name in sorted(args):
+            value = ' '.join(args.get(name, '').split())
+            if not value:
+                continue
+            params.append((name, value.lower() if name in CASE_INSENSITIVE else value))
+        return (endpoint, str(scope), tuple(params))
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[4]
+
+    def put(self, key, value, judge_id=None, document_type=None):
+        """Store a response; `judge_id`/`document_type` are the filters it was restricted to."""
+        if not self.enabled:
+            return
+        scope = key[1]
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, scope,
+                                  str(judge_id) if judge_id else None, document_type, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, judge_id=None, document_type=None):
+        """
+        Drop entries a change could affect. `judge_id` is the judge of the
+        changed case and `document_type` the changed file's type; None
+        means unknown and matches everything.
+        """
+        judge = str(judge_id) if judge_id is not None else None
+        with self._lock:
+            stale = [
+                key for key, (_, scope, entry_judge, entry_type, _) in self._entries.items()
+                if (judge is None or scope in ('all', judge))
+                and (judge is None or entry_judge in (None, judge))
+                and (document_type is None or entry_type in (None, document_type))
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _on_event(self, event):
+        if event['topic'] == 'file':
+            self.invalidate(event.get('judge_id'), event['data'].get('document_type'))
+        elif event['topic'] == 'case' and event['op'] != 'created':
+            # A new case has no files yet, so it cannot change any result
+            self.invalidate(event.get('judge_id'))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations
+        }
+
+
+search_cache = SearchCache()
@@ -0,0 +1,364 @@
+# app/utils/search_index.py
+"""
+Inverted index over case files.
+
+Each file is indexed under four fields: its OCR text (`content`), the
+case title and description (`title`), the case number (`number`) and the
+original filename (`filename`). Postings hold per-field term frequencies
+and positions (token ordinal plus character offset and length in the
+field text); `search_terms.doc_freq` counts the files containing each
+term. Positions drive phrase matching and snippets; OCR page boundaries
+are kept per document so a hit can be mapped to its page.
+"""
+import json
+from collections import defaultdict
+
+import click
+from sqlalchemy import delete, event, false, func, insert, intersect, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import SelectBase
+
+from app import db
+from app.models.search import SearchDocument, SearchPosting, SearchTerm
+from app.utils.analysis import detect_language, page_starts, query_words, tokenize_with_offsets
+
+PENDING_TERMS = 'search_index.pending_terms'  # session.info key: terms indexed in the open transaction
+PREFIX_EXPANSIONS = 50  # commonest indexed terms a prefix may stand for
+
+FIELDS = ('content', 'title', 'number', 'filename')
+
+
+def document_fields(case_file):
+    """Text of each indexed field for a file."""
+    case = case_file.case
+    return {
+        'content': case_file.ocr_text or '',
+        'title': ' '.join(filter(None, [case.title, case.description])) if case else '',
+        'number': case.case_number if case else '',
+        'filename': case_file.original_filename or ''
+    }
+
+
+def document_language(fields):
+    """Language of a file, from its text (or its case title when there is none)."""
+    return detect_language(fields['content'] or fields['title'])
+
+
+def analyze_document(case_file):
+    """{field: [Token(term, start, end, position) in order]} for a file."""
+    fields = document_fields(case_file)
+    language = document_language(fields)
+    return {field: tokenize_with_offsets(text, language) for field, text in fields.items()}
+
+
+def encode_positions(occurrences):
+    """Delta-varint encode [(ordinal, start, end)] sorted by ordinal."""
+    out = bytearray()
+    last_ordinal = last_start = 0
+    for ordinal, start, end in occurrences:
+        for value in (ordinal - last_ordinal, start - last_start, end - start):
+            while value >= 0x80:
+                out.append((value & 0x7F) | 0x80)
+                value >>= 7
+            out.append(value)
+        last_ordinal, last_start = ordinal, start
+    return bytes(out)
+
+
+def decode_positions(data):
+    """Inverse of encode_positions."""
+    values = []
+    value = shift = 0
+    for byte in data or b'':
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        values.append(value)
+        value = shift = 0
+
+    occurrences = []
+    ordinal = start = 0
+    for i in range(0, len(values) - 2, 3):
+        ordinal += values[i]
+        start += values[i + 1]
+        occurrences.append((ordinal, start, start + values[i + 2]))
+    return occurrences
+
+
+# ----------------------------------------------------------------------
+# Writing
+# ----------------------------------------------------------------------
+def _term_ids(terms, create=False):
+    """Map terms to ids, inserting unknown ones when `create` is set."""
+    terms = list(terms)
+    if not terms:
+        return {}
+
+    ids = {}
+    for start in range(0, len(terms), 500):
+        chunk = terms[start:start + 500]
+        ids.update(db.session.execute(
+            select(SearchTerm.term, SearchTerm.id).where(SearchTerm.term.in_(chunk))
+        ).all())
+
+    missing = [t for t in terms if t not in ids]
+    if missing and create:
+        dialect = db.engine.dialect.name
+        if dialect in ('sqlite', 'postgresql'):
+            if dialect == 'sqlite':
+                from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            else:
+                from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            # Another worker may insert the same new term concurrently
+            db.session.execute(
+                dialect_insert(SearchTerm).on_conflict_do_nothing(index_elements=['term']),
+                [{'term': t, 'doc_freq': 0} for t in missing]
+            )
+        else:
+            db.session.execute(insert(SearchTerm), [{'term': t, 'doc_freq': 0} for t in missing])
+        ids.update(_term_ids(missing))
+    return ids
+
+
+def _drop_postings(file_id):
+    """Remove a file's postings and release its document frequencies."""
+    old_terms = select(SearchPosting.term_id).where(SearchPosting.file_id == file_id).distinct()
+    db.session.execute(
+        update(SearchTerm).where(SearchTerm.id.in_(old_terms)).values(doc_freq=SearchTerm.doc_freq - 1),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.execute(delete(SearchPosting).where(SearchPosting.file_id == file_id))
+    db.session.execute(delete(SearchDocument).where(SearchDocument.file_id == file_id))
+
+
+def index_file(case_file, analyzed=None):
+    """
+    (Re)index one file in the current transaction; the caller commits.
+
+    Returns the analysed fields so later ingest stages can reuse them.
+    """
+    analyzed = analyzed or analyze_document(case_file)
+    _drop_postings(case_file.id)
+
+    occurrences = {field: defaultdict(list) for field in analyzed}
+    for field, tokens in analyzed.items():
+        for token in tokens:
+            occurrences[field][token.term].append((token.position, token.start, token.end))
+    all_terms = set().union(*occurrences.values())
+    ids = _term_ids(all_terms, create=True)
+
+    rows = [
+        {'term_id': ids[term], 'file_id': case_file.id, 'field': field,
+         'term_freq': len(positions), 'positions': encode_positions(positions)}
+        for field, by_term in occurrences.items()
+        for term, positions in by_term.items()
+    ]
+    if rows:
+        db.session.execute(insert(SearchPosting), rows)
+        db.session.execute(
+            update(SearchTerm).where(SearchTerm.id.in_(list(ids.values())))
+            .values(doc_freq=SearchTerm.doc_freq + 1),
+            execution_options={'synchronize_session': False}
+        )
+
+    pages = page_starts(case_file.ocr_text)
+    db.session.add(SearchDocument(file_id=case_file.id, length=len(analyzed.get('content', [])),
+                                  pages=json.dumps(pages) if pages else None,
+                                  language=document_language(document_fields(case_file))))
+
+    # The spelling vocabulary only learns the terms once they are committed
+    db.session().info.setdefault(PENDING_TERMS, set()).update(all_terms)
+    return analyzed
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_terms(session):
+    from app.utils.spelling import vocabulary
+
+    for term in session.info.pop(PENDING_TERMS, ()):
+        vocabulary.add(term)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_terms(session):
+    session.info.pop(PENDING_TERMS, None)
+
+
+def remove_file(file_id):
+    """Drop a file from the index in the current transaction."""
+    _drop_postings(file_id)
+
+
+def reindex_all(batch_size=200):
+    """Rebuild the whole index file by file; returns the number of files."""
+    from app.models import CaseFile
+
+    count = 0
+    last_id = 0
+    while True:
+        batch = CaseFile.query.filter(CaseFile.id > last_id).order_by(CaseFile.id).limit(batch_size).all()
+        if not batch:
+            break
+        for case_file in batch:
+            index_file(case_file)
+            count += 1
+        last_id = batch[-1].id
+        db.session.commit()
+        db.session.expunge_all()
+    return count
+
+
+# ----------------------------------------------------------------------
+# Reading
+# ----------------------------------------------------------------------
+def no_files():
+    """A select of file ids that matches nothing."""
+    return select(SearchPosting.file_id).where(false())
+
+
+def files_matching(terms, fields=None):
+    """
+    Select of the ids of files with any of `terms` in any of `fields` (all
+    fields by default), for use as a subquery: CaseFile.id.in_(...).
+    """
+    query = (select(SearchPosting.file_id)
+             .join(SearchTerm, SearchTerm.id == SearchPosting.term_id)
+             .where(SearchTerm.term.in_(list(terms))))
+    if fields:
+        query = query.where(SearchPosting.field.in_(list(fields)))
+    return query
+
+
+def files_matching_all(term_groups, fields=None):
+    """Select of the ids of files with some term of every group in `term_groups`."""
+    selects = [files_matching(terms, fields) for terms in term_groups]
+    if not selects:
+        return no_files()
+    return selects[0] if len(selects) == 1 else intersect(*selects)
+
+
+def occurrences(file_ids, terms, fields=None):
+    """
+    Positions of `terms` in the given files:
+    {file_id: {field: [(ordinal, start, end, term)]}} sorted by ordinal.
+    `file_ids` is a collection of ids or a select of them.
+    """
+    if not isinstance(file_ids, SelectBase):
+        file_ids = list(file_ids)
+    terms = list(terms)
+    result = defaultdict(lambda: defaultdict(list))
+    if not terms or isinstance(file_ids, list) and not file_ids:
+        return result
+
+    query = (select(SearchPosting.file_id, SearchPosting.field, SearchTerm.term, SearchPosting.positions)
+             .join(SearchTerm, SearchTerm.id == SearchPosting.term_id)
+             .where(SearchTerm.term.in_(terms), SearchPosting.file_id.in_(file_ids)))
+    if fields:
+        query = query.where(SearchPosting.field.in_(list(fields)))
+    for file_id, field, term, data in db.session.execute(query):
+        result[file_id][field].extend((o, s, e, term) for o, s, e in decode_positions(data))
+    for by_field in result.values():
+        for items in by_field.values():
+            items.sort()
+    return result
+
+
+def phrase_matches(file_ids, words, fields=None):
+    """
+    Ids of files, among `file_ids` (ids or a select of them), where the
+    QueryWords `words` occur in order within one field.
+    """
+    if len(words) < 2:
+        return set(db.session.execute(file_ids).scalars()) if isinstance(file_ids, SelectBase) else set(file_ids)
+    first = words[0]
+    matched = set()
+    for file_id, by_field in occurrences(file_ids, {t for w in words for t in w.terms}, fields).items():
+        for items in by_field.values():
+            at = {(term, ordinal) for ordinal, _, _, term in items}
+            starts = [ordinal for ordinal, _, _, term in items if term in first.terms]
+            if any(all(any((t, o + w.position - first.position) in at for t in w.terms) for w in words[1:])
+                   for o in starts):
+                matched.add(file_id)
+                break
+    return matched
+
+
+def fuzzy_expansions(word, max_edits=None):
+    """Indexed terms within an edit budget scaled to the word's length."""
+    from app.utils.spelling import edit_budget, vocabulary
+
+    if max_edits is None:
+        max_edits = edit_budget(word)
+    if max_edits <= 0:
+        return [word]
+    return [term for term, _, _ in vocabulary.lookup(word, max_edits)]
+
+
+def prefix_expansions(prefix, limit=PREFIX_EXPANSIONS):
+    """The `limit` commonest indexed terms starting with `prefix`."""
+    # A range rather than LIKE, so the lookup can use the unique index on term
+    return list(db.session.execute(
+        select(SearchTerm.term)
+        .where(SearchTerm.term >= prefix, SearchTerm.term < prefix + '\U0010ffff', SearchTerm.doc_freq > 0)
+        .order_by(SearchTerm.doc_freq.desc()).limit(limit)
+    ).scalars())
+
+
+def fuzzy_match(query, fields=None, max_edits=None, require_all=True, prefix=False):
+    """
+    Files matching the words of `query` approximately.
+
+    Returns (select of file ids, {word: [matched terms]}). With
+    `require_all` every word must match and the per-word posting lists are
+    intersected in SQL; otherwise any word may match. A word none of whose
+    expansions is indexed short-circuits to no_files(). With `prefix` the
+    last word also matches terms it is the start of, for partly typed
+    queries such as "Mwan".
+    """
+    expansions = {}
+    words = query_words(query)
+    for word in words:
+        if word.word in expansions:
+            continue
+        terms = [t for stem in word.terms for t in fuzzy_expansions(stem, max_edits)]
+        if prefix and word is words[-1]:
+            terms += [t for stem in word.terms for t in prefix_expansions(stem)]
+        expansions[word.word] = list(dict.fromkeys(terms))
+        if require_all and not terms:
+            return no_files(), expansions
+
+    if not require_all:
+        return files_matching({t for terms in expansions.values() for t in terms}, fields), expansions
+
+    indexed = set(db.session.execute(
+        select(SearchTerm.term)
+        .where(SearchTerm.term.in_({t for terms in expansions.values() for t in terms}),
+               SearchTerm.doc_freq > 0)
+    ).scalars())
+    if not expansions or any(indexed.isdisjoint(terms) for terms in expansions.values()):
+        return no_files(), expansions
+    return files_matching_all(expansions.values(), fields), expansions
+
+
+def index_stats():
+    return {
+        'terms': db.session.scalar(select(func.count()).select_from(SearchTerm)),
+        'documents': db.session.scalar(select(func.count()).select_from(SearchDocument)),
+        'postings': db.session.scalar(select(func.count()).select_from(SearchPosting))
+    }
+
+
+def init_app(app):
+    from app.utils.spelling import vocabulary
+    vocabulary.init_app(app)
+
+    @app.cli.command('search-reindex')
+    def search_reindex_command():
+        """Rebuild the full-text search index for every case file."""
+        from app.utils.schema import upgrade_schema
+
+        # Indexes from before search_documents.language need the column first
+        upgrade_schema()
+        click.echo(f'Indexed {reindex_all()} files')
+        click.echo(index_stats())
@@ -0,0 +1,278 @@
+# app/utils/search_log.py
+"""
+Search analytics: one compact JSON line per search, appended to a log
+file shared by every worker (O_APPEND keeps lines whole). Past
+SEARCH_LOG_MAX_BYTES the live file is renamed and gzip-compressed in the
+background; the newest SEARCH_LOG_BACKUPS rotated files are kept.
+
+Lines record the normalised query, the other parameters, the result
+count, latency and whether the cache answered. The report aggregates
+them, and the most frequent searches are replayed into each worker's
+result cache (prewarm).
+"""
+import glob
+import gzip
+import inspect
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import g, has_request_context, request
+
+from app.utils.search_cache import CASE_INSENSITIVE
+
+PREWARM_ENVIRON_KEY = 'search_log.prewarm'  # replayed searches are not logged
+QUERY_PARAMS = {'search': 'q', 'advanced': 'query'}
+VIEWS = {'search': 'search.search_files', 'advanced': 'search.advanced_search'}
+LIVE_NAME = 'search.jsonl'
+
+
+def normalize_query(text, param='q'):
+    # Lower-cased only where the search does; AND/OR/NOT are case-sensitive
+    text = ' '.join((text or '').split())
+    return text.lower() if param in CASE_INSENSITIVE else text
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(int(len(values) * fraction), len(values) - 1)], 1)
+
+
+class SearchLog:
+    """Append-only search log with size-based rotation."""
+
+    def __init__(self):
+        self.app = None
+        self.enabled = True
+        self.directory = None
+        self.max_bytes = 10 * 1024 * 1024
+        self.backups = 20
+        self.prewarm_top = 20
+        self.prewarm_days = 7
+        self._lock = threading.Lock()
+        self._file = None
+        self._inode = None
+        self._checked_at = 0
+        self._prewarmed_pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('SEARCH_LOG_ENABLED', True)
+        self.directory = app.config.get('SEARCH_LOG_DIR') or os.path.join(app.instance_path, 'search_log')
+        self.max_bytes = app.config.get('SEARCH_LOG_MAX_BYTES', 10 * 1024 * 1024)
+        self.backups = app.config.get('SEARCH_LOG_BACKUPS', 20)
+        self.prewarm_top = app.config.get('SEARCH_PREWARM_TOP', 20)
+        self.prewarm_days = app.config.get('SEARCH_PREWARM_DAYS', 7)
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, LIVE_NAME)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    def record(self, endpoint, args, scope, total, started, cache_hit=False):
+        """Log one search; `started` is its time.perf_counter() at entry."""
+        if not self.enabled or (has_request_context() and request.environ.get(PREWARM_ENVIRON_KEY)):
+            return
+        query_param = QUERY_PARAMS[endpoint]
+        entry = {
+            'ts': int(time.time()),
+            'ep': endpoint,
+            'q': normalize_query(args.get(query_param), query_param),
+            'f': {name: args.get(name) for name in sorted(args) if name != query_param and args.get(name)},
+            'n': total,
+            'ms': round((time.perf_counter() - started) * 1000, 1),
+            'hit': cache_hit,
+            'scope': scope
+        }
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        try:
+            with self._lock:
+                self._write(line)
+        except OSError as e:
+            if self.app:
+                self.app.logger.warning('Search log write failed: %s', e)
+        self._start_prewarm()
+
+    def _write(self, line):
+        now = time.monotonic()
+        if self._file is None or now - self._checked_at > 1:
+            self._checked_at = now
+            self._rotate_if_needed()
+        self._file.write(line)
+        self._file.flush()
+
+    def _rotate_if_needed(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None
+        if stat is not None and stat.st_size >= self.max_bytes:
+            rotated = os.path.join(self.directory, f'search-{time.strftime("%Y%m%d-%H%M%S")}-{time.time_ns() % 10**9:09d}-{os.getpid()}.jsonl')
+            try:
+                os.rename(self.path, rotated)
+            except FileNotFoundError:
+                pass  # another worker rotated it first
+            else:
+                threading.Thread(target=self._compress, args=(rotated,), daemon=True).start()
+            stat = None
+        # Reopen after our own or another worker's rotation
+        if self._file is None or stat is None or stat.st_ino != self._inode:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self.path, 'a', encoding='utf-8')
+            self._inode = os.fstat(self._file.fileno()).st_ino
+
+    def _compress(self, path):
+        try:
+            with open(path, 'rb') as source, gzip.open(path + '.gz', 'wb') as target:
+                while chunk := source.read(1 << 20):
+                    target.write(chunk)
+            os.remove(path)
+            rotated = [p for p in self._files() if p != self.path]
+            for old in rotated[:max(len(rotated) - self.backups, 0)]:
+                os.remove(old)
+        except OSError as e:
+            if self.app:
+                self.app.logger.warning('Search log rotation failed for %s: %s', path, e)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def _files(self):
+        """Rotated files oldest first, then the live file."""
+        rotated = sorted(glob.glob(os.path.join(self.directory, 'search-*.jsonl*')))
+        rotated = [p for p in rotated if not (p.endswith('.jsonl') and p + '.gz' in rotated)]
+        return rotated + ([self.path] if os.path.exists(self.path) else [])
+
+    def entries(self, since=0):
+        """Logged searches with a timestamp >= `since`, oldest first."""
+        for path in self._files():
+            if os.path.getmtime(path) < since:
+                continue
+            opener = gzip.open if path.endswith('.gz') else open
+            with opener(path, 'rt', encoding='utf-8') as log:
+                for line in log:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn line from a crashed writer
+                    if entry.get('ts', 0) >= since:
+                        yield entry
+
+    def report(self, since=0, limit=20):
+        """Top, slowest and zero-result queries plus overall latency."""
+        groups = defaultdict(lambda: {'count': 0, 'zero': 0, 'hits': 0, 'miss_ms': 0.0, 'misses': 0, 'max_ms': 0.0})
+        latencies = []
+        searches = hits = zero = 0
+        for entry in self.entries(since):
+            group = groups[(entry['ep'], entry['q'])]
+            group['count'] += 1
+            searches += 1
+            latencies.append(entry['ms'])
+            if entry['n'] == 0:
+                group['zero'] += 1
+                zero += 1
+            if entry['hit']:
+                group['hits'] += 1
+                hits += 1
+            else:
+                # Latency of cache hits says nothing about the query itself
+                group['misses'] += 1
+                group['miss_ms'] += entry['ms']
+                group['max_ms'] = max(group['max_ms'], entry['ms'])
+
+        def row(key, group):
+            return {
+                'endpoint': key[0],
+                'query': key[1],
+                'count': group['count'],
+                'zero_results': group['zero'],
+                'cache_hit_rate': round(group['hits'] / group['count'], 4),
+                'avg_ms': round(group['miss_ms'] / group['misses'], 1) if group['misses'] else None,
+                'max_ms': group['max_ms'] if group['misses'] else None
+            }
+
+        def ranked(key, keep=lambda group: True):
+            chosen = sorted((item for item in groups.items() if keep(item[1])), key=key)[:limit]
+            return [row(k, group) for k, group in chosen]
+
+        return {
+            'searches': searches,
+            'cache_hit_rate': round(hits / searches, 4) if searches else None,
+            'zero_result_rate': round(zero / searches, 4) if searches else None,
+            'p50_ms': _percentile(latencies, 0.5),
+            'p95_ms': _percentile(latencies, 0.95),
+            'top_queries': ranked(lambda item: (-item[1]['count'], item[0])),
+            'slowest_queries': ranked(lambda item: (-item[1]['miss_ms'] / item[1]['misses'], item[0]),
+                                      keep=lambda group: group['misses']),
+            'zero_result_queries': ranked(lambda item: (-item[1]['zero'], item[0]),
+                                          keep=lambda group: group['zero'])
+        }
+
+    # ------------------------------------------------------------------
+    # Cache prewarming
+    # ------------------------------------------------------------------
+    def frequent_searches(self, limit=None, days=None):
+        """[(endpoint, scope, args)] of the most repeated searches, commonest first."""
+        since = time.time() - 86400 * (self.prewarm_days if days is None else days)
+        counts = Counter()
+        for entry in self.entries(since):
+            args = dict(entry['f'], **{QUERY_PARAMS[entry['ep']]: entry['q']})
+            counts[(entry['ep'], entry['scope'], tuple(sorted(args.items())))] += 1
+        return [(endpoint, scope, dict(args))
+                for (endpoint, scope, args), _ in counts.most_common(self.prewarm_top if limit is None else limit)]
+
+    def prewarm(self, limit=None):
+        """
+        Replay the most frequent searches into this worker's result cache,
+        as the judge they were scoped to (or an admin for unscoped ones).
+        Returns the number of searches replayed.
+        """
+        from app.models import User
+        from app.utils.principal import load_principal
+
+        app = self.app
+        with app.app_context():
+            admin = User.query.filter_by(role='admin', is_active=True).order_by(User.id).first()
+        admin_id = admin.id if admin else None
+
+        count = 0
+        for endpoint, scope, args in self.frequent_searches(limit):
+            # The undecorated view: no token or rate limit for internal replays
+            view = inspect.unwrap(app.view_functions[VIEWS[endpoint]])
+            with app.test_request_context(query_string=args, environ_base={PREWARM_ENVIRON_KEY: True}):
+                principal = load_principal(admin_id if scope == 'all' else scope)
+                if principal is None or not principal.is_active:
+                    continue
+                g._principal = principal
+                try:
+                    view()
+                    count += 1
+                except Exception as e:
+                    app.logger.warning('Search prewarm failed for %s %s: %s', endpoint, args, e)
+        return count
+
+    def _start_prewarm(self):
+        # Once per worker process, after its first logged search
+        pid = os.getpid()
+        if self.prewarm_top <= 0 or self._prewarmed_pid == pid:
+            return
+        self._prewarmed_pid = pid
+        threading.Thread(target=self._prewarm_quietly, daemon=True).start()
+
+    def _prewarm_quietly(self):
+        try:
+            self.prewarm()
+        except Exception as e:
+            self.app.logger.warning('Search prewarm failed: %s', e)
+
+
+search_log = SearchLog()
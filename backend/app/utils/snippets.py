@@ -0,0 +1,128 @@
+# app/utils/snippets.py
+"""
+Query-highlighted snippets from the positional index.
+
+Matching passages are chosen from the stored positions of the query terms
+(windows covering the most, and rarest, distinct terms win). Only those
+passages are then read from the database with SUBSTR, so the full OCR
+text never leaves the database, and page numbers come from the page
+boundaries recorded at index time.
+"""
+import bisect
+import json
+import math
+
+from sqlalchemy import func, literal, select, union_all
+
+from app import db
+from app.models import CaseFile, SearchDocument, SearchTerm
+from app.utils.search_index import occurrences
+
+WINDOW_TOKENS = 24   # longest stretch of tokens one snippet may cover
+CONTEXT_CHARS = 80   # text kept on either side of the matched stretch
+
+
+def _term_weights(terms):
+    """Inverse document frequency of each term, so rare terms pick the passage."""
+    total = db.session.scalar(select(func.count()).select_from(SearchDocument)) or 1
+    freqs = dict(db.session.execute(
+        select(SearchTerm.term, SearchTerm.doc_freq).where(SearchTerm.term.in_(list(terms)))
+    ).all())
+    return {t: math.log(1 + total / (1 + freqs.get(t, 0))) for t in terms}
+
+
+def best_windows(items, weights, count):
+    """
+    Up to `count` non-overlapping (score, first, last) index ranges of `items`
+    ([(ordinal, start, end, term)] sorted by ordinal), best first.
+    """
+    candidates = []
+    last = 0
+    for first in range(len(items)):
+        last = max(last, first)
+        while last + 1 < len(items) and items[last + 1][0] - items[first][0] < WINDOW_TOKENS:
+            last += 1
+        distinct = {item[3] for item in items[first:last + 1]}
+        score = sum(weights.get(t, 1.0) for t in distinct) + 0.1 * (last - first + 1)
+        candidates.append((score, first, last))
+    candidates.sort(key=lambda c: (-c[0], c[1]))
+
+    chosen = []
+    for score, first, last in candidates:
+        if all(last < f or first > l for _, f, l in chosen):
+            chosen.append((score, first, last))
+            if len(chosen) == count:
+                break
+    return chosen
+
+
+def _page_bounds(pages, offset):
+    """(page number, page start, page end) containing `offset`; None without markers."""
+    if not pages:
+        return None, 0, None
+    starts = [start for _, start in pages]
+    i = max(bisect.bisect_right(starts, offset) - 1, 0)
+    end = None
+    if i + 1 < len(pages):
+        number, next_start = pages[i + 1]
+        end = next_start - len(f'--- Page {number} ---')
+    return pages[i][0], pages[i][1], end
+
+
+def build_snippets(file_ids, terms, per_file=3):
+    """{file_id: [{'text', 'page', 'highlights', 'score'}]} for the content field."""
+    file_ids, terms = list(file_ids), set(terms)
+    if not file_ids or not terms:
+        return {}
+
+    weights = _term_weights(terms)
+    pages = {
+        file_id: json.loads(data) if data else []
+        for file_id, data in db.session.execute(
+            select(SearchDocument.file_id, SearchDocument.pages).where(SearchDocument.file_id.in_(file_ids))
+        )
+    }
+
+    plans = []  # (file_id, page, start, end, score, hits)
+    for file_id, by_field in occurrences(file_ids, terms, ['content']).items():
+        items = by_field.get('content', [])
+        for score, first, last in best_windows(items, weights, per_file):
+            page, page_start, page_end = _page_bounds(pages.get(file_id), items[first][1])
+            start = max(items[first][1] - CONTEXT_CHARS, page_start)
+            end = items[last][2] + CONTEXT_CHARS
+            if page_end is not None:
+                end = min(end, page_end)
+            hits = [(s, e) for _, s, e, _ in items if start <= s and e <= end]
+            plans.append((file_id, page, start, end, score, hits))
+    if not plans:
+        return {}
+
+    # One round trip for every passage; SUBSTR is 1-based
+    selects = [
+        select(literal(i).label('n'), func.substr(CaseFile.ocr_text, start + 1, end - start).label('text'))
+        .where(CaseFile.id == file_id)
+        for i, (file_id, _, start, end, _, _) in enumerate(plans)
+    ]
+    texts = dict(db.session.execute(union_all(*selects)).all())
+
+    snippets = {}
+    for i, (file_id, page, start, end, score, hits) in enumerate(plans):
+        text = texts.get(i) or ''
+        # Trim partial words at the cut edges
+        head = 0
+        if start > 0 and text and not text[0].isspace():
+            cut = text.find(' ')
+            head = cut + 1 if 0 <= cut < hits[0][0] - start else 0
+        tail = len(text)
+        if text and not text[-1].isspace():
+            cut = text.rfind(' ')
+            tail = cut if cut > hits[-1][1] - start else len(text)
+        snippet = text[head:tail]
+        offset = start + head + len(snippet) - len(snippet.lstrip())
+        snippets.setdefault(file_id, []).append({
+            'text': snippet.strip(),
+            'page': page,
+            'highlights': [[s - offset, e - offset] for s, e in hits],
+            'score': round(score, 3)
+        })
+    return snippets
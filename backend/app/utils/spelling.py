@@ -0,0 +1,203 @@
+# app/utils/spelling.py
+"""
+Approximate term lookup over the search index vocabulary.
+
+A SymSpell-style deletion index maps every string reachable from a term by
+deleting up to `max_distance` characters (from its first `prefix_length`
+characters) back to that term. A misspelt word only has to generate its own
+deletes and look them up, so fuzzy lookups never compare against the whole
+vocabulary; candidates are then confirmed with a bounded edit distance.
+
+The same structure drives "did you mean" suggestions: neighbours of an
+unknown or rare query word that are much more frequent in the corpus are
+offered as corrections.
+"""
+import math
+import threading
+import time
+from collections import defaultdict
+
+from app.utils.analysis import TOKEN_RE, normalize, query_words
+
+FREQUENCY_DECADES_PER_EDIT = 3  # one more edit is worth a 1000x more frequent term
+SUGGEST_MIN_RATIO = 10          # a known word is only corrected to a 10x commoner term
+
+
+def edit_budget(word):
+    """Edits tolerated for a word of this length."""
+    return 0 if len(word) <= 3 else 1 if len(word) <= 6 else 2
+
+
+def _rank(match):
+    # Closeness and frequency traded off on a log scale
+    term, distance, doc_freq = match
+    return distance - math.log10(doc_freq + 1) / FREQUENCY_DECADES_PER_EDIT, term
+
+
+def edit_distance(a, b, limit):
+    """
+    Optimal string alignment distance (Damerau-Levenshtein with adjacent
+    transpositions), or limit + 1 as soon as it is known to exceed `limit`.
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (previous2 is not None and i > 1 and j > 1
+                    and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]):
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1] if previous[-1] <= limit else limit + 1
+
+
+def _deletes(word, max_distance):
+    results = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for item in frontier:
+            if len(item) <= 1:
+                continue
+            for i in range(len(item)):
+                next_frontier.add(item[:i] + item[i + 1:])
+        next_frontier -= results
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+class DeletionIndex:
+    """Vocabulary with term frequencies and a deletion index for fuzzy lookup."""
+
+    def __init__(self, max_distance=2, prefix_length=7):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        self._deletes = defaultdict(set)
+        self._freq = {}
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self.refresh_interval = 600
+
+    def init_app(self, app):
+        self.max_distance = app.config.get('SEARCH_FUZZY_MAX_EDITS', 2)
+        self.prefix_length = app.config.get('SEARCH_FUZZY_PREFIX_LENGTH', 7)
+        self.refresh_interval = app.config.get('SEARCH_VOCABULARY_REFRESH', 600)
+
+    def load(self):
+        """Rebuild from the term dictionary (needs an app context)."""
+        from app.models import SearchTerm
+
+        deletes = defaultdict(set)
+        freq = {}
+        for term, doc_freq in SearchTerm.query.filter(SearchTerm.doc_freq > 0)\
+                .with_entities(SearchTerm.term, SearchTerm.doc_freq).yield_per(5000):
+            freq[term] = doc_freq
+            for variant in _deletes(term[:self.prefix_length], self.max_distance):
+                deletes[variant].add(term)
+
+        with self._lock:
+            self._deletes = deletes
+            self._freq = freq
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self.load()
+
+    def add(self, term, doc_freq=1):
+        """Make a newly indexed term visible without waiting for a reload."""
+        if self._loaded_at is None:
+            return
+        with self._lock:
+            if term not in self._freq:
+                for variant in _deletes(term[:self.prefix_length], self.max_distance):
+                    self._deletes[variant].add(term)
+            self._freq[term] = max(doc_freq, self._freq.get(term, 0))
+
+    def frequency(self, term):
+        self._ensure_loaded()
+        return self._freq.get(term, 0)
+
+    def lookup(self, word, max_distance=None):
+        """
+        Vocabulary terms within `max_distance` edits of `word`, as
+        (term, distance, doc_freq) sorted by distance then frequency.
+        """
+        self._ensure_loaded()
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+
+        candidates = set()
+        with self._lock:
+            for variant in _deletes(word[:self.prefix_length], max_distance):
+                candidates |= self._deletes.get(variant, set())
+            freq = self._freq
+
+        matches = []
+        for term in candidates:
+            distance = edit_distance(word, term, max_distance)
+            if distance <= max_distance:
+                matches.append((term, distance, freq.get(term, 0)))
+        matches.sort(key=lambda m: (m[1], -m[2], m[0]))
+        return matches
+
+    def suggest(self, word, limit=3, known_freq=None, exclude=()):
+        """
+        Likely intended terms for `word`, best first, as (term, distance,
+        doc_freq). Candidates must be clearly commoner than the word itself
+        (or than `known_freq`, when the caller knows better).
+        """
+        budget = edit_budget(word)
+        if budget <= 0:
+            return []
+        floor = (self.frequency(word) if known_freq is None else known_freq) * SUGGEST_MIN_RATIO
+        matches = [m for m in self.lookup(word, budget)
+                   if m[1] > 0 and m[2] > floor and m[0] not in exclude]
+        matches.sort(key=_rank)
+        return matches[:limit]
+
+
+vocabulary = DeletionIndex()
+
+
+def suggest_query(query, limit=3):
+    """
+    "Did you mean" for a search query: None if no word has a likely
+    correction, otherwise the corrected query text and, per corrected word,
+    up to `limit` alternatives with their document frequencies.
+    """
+    corrections = {}
+    for word in query_words(query):
+        if word.word in corrections:
+            continue
+        # A word is looked up by each of its stems; the commonest reading counts
+        known_freq = max(vocabulary.frequency(term) for term in word.terms)
+        candidates = {}
+        for term in word.terms:
+            for match in vocabulary.suggest(term, limit, known_freq, exclude=word.terms):
+                candidates.setdefault(match[0], match)
+        if candidates:
+            corrections[word.word] = sorted(candidates.values(), key=_rank)[:limit]
+    if not corrections:
+        return None
+
+    words = TOKEN_RE.findall(normalize(query))
+    return {
+        'text': ' '.join(corrections[w][0][0] if w in corrections else w for w in words),
+        'corrections': [
+            {'word': word, 'suggestions': [{'term': t, 'doc_freq': f} for t, _, f in matches]}
+            for word, matches in corrections.items()
+        ]
+    }
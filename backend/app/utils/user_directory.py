@@ -0,0 +1,182 @@
+# app/utils/user_directory.py
+"""
+User-directory search.
+
+`users.search_name` holds the normalised full name and carries a B-tree
+index, so typeahead is an index range scan. Substring matches go through a
+trigram index over name, email and employee ID: pg_trgm on PostgreSQL and
+an FTS5 `trigram` table kept in sync by triggers on SQLite. Results rank
+exact employee ID / email matches first, then name prefixes, then
+substring hits.
+"""
+import re
+import unicodedata
+
+import click
+from sqlalchemy import and_, case, func, literal, or_, select, text
+
+from app import db
+
+TRIGRAM_MIN_LENGTH = 3
+
+_SQLITE_FTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5(
+           search_name, email, employee_id,
+           content='users', content_rowid='id', tokenize='trigram'
+       )""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_insert AFTER INSERT ON users BEGIN
+           INSERT INTO users_fts(rowid, search_name, email, employee_id)
+           VALUES (new.id, new.search_name, new.email, new.employee_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_delete AFTER DELETE ON users BEGIN
+           INSERT INTO users_fts(users_fts, rowid, search_name, email, employee_id)
+           VALUES ('delete', old.id, old.search_name, old.email, old.employee_id);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS users_fts_update
+           AFTER UPDATE OF search_name, email, employee_id ON users BEGIN
+           INSERT INTO users_fts(users_fts, rowid, search_name, email, employee_id)
+           VALUES ('delete', old.id, old.search_name, old.email, old.employee_id);
+           INSERT INTO users_fts(rowid, search_name, email, employee_id)
+           VALUES (new.id, new.search_name, new.email, new.employee_id);
+       END""",
+]
+
+_POSTGRES_TRGM = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """CREATE INDEX IF NOT EXISTS ix_users_search_trgm ON users USING gin (
+           (search_name || ' ' || lower(email) || ' ' || lower(employee_id)) gin_trgm_ops
+       )""",
+]
+
+
+def normalize_name(value):
+    """Lower-case, accent-free, single-spaced form used for name lookups."""
+    if not value:
+        return ''
+    value = unicodedata.normalize('NFKD', value)
+    value = ''.join(c for c in value if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', value).strip().lower()
+
+
+def install_search_indexes(connection):
+    """Create the trigram index for the current dialect (idempotent)."""
+    if connection.dialect.name == 'postgresql':
+        for statement in _POSTGRES_TRGM:
+            connection.execute(text(statement))
+    elif connection.dialect.name == 'sqlite':
+        try:
+            for statement in _SQLITE_FTS:
+                connection.execute(text(statement))
+        except Exception as e:
+            # SQLite builds without FTS5 fall back to LIKE scans
+            print(f"User directory trigram index unavailable: {e}")
+
+
+def _has_sqlite_fts():
+    return db.session.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_fts'")
+    ).first() is not None
+
+
+def _substring_condition(User, term):
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        haystack = User.search_name + ' ' + func.lower(User.email) + ' ' + func.lower(User.employee_id)
+        return haystack.like(f'%{_escape_like(term)}%', escape='\\')
+
+    if dialect == 'sqlite' and _has_sqlite_fts():
+        phrase = '"' + term.replace('"', '""') + '"'
+        return User.id.in_(text('SELECT rowid FROM users_fts WHERE users_fts MATCH :phrase')
+                           .bindparams(phrase=phrase).columns(rowid=db.Integer))
+
+    pattern = f'%{_escape_like(term)}%'
+    return or_(
+        User.search_name.like(pattern, escape='\\'),
+        func.lower(User.email).like(pattern, escape='\\'),
+        func.lower(User.employee_id).like(pattern, escape='\\')
+    )
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def directory_match(search):
+    """
+    (condition, rank) for a directory search term.
+
+    `condition` selects matching users; `rank` orders them 0 = exact
+    employee ID or email, 1 = name prefix, 2 = substring.
+    """
+    from app.models import User
+
+    raw = search.strip()
+    term = normalize_name(raw)
+
+    exact = or_(
+        User.employee_id.in_({raw, raw.upper()}),
+        User.email.in_({raw, raw.lower()})
+    )
+    # Range instead of LIKE so the plain B-tree index on search_name is used
+    prefix = and_(User.search_name >= term, User.search_name < term + '\uffff')
+
+    conditions = [exact, prefix]
+    if len(term) >= TRIGRAM_MIN_LENGTH:
+        conditions.append(_substring_condition(User, term))
+
+    rank = case((exact, literal(0)), (prefix, literal(1)), else_=literal(2))
+    return or_(*conditions), rank
+
+
+def search_directory(search, limit=10, role=None, active_only=True):
+    """Ranked typeahead matches as compact dicts."""
+    from app.models import User
+
+    condition, rank = directory_match(search)
+    query = select(User, rank.label('rank')).where(condition)
+    if role:
+        query = query.where(User.role == role)
+    if active_only:
+        query = query.where(User.is_active.is_(True), User.is_approved.is_(True))
+
+    rows = db.session.execute(query.order_by(rank, User.search_name, User.id).limit(limit)).all()
+    match_names = ('exact', 'prefix', 'substring')
+    return [{
+        'id': user.id,
+        'full_name': user.full_name,
+        'email': user.email,
+        'employee_id': user.employee_id,
+        'role': user.role,
+        'court_station': user.court_station,
+        'match': match_names[row_rank]
+    } for user, row_rank in rows]
+
+
+def reindex_users():
+    """Backfill search_name and rebuild the trigram index; returns rows updated."""
+    from app.models import User
+
+    updated = 0
+    for user in User.query.yield_per(500):
+        name = normalize_name(user.full_name)
+        if user.search_name != name:
+            user.search_name = name
+            updated += 1
+    db.session.flush()
+
+    install_search_indexes(db.session.connection())
+    if db.engine.dialect.name == 'sqlite' and _has_sqlite_fts():
+        db.session.execute(text("INSERT INTO users_fts(users_fts) VALUES ('rebuild')"))
+    db.session.commit()
+    return updated
+
+
+def init_app(app):
+    @app.cli.command('users-reindex')
+    def users_reindex_command():
+        """Backfill normalised names and rebuild the user search index."""
+        from app.utils.schema import upgrade_schema
+
+        # Databases from before search_name need the column first
+        upgrade_schema()
+        click.echo(f'Updated {reindex_users()} users')
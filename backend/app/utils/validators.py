@@ -39,7 +39,10 @@ def validate_password_strength(password):
     
     return True, "Password is strong"
 
+# Case numbers look like CR-2024-001: type prefix, year, serial
+CASE_NUMBER_PATTERN = r'[A-Z]{2,4}-\d{4}-\d{3,5}'
+
 def validate_case_number(case_number):
     """Validate case number format (e.g., CR-2024-001)."""
-    pattern = r'^[A-Z]{2,4}-\d{4}-\d{3,5}$'
+    pattern = rf'^{CASE_NUMBER_PATTERN}$'
     return bool(re.match(pattern, case_number))
\ No newline at end of file
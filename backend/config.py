@@ -9,6 +9,7 @@ class Config:
     # Database
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///judiciary.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SCHEMA_AUTO_UPGRADE = True    # add missing columns and indexes on start (`flask schema-upgrade`)
     
     # JWT
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-2024'
@@ -23,4 +24,97 @@ class Config:
     BACKUP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backups')
     
     # Email domain validation
-    ALLOWED_EMAIL_DOMAINS = ['judiciary.go.ke', 'courts.go.ke']
\ No newline at end of file
+    ALLOWED_EMAIL_DOMAINS = ['judiciary.go.ke', 'courts.go.ke']
+    
+    # Live dashboard events (Server-Sent Events)
+    # Streams are long-lived: run gunicorn with a thread or gevent worker
+    # class (e.g. `-k gthread --threads 100`) so idle streams don't pin processes.
+    EVENT_QUEUE_SIZE = 100
+    EVENT_HEARTBEAT_SECONDS = 25
+    EVENTS_REDIS_URL = os.environ.get('EVENTS_REDIS_URL')  # fan-out across workers
+    
+    # Audit log writer
+    AUDIT_ASYNC = True            # False writes every entry immediately
+    AUDIT_BATCH_SIZE = 100        # flush when this many entries are queued...
+    AUDIT_FLUSH_INTERVAL = 2.0    # ...or after this many seconds
+    AUDIT_SPILL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audit_spill')
+    AUDIT_SPILL_FSYNC = False     # fsync each queued entry (slower, survives power loss)
+    
+    # Audit log partitioning (`flask audit-archive`)
+    AUDIT_HOT_MONTHS = 1          # months kept in the live audit_logs table
+    AUDIT_COLD_AFTER_MONTHS = 12  # partitions older than this become compressed segments
+    AUDIT_SEGMENT_BLOCK_SIZE = 1000
+    AUDIT_ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'audit_archive')
+    
+    # Audit hash chain (`flask audit-seal`, `flask audit-verify`)
+    AUDIT_SIGNING_KEY = os.environ.get('AUDIT_SIGNING_KEY')  # defaults to SECRET_KEY
+    AUDIT_CHECKPOINT_SIZE = 1024  # entries per signed Merkle checkpoint
+    AUDIT_SEAL_INTERVAL = 30      # seconds between background sealing runs
+    AUDIT_VERIFY_WORKERS = 2      # rehashing processes for `flask audit-verify`; the API verifies in-process
+    
+    # Per-process cache of authenticated users (role and status checks)
+    PRINCIPAL_CACHE_SIZE = 1024
+    PRINCIPAL_CACHE_TTL = 60      # seconds; bounds staleness in other workers
+    
+    # Token revocation (logout, deactivation, password changes)
+    REVOCATION_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'revoked_tokens.jsonl')
+    REVOCATION_SYNC_INTERVAL = 1.0   # seconds between checks for other workers' revocations
+    REVOCATION_COMPACT_BYTES = 1024 * 1024
+    
+    # Password hashing (bcrypt runs in a separate process pool)
+    BCRYPT_ROUNDS = 12            # existing hashes are upgraded on next login
+    BCRYPT_POOL_SIZE = 2          # processes per worker; 0 hashes in the request thread
+    BCRYPT_MAX_PENDING = 32       # queued + running hashes before answering 503
+    BCRYPT_TIMEOUT = 30
+    BCRYPT_RETRY_AFTER = 2        # seconds, sent in Retry-After
+    
+    # Rate limiting: endpoint -> scope -> (requests, window seconds)
+    # Scopes: 'ip' (client address), 'account' (email in the request body),
+    # 'user' (authenticated JWT identity)
+    RATELIMIT_ENABLED = True
+    RATELIMIT_REDIS_URL = os.environ.get('RATELIMIT_REDIS_URL')  # share counters across workers
+    RATE_LIMITS = {
+        'login': {'ip': (30, 60), 'account': (10, 300)},
+        'register': {'ip': (5, 3600)},
+        'check_email': {'ip': (30, 60)},
+        'forgot_password': {'ip': (5, 900), 'account': (3, 3600)},
+        'search': {'user': (60, 60)},
+    }
+    
+    # Case number typeahead (/api/cases/suggest)
+    CASE_INDEX_REFRESH = 300      # seconds between full reloads of the in-memory index
+    
+    # Full-text search index (`flask search-reindex`)
+    SEARCH_FUZZY_MAX_EDITS = 2        # upper bound for fuzzy=true queries
+    SEARCH_FUZZY_PREFIX_LENGTH = 7    # characters covered by the deletion index
+    SEARCH_VOCABULARY_REFRESH = 600   # seconds between vocabulary reloads per worker
+    SEARCH_SUGGEST_BELOW = 3          # offer "did you mean" when fewer results than this
+
+    # Search result cache (stats at /api/search/cache/stats)
+    SEARCH_CACHE_ENABLED = True
+    SEARCH_CACHE_SIZE = 500       # responses kept per worker
+    SEARCH_CACHE_TTL = 120        # seconds; uploads, deletes and case edits invalidate sooner
+
+    # Search analytics log (report at /api/search/analytics)
+    SEARCH_LOG_ENABLED = True
+    SEARCH_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'search_log')
+    SEARCH_LOG_MAX_BYTES = 10 * 1024 * 1024  # rotate and gzip the live file past this size
+    SEARCH_LOG_BACKUPS = 20                   # rotated files kept
+    SEARCH_PREWARM_TOP = 20                   # frequent searches replayed into each worker's cache; 0 disables
+    SEARCH_PREWARM_DAYS = 7                   # how far back "frequent" looks
+
+    # Saved searches, matched against each newly ingested file
+    SAVED_SEARCH_MAX_PER_USER = 50
+
+    # Near-duplicate detection (`flask files-fingerprint` rebuilds)
+    DUPLICATE_THRESHOLD = 0.8         # estimated Jaccard similarity of word 3-shingles
+    DUPLICATE_MIN_SHINGLES = 20       # shorter texts are not fingerprinted
+    DUPLICATE_MAX_CANDIDATES = 200    # LSH candidates verified per new file
+
+    # Related files from TF-IDF similarity (`flask files-related` rebuilds)
+    RELATED_TOP_K = 10                # neighbours stored per file
+    RELATED_QUERY_TERMS = 40          # strongest terms of a file used to find them
+    RELATED_MAX_DF = 0.5              # ignore terms in more than this share of files
+    
+    # Bulk user operations and imports
+    USER_BULK_MAX = 1000
\ No newline at end of file
@@ -0,0 +1,138 @@
+# tests/conftest.py
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+from flask.testing import FlaskClient
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+
+TMP = tempfile.mkdtemp(prefix='judiciary-tests-')
+PASSWORD = 'Passw0rd!'
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(TMP, 'test.db')
+    UPLOAD_FOLDER = os.path.join(TMP, 'uploads')
+    BACKUP_DIR = os.path.join(TMP, 'backups')
+    AUDIT_ASYNC = False
+    AUDIT_SPILL_DIR = os.path.join(TMP, 'audit_spill')
+    AUDIT_ARCHIVE_DIR = os.path.join(TMP, 'audit_archive')
+    REVOCATION_FILE = os.path.join(TMP, 'revoked_tokens.jsonl')
+    SEARCH_LOG_DIR = os.path.join(TMP, 'search_log')
+    SEARCH_CACHE_ENABLED = False
+    SEARCH_PREWARM_TOP = 0
+    RATELIMIT_ENABLED = False
+    BCRYPT_ROUNDS = 4
+    BCRYPT_POOL_SIZE = 0
+
+
+class Client(FlaskClient):
+    """Runs every request in its own app context, so `g` and the session are per request as when serving."""
+
+    def open(self, *args, **kwargs):
+        with self.application.app_context():
+            return super().open(*args, **kwargs)
+
+
+@pytest.fixture(scope='session')
+def app():
+    # One app for the session: the utility singletons register listeners
+    # on every create_app, so a fresh app per test would pile them up.
+    from app import create_app
+    app = create_app(TestConfig)
+    app.test_client_class = Client
+    return app
+
+
+@pytest.fixture(autouse=True)
+def database(app):
+    """A fresh SQLite database and empty in-memory indexes for every test."""
+    from app import db
+    from app.utils import audit_archive
+    from app.utils.case_index import case_index
+    from app.utils.principal import principal_cache
+    from app.utils.search_cache import search_cache
+    from app.utils.spelling import vocabulary
+
+    with app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
+        db.engine.dispose()
+
+    os.remove(os.path.join(TMP, 'test.db'))
+    shutil.rmtree(TestConfig.AUDIT_ARCHIVE_DIR, ignore_errors=True)
+    audit_archive._partition_cache['tables'] = None
+    audit_archive._segment_cache.clear()
+    vocabulary._loaded_at = None
+    case_index._loaded_at = None
+    principal_cache.clear()
+    search_cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def users(database):
+    """An approved admin, judge and clerk, by role."""
+    from app.models import User
+    from app.utils.auth import hash_password
+
+    created = {}
+    for role in ('admin', 'judge', 'clerk'):
+        user = User(email=f'{role}@judiciary.go.ke', password_hash=hash_password(PASSWORD),
+                    full_name=f'{role.title()} User', employee_id=role.upper(), role=role,
+                    court_station='Nairobi', is_active=True, is_approved=True)
+        database.session.add(user)
+        created[role] = user
+    database.session.commit()
+    return created
+
+
+@pytest.fixture
+def auth(client, users):
+    """auth(role) -> Authorization header for that user."""
+    def headers(role):
+        response = client.post('/api/auth/login', json={'email': users[role].email, 'password': PASSWORD})
+        assert response.status_code == 200, response.get_json()
+        return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+    return headers
+
+
+@pytest.fixture
+def make_case(database, users):
+    def create(case_number, title='Republic vs Accused', **fields):
+        from app.models import Case
+
+        fields.setdefault('judge_id', users['judge'].id)
+        case = Case(case_number=case_number, title=title, **fields)
+        database.session.add(case)
+        database.session.commit()
+        return case
+    return create
+
+
+@pytest.fixture
+def make_file(database, users):
+    """make_file(case, text) -> a CaseFile run through the ingest pipeline."""
+    def create(case, text, document_type='ruling', filename='ruling.pdf'):
+        from app.models import CaseFile
+        from app.utils.ingest import ingest_file
+
+        case_file = CaseFile(filename=filename, original_filename=filename, file_path=os.path.join(TMP, filename),
+                             document_type=document_type, case_id=case.id,
+                             uploaded_by_id=users['clerk'].id, ocr_text=text, is_ocr_processed=True)
+        database.session.add(case_file)
+        database.session.commit()
+        ingest_file(case_file)
+        return case_file
+    return create
@@ -0,0 +1,79 @@
+# tests/test_audit_chain.py
+import hashlib
+
+import pytest
+from sqlalchemy import text
+
+from app.utils.audit_chain import inclusion_path, merkle_root, seal_pending, verify_inclusion, verify_log
+
+
+def _hashes(n):
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 5, 8, 13])
+def test_every_leaf_has_a_valid_inclusion_proof(size):
+    hashes = _hashes(size)
+    root = merkle_root(hashes)
+    for index, entry_hash in enumerate(hashes):
+        path = inclusion_path(hashes, index)
+        assert verify_inclusion(entry_hash, index, size, path, root)
+        assert not verify_inclusion(_hashes(size + 1)[-1], index, size, path, root)
+        if size > 1:
+            assert not verify_inclusion(entry_hash, (index + 1) % size, size, path, root)
+
+
+@pytest.fixture
+def sealed(app, monkeypatch):
+    """Seven entries sealed under checkpoints of three."""
+    from app.utils.audit import log_action
+
+    monkeypatch.setitem(app.config, 'AUDIT_CHECKPOINT_SIZE', 3)
+    for i in range(7):
+        log_action('case_view', resource_type='case', resource_id=i, details=f'viewed {i}')
+    assert seal_pending() == 7
+
+
+def test_sealed_log_verifies_and_detects_edits(database, sealed):
+    result = verify_log(workers=1)
+    assert (result['valid'], result['checkpoints'], result['entries'], result['unsealed']) == (True, 3, 7, 0)
+
+    database.session.execute(text("UPDATE audit_logs SET details = 'edited' WHERE resource_id = 4"))
+    database.session.commit()
+    result = verify_log(workers=1)
+    assert not result['valid']
+    assert [(p['checkpoint'], p['reason']) for p in result['problems']] == \
+        [(2, 'entry altered or chain broken')]
+
+
+def test_entry_proof_endpoint(client, auth, database, sealed):
+    from app.models import AuditLog
+
+    headers = auth('admin')
+    entry = AuditLog.query.filter_by(resource_id=4).one()
+    proof = client.get(f'/api/audit/{entry.id}/proof', headers=headers).get_json()
+    assert proof['verified'] and proof['leaf_index'] == 1 and proof['tree_size'] == 3
+
+    # The login above is not sealed yet
+    unsealed = AuditLog.query.filter(AuditLog.chain_seq.is_(None)).first()
+    assert client.get(f'/api/audit/{unsealed.id}/proof', headers=headers).status_code == 404
+
+
+def test_verify_endpoint_checks_a_bounded_range(client, auth, sealed):
+    headers = auth('admin')
+
+    latest = client.get('/api/audit/verify?limit=1', headers=headers).get_json()
+    assert (latest['valid'], latest['checkpoints'], latest['after'], latest['next']) == (True, 1, 2, None)
+
+    first = client.get('/api/audit/verify?after=0&limit=2', headers=headers)
+    assert first.status_code == 404
+    pages, after = [], None
+    while True:
+        query = f'limit=2&after={after}' if after else 'limit=5'
+        body = client.get(f'/api/audit/verify?{query}', headers=headers).get_json()
+        assert body['valid']
+        pages.append(body['checkpoints'])
+        if body['next'] is None:
+            break
+        after = body['next']
+    assert sum(pages) == 3
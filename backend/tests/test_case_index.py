@@ -0,0 +1,53 @@
+# tests/test_case_index.py
+import time
+
+
+def _suggest(client, headers, prefix, **params):
+    response = client.get('/api/cases/suggest', query_string={'q': prefix, **params}, headers=headers)
+    assert response.status_code == 200
+    return [s['case_number'] for s in response.get_json()['suggestions']]
+
+
+def test_judge_suggestions_skip_other_judges_cases(client, auth, make_case, users):
+    # Other judges' cases sort first and would fill the limit of a shared scan
+    for i in range(5):
+        make_case(f'CR-2024-00{i}', judge_id=users['admin'].id)
+    make_case('CR-2024-100', title='Republic vs Kamau')
+    make_case('CV-2024-001', title='Kamau v Bank')
+
+    assert _suggest(client, auth('judge'), 'cr-2024', limit=1) == ['CR-2024-100']
+    assert _suggest(client, auth('judge'), 'kamau', titles='true') == ['CR-2024-100', 'CV-2024-001']
+    assert _suggest(client, auth('admin'), 'cr-2024', limit=3) == ['CR-2024-000', 'CR-2024-001', 'CR-2024-002']
+
+
+def test_reassignment_moves_suggestions_to_the_new_judge(client, auth, database, make_case, users):
+    from app.models import User
+    from app.utils.case_index import case_index
+
+    other = User(email='judge2@judiciary.go.ke', password_hash='x', full_name='Second Judge',
+                 employee_id='JUDGE2', role='judge', court_station='Nairobi', is_active=True, is_approved=True)
+    database.session.add(other)
+    database.session.commit()
+    case = make_case('CR-2024-001')
+    case_index.warm()
+    assert _suggest(client, auth('judge'), 'cr') == ['CR-2024-001']
+
+    response = client.put(f'/api/cases/cases/{case.id}', json={'judge_id': other.id}, headers=auth('clerk'))
+    assert response.status_code == 200
+    assert _suggest(client, auth('judge'), 'cr') == []
+    assert [s['id'] for s in case_index.suggest('cr', judge_id=other.id)] == [case.id]
+
+
+def test_stale_index_reloads_in_the_background(app, make_case, monkeypatch):
+    from app.utils.case_index import case_index
+
+    case_index.warm()
+    make_case('CR-2024-001')  # not announced, so only a reload finds it
+    monkeypatch.setattr(case_index, 'refresh_interval', 0)
+
+    assert case_index.suggest('cr') == []
+    for _ in range(50):
+        if not case_index._reloading:
+            break
+        time.sleep(0.02)
+    assert [s['case_number'] for s in case_index.suggest('cr')] == ['CR-2024-001']
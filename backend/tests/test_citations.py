@@ -0,0 +1,44 @@
+# tests/test_citations.py
+import pytest
+
+
+@pytest.fixture
+def cited(make_case, make_file, users):
+    """CR-2024-001 is cited by a case of the judge's and by one of another judge's."""
+    target = make_case('CR-2024-001')
+    other_judge = make_case('CR-2024-002', judge_id=users['admin'].id)
+    make_file(other_judge, '--- Page 1 ---\nintro\n--- Page 2 ---\n'
+                           'As held in CR-2024-001 and CR/2024/001, see also CR-2024-009')
+    own = make_case('CR-2024-003')
+    make_file(own, 'following CR-2024-001')
+    make_file(own, 'CR-2024-001 applied')
+    return target, other_judge, own
+
+
+def test_citations_are_aggregated_per_cited_case(client, auth, cited):
+    _, other_judge, _ = cited
+    response = client.get(f'/api/cases/cases/{other_judge.id}/citations', headers=auth('admin'))
+    assert response.status_code == 200
+
+    citations = response.get_json()['citations']
+    assert [(c['case_number'], c['mentions'], c['files']) for c in citations] == \
+        [('CR-2024-001', 2, 1), ('CR-2024-009', 1, 1)]
+    assert citations[0]['case']['case_number'] == 'CR-2024-001'
+    # Cited but not (yet) filed here
+    assert citations[1]['case'] is None
+
+
+def test_cited_by_totals_and_first_page(client, auth, cited):
+    target, other_judge, own = cited
+    response = client.get(f'/api/cases/cases/{target.id}/cited-by', headers=auth('admin'))
+    assert response.status_code == 200
+
+    cited_by = [(c['case']['id'], c['mentions'], c['files'], c['first_page'])
+                for c in response.get_json()['cited_by']]
+    assert cited_by == [(other_judge.id, 2, 1, 2), (own.id, 2, 2, None)]
+
+
+def test_cited_by_is_limited_to_the_judges_cases(client, auth, cited):
+    target, _, own = cited
+    response = client.get(f'/api/cases/cases/{target.id}/cited-by?limit=1', headers=auth('judge'))
+    assert [c['case']['id'] for c in response.get_json()['cited_by']] == [own.id]
@@ -0,0 +1,47 @@
+# tests/test_entities.py
+import pytest
+
+
+@pytest.fixture
+def filed(make_case, make_file, users):
+    own = make_case('CV-2024-001', title='John Kamau v Kenya Commercial Bank Limited')
+    make_file(own, '--- Page 1 ---\nJOHN KAMAU .......... PLAINTIFF\n--- Page 2 ---\n'
+                   'Mr. Otieno for the Plaintiff. Section 3 of the Land Registration Act.')
+    make_file(own, 'Mr. Otieno for the Plaintiff. Mr. Otieno for the Defendant.', document_type='pleading')
+    other = make_case('CV-2024-002', title='Mary Achieng v KCB', judge_id=users['admin'].id)
+    make_file(other, 'Mr. Otieno appearing for the Respondent. The Land Registration Act applies.')
+    return own, other
+
+
+def _entity_id(client, headers, name):
+    response = client.get(f'/api/search/entities?q={name}', headers=headers)
+    assert response.status_code == 200
+    return response.get_json()['entities'][0]['id']
+
+
+def test_entity_cases_totals_per_case(client, auth, filed):
+    own, other = filed
+    headers = auth('admin')
+    body = client.get(f"/api/search/entities/{_entity_id(client, headers, 'otieno')}", headers=headers).get_json()
+
+    assert body['total'] == 2
+    assert [(c['id'], c['mentions'], c['files'], c['first_page']) for c in body['cases']] == \
+        [(own.id, 3, 2, 2), (other.id, 1, 1, None)]
+
+
+def test_entity_cases_scoped_to_judge_and_paginated(client, auth, filed):
+    own, _ = filed
+    headers = auth('judge')
+    entity_id = _entity_id(client, headers, 'otieno')
+
+    body = client.get(f'/api/search/entities/{entity_id}', headers=headers).get_json()
+    assert body['entity']['case_count'] == 1
+    assert [c['id'] for c in body['cases']] == [own.id]
+
+    admin = auth('admin')
+    second = client.get(f'/api/search/entities/{entity_id}?per_page=1&page=2', headers=admin).get_json()
+    assert second['pages'] == 2 and len(second['cases']) == 1
+
+
+def test_entity_search_rejects_unknown_kind(client, auth):
+    assert client.get('/api/search/entities?kind=x', headers=auth('admin')).status_code == 400
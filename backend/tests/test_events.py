@@ -0,0 +1,58 @@
+# tests/test_events.py
+import pytest
+
+
+@pytest.fixture
+def second_judge(database):
+    from app.models import User
+
+    judge = User(email='judge2@judiciary.go.ke', password_hash='x', full_name='Second Judge',
+                 employee_id='JUDGE2', role='judge', court_station='Nairobi', is_active=True, is_approved=True)
+    database.session.add(judge)
+    database.session.commit()
+    return judge
+
+
+@pytest.fixture
+def streams(users, second_judge):
+    """Dashboard subscriptions by role, plus the second judge's."""
+    from app.utils.events import event_hub
+
+    subscriptions = {role: event_hub.subscribe(users[role].id, role) for role in ('admin', 'judge')}
+    subscriptions['judge2'] = event_hub.subscribe(second_judge.id, 'judge')
+    yield subscriptions
+    for subscription in subscriptions.values():
+        subscription.close()
+
+
+def _received(subscription):
+    events = []
+    while (event := subscription.get(timeout=0)) is not None:
+        events.append((event['topic'], event['op'], event['data'].get('status')))
+    return events
+
+
+def test_reassignment_moves_the_case_between_judges(client, auth, make_case, second_judge, streams):
+    case = make_case('CR-2024-001', status='pending')
+    response = client.put(f'/api/cases/cases/{case.id}', headers=auth('clerk'),
+                          json={'judge_id': second_judge.id, 'status': 'active'})
+    assert response.status_code == 200
+
+    assert _received(streams['judge']) == [('case', 'unassigned', 'pending')]
+    # Counted at the old status, then moved to the new one by the update
+    assert _received(streams['judge2']) == [('case', 'assigned', 'pending'), ('case', 'updated', 'active')]
+    assert _received(streams['admin']) == [('case', 'updated', 'active')]
+
+
+def test_file_events_stay_off_dashboard_streams(make_case, make_file, streams):
+    from app.utils.events import event_hub
+
+    seen = []
+    event_hub.add_listener(seen.append)
+    try:
+        make_file(make_case('CR-2024-001'), 'ruling text')
+    finally:
+        event_hub._listeners.remove(seen.append)
+
+    assert ('file', 'indexed') in [(e['topic'], e['op']) for e in seen]
+    assert _received(streams['admin']) == _received(streams['judge']) == []
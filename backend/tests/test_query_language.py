@@ -0,0 +1,61 @@
+# tests/test_query_language.py
+from urllib.parse import quote
+
+import pytest
+
+from app.utils.query_language import And, Not, Or, QuerySyntaxError, Term, parse_query
+
+
+def test_parse_fields_phrases_and_ranges():
+    parsed = parse_query('title:"Republic vs" AND doctype:ruling NOT station:Kisumu year:2024..2025')
+    assert parsed == And([
+        Term('title', 'Republic vs', phrase=True),
+        Term('doctype', 'ruling'),
+        Not(Term('station', 'Kisumu')),
+        Term('year', '2024', upper='2025'),
+    ])
+
+
+def test_parse_or_binds_looser_than_and():
+    assert parse_query('a b OR c') == Or([And([Term(None, 'a'), Term(None, 'b')]), Term(None, 'c')])
+    assert parse_query('a b', default_operator='or') == Or([Term(None, 'a'), Term(None, 'b')])
+
+
+def test_parse_minus_is_not():
+    assert parse_query('robbery -(station:Kisumu)') == And([Term(None, 'robbery'), Not(Term('station', 'Kisumu'))])
+
+
+@pytest.mark.parametrize('text, position', [('title:"Republic', 6), ('(robbery', 8), ('', 0)])
+def test_parse_errors_carry_position(text, position):
+    with pytest.raises(QuerySyntaxError) as error:
+        parse_query(text)
+    assert error.value.position == position
+
+
+def _advanced(client, headers, query):
+    response = client.get(f'/api/search/advanced?query={quote(query)}', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return sorted(r['case']['case_number'] for r in response.get_json()['results'])
+
+
+def test_not_keeps_files_whose_field_is_null(client, auth, make_case, make_file):
+    make_file(make_case('CR-2024-001', court_station='Nairobi', case_type='criminal'), 'robbery with violence')
+    make_file(make_case('CR-2024-002'), 'robbery with violence')
+    make_file(make_case('CR-2024-003', court_station='Kisumu', case_type='civil'), 'robbery with violence')
+    headers = auth('admin')
+
+    assert _advanced(client, headers, 'robbery NOT station:Kisumu') == ['CR-2024-001', 'CR-2024-002']
+    assert _advanced(client, headers, 'robbery -casetype:criminal') == ['CR-2024-002', 'CR-2024-003']
+    assert _advanced(client, headers, 'NOT (station:Kisumu OR casetype:criminal)') == ['CR-2024-002']
+    assert _advanced(client, headers, 'robbery station:Kisumu') == ['CR-2024-003']
+
+
+def test_phrase_and_text_intersection(client, auth, make_case, make_file):
+    make_file(make_case('CR-2024-001', title='Republic vs John Mwangi'), 'The accused was convicted.')
+    make_file(make_case('CR-2024-002', title='Mwangi John vs Republic'), 'The appeal was allowed.')
+    headers = auth('admin')
+
+    assert _advanced(client, headers, 'title:"john mwangi"') == ['CR-2024-001']
+    assert _advanced(client, headers, 'john mwangi') == ['CR-2024-001', 'CR-2024-002']
+    assert _advanced(client, headers, 'mwangi appeal') == ['CR-2024-002']
+    assert _advanced(client, headers, 'mwangi zebra') == []
@@ -0,0 +1,42 @@
+# tests/test_related.py
+TEXTS = [
+    'land dispute over the boundary of plot 42 in Kiambu between neighbours',
+    'land dispute concerning the boundary of plot 17 and a fence in Kiambu',
+    'appeal against conviction for robbery with violence in Nakuru',
+    'robbery with violence conviction appeal dismissed by the court of appeal',
+    'divorce petition and custody of the children of the marriage',
+    'custody of the children after the divorce petition was granted',
+]
+
+
+def _related(client, headers, file_id):
+    response = client.get(f'/api/files/{file_id}/related', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return [(item['id'], item['score']) for item in response.get_json()['related']]
+
+
+def test_scores_are_cosines_as_the_collection_grows(client, auth, make_case, make_file):
+    # The first file is weighted while N is 1; the later ones after N and doc_freq have moved
+    first = make_file(make_case('CV-2024-001'), TEXTS[0])
+    for i in range(12):
+        make_file(make_case(f'TR-2024-{i:03d}'), f'traffic offence number {i} on the {i}th street')
+    similar = make_file(make_case('CV-2024-002'), TEXTS[1])
+    copy = make_file(make_case('CV-2024-003'), TEXTS[0])
+    headers = auth('admin')
+
+    for case_file in (first, similar, copy):
+        for _, score in _related(client, headers, case_file.id):
+            assert 0 < score <= 1
+    assert dict(_related(client, headers, copy.id))[first.id] == 1.0
+    assert dict(_related(client, headers, similar.id))[first.id] < 1
+
+
+def test_neighbours_come_from_other_cases_best_first(client, auth, make_case, make_file):
+    files = [make_file(make_case(f'CV-2024-{i:03d}'), text) for i, text in enumerate(TEXTS, 1)]
+    same_case = make_file(files[4].case, TEXTS[4])
+    headers = auth('admin')
+
+    related = _related(client, headers, files[4].id)
+    assert related[0][0] == files[5].id
+    assert same_case.id not in dict(related)
+    assert [score for _, score in related] == sorted((score for _, score in related), reverse=True)
@@ -0,0 +1,18 @@
+# tests/test_schema.py
+from sqlalchemy import inspect, text
+
+
+def test_upgrade_adds_language_without_reindexing(database, make_case, make_file, caplog):
+    from app.models import SearchDocument
+    from app.utils.schema import upgrade_schema
+
+    make_file(make_case('CR-2024-001'), 'Mahakama ya rufaa imeamua kwamba mshtakiwa ana haki ya kusikilizwa')
+    database.session.execute(text('ALTER TABLE search_documents DROP COLUMN language'))
+    database.session.commit()
+
+    assert upgrade_schema() == {'search_documents': {'columns': ['language'], 'indexes': []}}
+    assert 'language' in {c['name'] for c in inspect(database.engine).get_columns('search_documents')}
+    # Left for `flask search-reindex`, which the worker asks for
+    assert [d.language for d in SearchDocument.query] == [None]
+    assert 'flask search-reindex' in caplog.text
+    assert upgrade_schema() == {}
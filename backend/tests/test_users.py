@@ -0,0 +1,62 @@
+# tests/test_users.py
+import pytest
+
+from tests.conftest import PASSWORD
+
+
+@pytest.fixture
+def register(client):
+    """register(name) -> id of a new pending clerk registration."""
+    def create(name):
+        response = client.post('/api/auth/register', json={
+            'email': f'{name}@judiciary.go.ke', 'password': PASSWORD, 'full_name': f'{name.title()} Clerk',
+            'employee_id': name.upper(), 'role': 'clerk', 'court_station': 'Nairobi'
+        })
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()['user_id']
+    return create
+
+
+def _login(client, name):
+    return client.post('/api/auth/login', json={'email': f'{name}@judiciary.go.ke', 'password': PASSWORD})
+
+
+def test_reject_keeps_the_account_and_the_audit_chain(client, auth, register):
+    from app.utils.audit_chain import seal_pending, verify_log
+
+    headers = auth('admin')
+    user_id = register('wanjiku')
+    assert seal_pending() > 0
+
+    response = client.post(f'/api/users/{user_id}/reject', json={'reason': 'Unknown employee'}, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['user']['is_active'] is False
+
+    assert verify_log(workers=1)['valid']
+    assert _login(client, 'wanjiku').get_json()['error'] == 'Registration was rejected'
+    pending = client.get('/api/users/pending', headers=headers).get_json()
+    assert user_id not in [u['id'] for u in pending['users']]
+    rejected = client.get('/api/users?status=rejected', headers=headers).get_json()
+    assert [u['id'] for u in rejected['users']] == [user_id]
+
+    # A rejected registration can still be approved later
+    assert client.post(f'/api/users/{user_id}/approve', headers=headers).status_code == 200
+    assert _login(client, 'wanjiku').status_code == 200
+
+
+def test_bulk_reject_deactivates_pending_registrations(client, auth, users, register):
+    from app.utils.audit_chain import seal_pending, verify_log
+
+    headers = auth('admin')
+    pending = [register('otieno'), register('achieng')]
+    seal_pending()
+
+    body = client.post('/api/users/bulk/reject', json={'user_ids': pending + [users['judge'].id, 999]},
+                       headers=headers).get_json()
+    assert [r['status'] for r in body['results']] == ['rejected', 'rejected', 'unchanged', 'not_found']
+    assert client.post('/api/users/bulk/reject', json={'user_ids': pending[:1]},
+                       headers=headers).get_json()['results'][0]['reason'] == 'Already rejected'
+
+    assert verify_log(workers=1)['valid']
+    assert client.get('/api/users/pending', headers=headers).get_json()['count'] == 0
+    assert _login(client, 'otieno').status_code == 403